@@ -1,24 +1,44 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket, HTTPException
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import cv2
 import numpy as np
-import torch
 import json
 import base64
-from io import BytesIO
-import math
+import os
 import time
 import asyncio
+import contextvars
 from typing import Dict, List, Optional, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from pydantic import BaseModel
-from ultralytics import YOLO
+from pydantic import BaseModel, PrivateAttr
 from norfair import Tracker, Detection
-from filterpy.kalman import KalmanFilter
 import uvicorn
 
+from inference import InferenceScheduler
+from metrics import Registry, StageClock
+import tracing
+from tracing import Stage, Tracer, to_chrome_trace
+from workers import create_backend
+from detectors import cascade_stats
+from result_cache import DetectionCache
+from ingest import IngestManager, IngestSource
+from sessions import SessionManager, StreamContext
+from ws_protocol import (ENCODING_NV12, FLAG_MSGPACK_RESPONSE, FrameHeader, decode_frame, encode_message,
+                         encode_response, parse_frame_message)
+from ws_delta import DeltaEncoder, TrackTable, ViewerSettings
+from pubsub import PubSub, Subscription
+from rate_control import AdaptiveStride, LatestFrameSlot
+from motion_gate import MotionGate, Region
+from flow_tracker import FlowTracker
+from slicing import TilePlanner, merge_detections
+from track_store import TrackStore
+from zones import ZoneEngine, make_zone
+from threat_rules import LEVELS as THREAT_LEVELS, ThreatFeatures, ThreatRules
+from video_pipeline import VideoPipeline, VideoSummary, format_ndjson, format_sse, save_upload
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -50,6 +70,9 @@ class ObjectType(str, Enum):
     DRONE = "Drone"
     HELICOPTER = "Helicopter"
     UNKNOWN = "Unknown"
+    BIRD = "Bird"
+    MISSILE = "Missile"
+    TANK = "Tank"
 
 class DetectedObject(BaseModel):
     id: int
@@ -60,23 +83,247 @@ class DetectedObject(BaseModel):
     speed: float
     direction: float
     threat_level: ThreatLevel
+    zone: Optional[str] = None  # Highest-priority restricted zone the object is in
+
+class ZoneConfig(BaseModel):
+    name: str
+    polygon: List[List[float]]  # [x, y] points normalized to [0, 1]
+    priority: int = 0
+    threat_level: ThreatLevel = ThreatLevel.HIGH
+
+class SourceConfig(BaseModel):
+    source_id: str
+    url: str  # RTSP/HTTP URL, capture device index or video file path
+    session_id: Optional[str] = None  # Defaults to the source id
+    loop: bool = False  # Replay files from the start when they end
+    fps: Optional[float] = None  # Read rate cap (files default to their native rate)
 
 class DetectionResponse(BaseModel):
     frame_id: int
     timestamp: float
     objects: List[DetectedObject]
+    session_id: Optional[str] = None
+    _tracks: Optional[TrackTable] = PrivateAttr(default=None)  # Set by the tracker for delta viewers
 
 # Global variables
-model = None
-tracker = None
-object_trajectories = {}
-object_history = {}  # Store historical positions
-frame_counter = 0
+scheduler: Optional[InferenceScheduler] = None
+sessions: Optional[SessionManager] = None
+zones: Optional[ZoneEngine] = None
+threat_rules: Optional[ThreatRules] = None
+result_cache: Optional[DetectionCache] = None
+ingest: Optional[IngestManager] = None
+pubsub: Optional[PubSub] = None
+background_tasks: List[asyncio.Task] = []
+
+# Declarative threat rules (see threat_rules.py), reloaded when the file changes
+THREAT_RULES_FILE = os.getenv("THREAT_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 "threat_rules.json"))
+THREAT_RULES_RELOAD_SECONDS = float(os.getenv("THREAT_RULES_RELOAD_SECONDS", "2"))
+
+# Model and inference batching configuration
+MODEL_PATH = os.getenv("MODEL_PATH", r"D:\AB2_PS01\runs\detect\train_fast\weights\best.pt")
+# Detector runtime: "pytorch" (.pt weights), "onnxruntime" (.onnx) or "openvino"
+# (exported model directory); see export_models.py for producing the artifacts
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "pytorch")
+DETECTOR_IMGSZ = int(os.getenv("DETECTOR_IMGSZ", "640"))
+DETECTOR_HALF = os.getenv("DETECTOR_HALF", "0") == "1"  # FP16 inference where the runtime supports it
+
+# Optional multi-model detection: several models listed in a JSON file (see
+# detectors.MultiModelDetector) share each frame's preprocessing and are fused
+# into the ObjectType taxonomy; takes precedence over MODEL_PATH and the cascade
+MODELS_FILE = os.getenv("MODELS_FILE", "")
+
+# Optional detector cascade: a small screening model runs on every frame and
+# only its uncertain or threat-class detections are confirmed by MODEL_PATH
+CASCADE_SCREENER_PATH = os.getenv("CASCADE_SCREENER_PATH", "")  # Empty = off
+CASCADE_SCREENER_BACKEND = os.getenv("CASCADE_SCREENER_BACKEND", DETECTOR_BACKEND)
+CASCADE_SCREENER_IMGSZ = int(os.getenv("CASCADE_SCREENER_IMGSZ", "320"))
+CASCADE_SCREENER_CONF = float(os.getenv("CASCADE_SCREENER_CONF", "0.1"))  # Low, so doubtful objects get confirmed rather than missed
+CASCADE_ESCALATE_BELOW = float(os.getenv("CASCADE_ESCALATE_BELOW", "0.6"))  # Screener confidence below which a detection is confirmed
+CASCADE_ESCALATE_CLASSES = [name for name in os.getenv("CASCADE_ESCALATE_CLASSES", "drone").split(",") if name]  # Always confirmed
+CASCADE_CROP_PADDING = float(os.getenv("CASCADE_CROP_PADDING", "0.5"))  # Fraction of the box added on each side of a crop
+CASCADE_ENABLED = bool(CASCADE_SCREENER_PATH) and not MODELS_FILE  # MODELS_FILE takes precedence
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "256"))
+
+# Execution backend: "thread" or "process" pool of detector replicas
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_CORES_PER_WORKER = int(os.getenv("INFERENCE_CORES_PER_WORKER", "0"))  # 0 = split evenly
+# Shared-memory frame slots for the process backend; frames that don't fit are pickled
+FRAME_RING_SLOTS = int(os.getenv("FRAME_RING_SLOTS", str(2 * BATCH_MAX_SIZE * INFERENCE_WORKERS)))  # 0 = always pickle
+FRAME_RING_SLOT_MB = float(os.getenv("FRAME_RING_SLOT_MB", "2.7"))  # 1280x720 BGR
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Per-stream session limits
+DEFAULT_SESSION_ID = "default"  # Used by /analyze/ callers that don't pass a session id
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "300"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "64"))
+
+# Restricted zones: optional JSON file of {camera_id: [zone, ...]} loaded at
+# startup ("*" applies to every camera), editable through /zones
+ZONES_FILE = os.getenv("ZONES_FILE")
+ZONE_GRID_SIZE = int(os.getenv("ZONE_GRID_SIZE", "128"))  # Mask resolution per frame side
+THREAT_ORDER = [ThreatLevel(level) for level in THREAT_LEVELS]
+OBJECT_TYPE_INDEX = {object_type: index for index, object_type in enumerate(ObjectType)}
+
+# Detection cache for repeated frames (static cameras, client retries): exact
+# hits by content hash of the upload, optional near-duplicates by perceptual hash
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "0"))  # Entries, 0 = off
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "16"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "30"))
+RESULT_CACHE_NEAR_DISTANCE = int(os.getenv("RESULT_CACHE_NEAR_DISTANCE", "-1"))  # Differing hash bits (of 256) for a near hit, -1 = exact only
+
+# Per-session track state bounds
+TRACK_HISTORY_LENGTH = int(os.getenv("TRACK_HISTORY_LENGTH", "30"))  # Positions kept per track
+TRACK_MAX_PER_SESSION = int(os.getenv("TRACK_MAX_PER_SESSION", "1024"))  # Least recently seen evicted beyond this
+TRACK_MAX_AGE_SECONDS = float(os.getenv("TRACK_MAX_AGE_SECONDS", "60"))  # Unseen tracks evicted after this
+
+# Server-side ingest: cameras and video files read by dedicated decode threads,
+# managed through /sources and throttled like live streams
+INGEST_SOURCES_FILE = os.getenv("INGEST_SOURCES_FILE")  # Optional JSON list of sources started at startup
+
+# Live stream load shedding: analyse every Nth frame, dense while objects are
+# tracked and sparse when the sky is empty, backing off when over budget
+STREAM_LATENCY_BUDGET_MS = float(os.getenv("STREAM_LATENCY_BUDGET_MS", "250"))
+STREAM_ACTIVE_STRIDE = int(os.getenv("STREAM_ACTIVE_STRIDE", "1"))
+STREAM_IDLE_STRIDE = int(os.getenv("STREAM_IDLE_STRIDE", "3"))
+STREAM_MAX_STRIDE = int(os.getenv("STREAM_MAX_STRIDE", "10"))
+
+# Delta-encoded websocket results (/ws?results=delta): tracks are sent when
+# they are created, change at this resolution or are deleted, plus periodic keyframes
+WS_DELTA_QUANTUM_PX = int(os.getenv("WS_DELTA_QUANTUM_PX", "2"))  # Position resolution
+WS_DELTA_KEYFRAME_SECONDS = float(os.getenv("WS_DELTA_KEYFRAME_SECONDS", "5"))  # Full snapshot interval
+WS_CONTROL_MAX_BYTES = 4096  # Longer text messages are frames, not {"subscribe": ...} control messages
 
-# Constants for threat assessment
-SPEED_THRESHOLD_HIGH = 40
-SPEED_THRESHOLD_CRITICAL = 80
-APPROACH_ANGLE_THRESHOLD = 30  # Degrees
+# Result fan-out: every analysed frame is published to its session's topic,
+# watched through /sessions/{session_id}/watch (websocket) and /events (SSE)
+PUBSUB_BUFFER_SIZE = int(os.getenv("PUBSUB_BUFFER_SIZE", "64"))  # Results kept per watched session
+VIEWER_MAX_LAG = int(os.getenv("VIEWER_MAX_LAG", "8"))  # Results a viewer may fall behind before its policy applies
+VIEWER_POLICY = os.getenv("VIEWER_POLICY", "drop_oldest")  # "drop_oldest" or "close" for lagging viewers
+
+# Optional motion gate in front of the detector: "off", "diff" or "mog2"
+MOTION_GATE = os.getenv("MOTION_GATE", "off")
+MOTION_GATE_THRESHOLD = int(os.getenv("MOTION_GATE_THRESHOLD", "25"))
+MOTION_GATE_REFRESH = int(os.getenv("MOTION_GATE_REFRESH", "10"))  # Full-frame pass every N frames
+
+# Optional sliced inference for small distant targets: frames larger than a
+# tile are split into overlapping tiles detected at native resolution. A full
+# pass over a 1080p frame with 640 px tiles is 8 tiles plus the whole frame,
+# which takes two scheduler batches at the default BATCH_MAX_SIZE of 8; set
+# BATCH_MAX_SIZE to at least 9 (or SLICE_FULL_FRAME=0) for one detector call
+# per frame, at the cost of larger batches for every other caller
+SLICE_TILE_SIZE = int(os.getenv("SLICE_TILE_SIZE", "0"))  # 0 = off
+SLICE_OVERLAP = float(os.getenv("SLICE_OVERLAP", "0.2"))
+SLICE_FULL_FRAME = os.getenv("SLICE_FULL_FRAME", "1") == "1"  # Add a whole-frame pass for large objects
+SLICE_NMS_IOU = float(os.getenv("SLICE_NMS_IOU", "0.5"))  # Cross-tile duplicate suppression
+
+# Optional keyframe mode: the detector only runs on keyframes and tracked boxes
+# are carried across the frames in between with sparse optical flow; the
+# interval adapts to how well flow holds the tracks
+KEYFRAME_MAX_INTERVAL = int(os.getenv("KEYFRAME_MAX_INTERVAL", "1"))  # 1 = detect every frame
+KEYFRAME_MIN_QUALITY = float(os.getenv("KEYFRAME_MIN_QUALITY", "0.5"))  # Share of flow points kept below which a keyframe is forced
+
+# Video pipeline configuration
+VIDEO_ACTIVE_STRIDE = int(os.getenv("VIDEO_ACTIVE_STRIDE", "1"))  # Stride while objects are tracked
+VIDEO_IDLE_STRIDE = int(os.getenv("VIDEO_IDLE_STRIDE", "3"))  # Stride while the scene is empty
+VIDEO_FRAME_SIZE = int(os.getenv("VIDEO_FRAME_SIZE", "640"))  # Square resize, 0 to keep native size (always native when slicing)
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", "8"))  # Frames buffered per pipeline stage
+
+# Prometheus metrics exposed at /metrics: per-stage timings, frame counters and
+# service state gauges (see metrics.py)
+metrics_registry = Registry(prefix="airborne_")
+STAGE_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+stage_seconds = metrics_registry.histogram("stage_seconds", "Time spent on a frame in each processing stage",
+                                           STAGE_BUCKETS, labels=("stage",))
+frame_seconds = metrics_registry.histogram("frame_seconds", "End-to-end time per frame",
+                                           STAGE_BUCKETS, labels=("endpoint",))
+frames_received = metrics_registry.counter("frames_received_total", "Frames received", labels=("endpoint",))
+frames_dropped = metrics_registry.counter("frames_dropped_total", "Frames shed without analysis",
+                                          labels=("endpoint",))
+detections_total = metrics_registry.counter("detections_total", "Objects returned by the detector")
+ws_messages_sent = metrics_registry.counter("ws_messages_sent_total", "Result messages sent to websocket viewers",
+                                            labels=("results",))
+ws_bytes_sent = metrics_registry.counter("ws_bytes_sent_total", "Result bytes sent to websocket viewers",
+                                         labels=("results",))
+ws_results_unsent = metrics_registry.counter("ws_results_unsent_total",
+                                             "Delta viewer frames with nothing to send or over the viewer's rate")
+metrics_registry.gauge("viewers_active", "Subscribers watching session results",
+                       function=lambda: pubsub.subscribers() if pubsub is not None else 0)
+metrics_registry.counter("viewer_results_published_total", "Results published to watched sessions",
+                         function=lambda: pubsub.published if pubsub is not None else 0)
+metrics_registry.counter("viewer_results_delivered_total", "Results read by session viewers",
+                         function=lambda: pubsub.delivered if pubsub is not None else 0)
+metrics_registry.counter("viewer_results_dropped_total", "Results lagging session viewers skipped",
+                         function=lambda: pubsub.dropped if pubsub is not None else 0)
+model_load_seconds = metrics_registry.gauge("model_load_seconds", "Time taken to load the detector at startup")
+metrics_registry.gauge("sessions_active", "Live stream sessions",
+                       function=lambda: len(sessions) if sessions is not None else 0)
+metrics_registry.gauge("tracks_live", "Tracks held across all sessions",
+                       function=lambda: sessions.live_tracks() if sessions is not None else 0)
+metrics_registry.counter("sessions_evicted_total", "Sessions evicted for idleness or the session cap",
+                         function=lambda: sessions.evicted if sessions is not None else 0)
+metrics_registry.gauge("inference_queue_depth", "Frames waiting for the detector",
+                       function=lambda: scheduler.queue_depth if scheduler is not None else 0)
+metrics_registry.counter("inference_frames_total", "Frames run through the detector",
+                         function=lambda: scheduler.frames_processed if scheduler is not None else 0)
+
+def detector_counter(name: str) -> int:
+    return scheduler.detector_counters.get(name, 0) if scheduler is not None else 0
+
+metrics_registry.counter("cascade_screened_total", "Detections found by the cascade screener",
+                         function=lambda: detector_counter("screened"))
+metrics_registry.counter("cascade_escalated_total", "Screener detections sent to the large model",
+                         function=lambda: detector_counter("escalated"))
+metrics_registry.counter("cascade_crops_total", "Crops run through the large model",
+                         function=lambda: detector_counter("crops"))
+metrics_registry.gauge("ingest_sources", "Registered ingest sources",
+                       function=lambda: len(ingest) if ingest is not None else 0)
+metrics_registry.counter("ingest_frames_read_total", "Frames decoded from ingest sources",
+                         function=lambda: ingest.frames_read if ingest is not None else 0)
+metrics_registry.counter("ingest_frames_dropped_total", "Ingest frames shed by stride or replaced before analysis",
+                         function=lambda: ingest.frames_dropped if ingest is not None else 0)
+metrics_registry.counter("result_cache_exact_hits_total", "Frames served from the detection cache by content hash",
+                         function=lambda: result_cache.exact_hits if result_cache is not None else 0)
+metrics_registry.counter("result_cache_near_hits_total", "Frames served from the detection cache as near-duplicates",
+                         function=lambda: result_cache.near_hits if result_cache is not None else 0)
+metrics_registry.counter("result_cache_misses_total", "Frames looked up in the detection cache and sent to the detector",
+                         function=lambda: result_cache.misses if result_cache is not None else 0)
+metrics_registry.gauge("result_cache_entries", "Frames held in the detection cache",
+                       function=lambda: len(result_cache) if result_cache is not None else 0)
+metrics_registry.gauge("result_cache_bytes", "Approximate memory held by the detection cache",
+                       function=lambda: result_cache.nbytes if result_cache is not None else 0)
+
+# Stage timers resolved once so the hot path skips the label lookup; on
+# traced frames each stage also adds a span to the frame's trace
+STAGE_STREAM_WAIT = Stage("stream_wait", stage_seconds.labels("stream_wait"))
+STAGE_BASE64_DECODE = Stage("base64_decode", stage_seconds.labels("base64_decode"))
+STAGE_IMAGE_DECODE = Stage("image_decode", stage_seconds.labels("image_decode"))
+STAGE_PLAN = Stage("plan", stage_seconds.labels("plan"))
+STAGE_CACHE = Stage("cache", stage_seconds.labels("cache"))
+STAGE_DETECT = Stage("detect", stage_seconds.labels("detect"))
+STAGE_FLOW = Stage("flow", stage_seconds.labels("flow"))
+STAGE_TRACKER = Stage("tracker", stage_seconds.labels("tracker"))
+STAGE_KALMAN = Stage("kalman", stage_seconds.labels("kalman"))
+STAGE_THREAT = Stage("threat", stage_seconds.labels("threat"))
+STAGE_RESPONSE = Stage("response", stage_seconds.labels("response"))
+STAGE_ENCODE = Stage("encode", stage_seconds.labels("encode"))
+STAGE_SEND = Stage("send", stage_seconds.labels("send"))
+VIDEO_STAGES = {name: Stage(name, stage_seconds.labels(name)) for name in ("video_decode", "prepare")}
+
+# Opt-in per-frame tracing: a sampled fraction of frames records a span
+# timeline, kept in a ring buffer and exported as Chrome trace JSON at /traces/export
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # 0 = off, 1 = every frame
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))  # Frames kept
+TRACE_MIN_FRAME_MS = float(os.getenv("TRACE_MIN_FRAME_MS", "0"))  # Keep only frames at least this slow
+tracer = Tracer(sample_rate=TRACE_SAMPLE_RATE, capacity=TRACE_BUFFER_SIZE, min_duration_ms=TRACE_MIN_FRAME_MS)
+
+# Thread pool for image decoding and tracking so they don't block the event loop
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
 
 # Class names mapping (adjust based on your model's classes)
 class_names = {
@@ -85,404 +332,756 @@ class_names = {
     2: ObjectType.HELICOPTER,
     # Add more class mappings as needed
 }
+if MODELS_FILE:
+    # The multi-model detector already reports taxonomy indices
+    class_names = dict(enumerate(ObjectType))
+
+# Detector runtime and weights, as passed to each inference worker
+def detector_config() -> dict:
+    config = {
+        "backend": DETECTOR_BACKEND,
+        "path": MODEL_PATH,
+        "imgsz": DETECTOR_IMGSZ,
+        "half": DETECTOR_HALF,
+    }
+    if MODELS_FILE:
+        return {**config, "backend": "multi", "path": MODELS_FILE,
+                "taxonomy": [object_type.value for object_type in ObjectType]}
+    if not CASCADE_ENABLED:
+        return config
+    return {
+        **config,
+        "backend": "cascade",
+        "confirmer_backend": DETECTOR_BACKEND,
+        "screener": {
+            "backend": CASCADE_SCREENER_BACKEND,
+            "path": CASCADE_SCREENER_PATH,
+            "imgsz": CASCADE_SCREENER_IMGSZ,
+            "conf": CASCADE_SCREENER_CONF,
+            "half": DETECTOR_HALF,
+        },
+        "escalate_below": CASCADE_ESCALATE_BELOW,
+        "escalate_classes": CASCADE_ESCALATE_CLASSES,
+        "crop_padding": CASCADE_CROP_PADDING,
+    }
 
 # Load model on startup
 @app.on_event("startup")
 async def startup_event():
-    global model, tracker
+    global scheduler, sessions, zones, threat_rules, result_cache, ingest, pubsub
     try:
-        # Load YOLOv8 model with the specified path
-        model = YOLO(r"D:\AB2_PS01\runs\detect\train_fast\weights\best.pt")
+        if MODELS_FILE and CASCADE_SCREENER_PATH:
+            logger.warning("Both MODELS_FILE and CASCADE_SCREENER_PATH are set; "
+                           "using the multi-model detector and ignoring the cascade")
+        # Load detector replicas with the specified path on the execution backend
+        load_started = time.perf_counter()
+        backend = await asyncio.get_running_loop().run_in_executor(
+            None, create_backend, INFERENCE_BACKEND, detector_config(),
+            INFERENCE_WORKERS, INFERENCE_CORES_PER_WORKER,
+            FRAME_RING_SLOTS, int(FRAME_RING_SLOT_MB * 1024 * 1024)
+        )
+        model_load_seconds.set(time.perf_counter() - load_started)
         logger.info("YOLOv8 model loaded successfully")
+
+        # Start the shared micro-batching queue in front of the model
+        scheduler = InferenceScheduler(
+            backend,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            max_queue_size=BATCH_MAX_QUEUE
+        )
+        await scheduler.start()
+        # The scheduler is recreated on restart, so its histograms are re-registered
+        metrics_registry.register("inference_batch_size", "Frames per detector batch", scheduler.batch_size_hist)
+        metrics_registry.register("inference_queue_wait_seconds", "Time frames wait for a detector batch",
+                                  scheduler.queue_wait_hist)
+        metrics_registry.register("inference_batch_seconds", "Detector time per batch", scheduler.batch_latency_hist)
+        
+        zones = ZoneEngine(grid_size=ZONE_GRID_SIZE)
+        if ZONES_FILE:
+            zones.load(ZONES_FILE)
+            logger.info(f"Loaded restricted zones for cameras {zones.cameras()} from {ZONES_FILE}")
         
-        # Initialize object tracker (using DeepSORT principles)
-        tracker = Tracker(
-            distance_function="euclidean", 
-            distance_threshold=50,
-            initialization_delay=3
+        # Each stream session gets its own tracker (using DeepSORT principles)
+        sessions = SessionManager(
+            create_tracker,
+            ttl_seconds=SESSION_TTL_SECONDS,
+            max_sessions=MAX_SESSIONS,
+            create_motion_gate=create_motion_gate if MOTION_GATE != "off" else None,
+            create_tile_planner=create_tile_planner if SLICE_TILE_SIZE > 0 else None,
+            create_track_store=create_track_store,
+            create_flow_tracker=create_flow_tracker if KEYFRAME_MAX_INTERVAL > 1 else None,
+            on_remove=release_session
         )
-        logger.info("Object tracker initialized")
+        background_tasks.append(asyncio.create_task(sessions.run_eviction()))
+        logger.info("Session manager initialized")
+        
+        threat_rules = ThreatRules(THREAT_RULES_FILE, [object_type.value for object_type in ObjectType])
+        background_tasks.append(asyncio.create_task(threat_rules.watch(THREAT_RULES_RELOAD_SECONDS)))
+        
+        if RESULT_CACHE_SIZE > 0:
+            result_cache = DetectionCache(
+                max_entries=RESULT_CACHE_SIZE,
+                max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+                ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+                near_distance=RESULT_CACHE_NEAR_DISTANCE
+            )
+            background_tasks.append(asyncio.create_task(result_cache.run_expiry()))
+        
+        pubsub = PubSub(capacity=PUBSUB_BUFFER_SIZE)
+        
+        ingest = IngestManager(analyze_source_frame, create_stream_rate_control)
+        if INGEST_SOURCES_FILE:
+            ingest.load(INGEST_SOURCES_FILE)
     except Exception as e:
         logger.error(f"Failed to load model or initialize tracker: {e}")
         raise
 
-# Kalman Filter Initialization
-def create_kalman_filter():
-    kf = KalmanFilter(dim_x=4, dim_z=2)
-    kf.F = np.array([
-        [1, 0, 1, 0], 
-        [0, 1, 0, 1], 
-        [0, 0, 1, 0], 
-        [0, 0, 0, 1]
-    ])  # State transition matrix
-    kf.H = np.array([
-        [1, 0, 0, 0], 
-        [0, 1, 0, 0]
-    ])  # Measurement function
-    kf.P *= 1000  # Covariance matrix
-    kf.R = np.array([
-        [5, 0], 
-        [0, 5]
-    ])  # Measurement noise
-    kf.Q = np.eye(4) * 0.1  # Process noise
-    return kf
-
-# Threat Level Assessment
-def assess_threat(object_type: ObjectType, speed: float, direction: float, 
-                  position: List[float], frame_shape: Tuple[int, int]) -> ThreatLevel:
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    if ingest is not None:
+        await ingest.stop()
+    if scheduler is not None:
+        await scheduler.stop()
+    cpu_executor.shutdown(wait=False)
+
+# Run CPU-bound work (decoding, tracking) on the CPU pool
+async def run_cpu(func, *args):
+    # Carry the frame's trace (a context variable) over to the pool thread
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, context.run, func, *args)
+
+# Object tracker initialization
+def create_tracker() -> Tracker:
+    return Tracker(
+        distance_function="euclidean", 
+        distance_threshold=50,
+        initialization_delay=3
+    )
+
+# Per-session track store initialization
+def create_track_store() -> TrackStore:
+    return TrackStore(
+        history_length=TRACK_HISTORY_LENGTH,
+        max_tracks=TRACK_MAX_PER_SESSION,
+        max_age_seconds=TRACK_MAX_AGE_SECONDS
+    )
+
+# Per-session motion gate initialization
+def create_motion_gate() -> MotionGate:
+    return MotionGate(
+        method=MOTION_GATE,
+        threshold=MOTION_GATE_THRESHOLD,
+        refresh_every=MOTION_GATE_REFRESH
+    )
+
+# Per-session sliced inference planner initialization
+def create_tile_planner() -> TilePlanner:
+    return TilePlanner(
+        tile_size=SLICE_TILE_SIZE,
+        overlap=SLICE_OVERLAP,
+        full_frame=SLICE_FULL_FRAME
+    )
+
+# Per-session keyframe scheduler initialization
+def create_flow_tracker() -> FlowTracker:
+    return FlowTracker(
+        max_interval=KEYFRAME_MAX_INTERVAL,
+        min_quality=KEYFRAME_MIN_QUALITY
+    )
+
+# Per-stream adaptive stride and load shedding initialization
+def create_stream_rate_control() -> AdaptiveStride:
+    return AdaptiveStride(
+        latency_budget_ms=STREAM_LATENCY_BUDGET_MS,
+        active_stride=STREAM_ACTIVE_STRIDE,
+        idle_stride=STREAM_IDLE_STRIDE,
+        max_stride=STREAM_MAX_STRIDE
+    )
+
+# State kept outside a session: its compiled zones, and its viewers, who get
+# an end-of-stream message, whether the session was removed or evicted
+def release_session(session_id: str):
+    zones.release(session_id)
+    if pubsub is not None:
+        pubsub.close(session_id)
+
+# Per-connection delta encoder initialization
+def create_delta_encoder(max_rate_hz: float = 0.0) -> DeltaEncoder:
+    return DeltaEncoder(
+        types=[object_type.value for object_type in ObjectType],
+        levels=THREAT_LEVELS,
+        quantum=WS_DELTA_QUANTUM_PX,
+        keyframe_seconds=WS_DELTA_KEYFRAME_SECONDS,
+        max_rate_hz=max_rate_hz
+    )
+
+# Decode an encoded image buffer into a BGR frame
+def decode_image(contents: bytes) -> Optional[np.ndarray]:
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def track_detections(session: StreamContext, raw_detections: np.ndarray,
+                     frame_shape: Tuple[int, int]) -> DetectionResponse:
     """
-    Assess threat level based on object type, speed, direction and position
+    Track detections, predict trajectories and assess threats for one frame
     
     Args:
-        object_type: Type of object (Airplane, Drone, Helicopter)
-        speed: Estimated speed of object
-        direction: Direction of movement in degrees
-        position: Current [x, y] position
+        session: Stream session owning the tracking state
+        raw_detections: (N, 6) array of [x1, y1, x2, y2, confidence, class_id] rows
         frame_shape: Frame dimensions [height, width]
-    
+        
     Returns:
-        Threat level enum
+        Detection response for the frame
     """
-    # Base threat level on object type - updated for the new object types
-    if object_type == ObjectType.AIRPLANE:
-        base_threat = ThreatLevel.HIGH
-    elif object_type == ObjectType.DRONE:
-        base_threat = ThreatLevel.HIGH
-    elif object_type == ObjectType.HELICOPTER:
-        base_threat = ThreatLevel.CRITICAL if speed > SPEED_THRESHOLD_HIGH else ThreatLevel.HIGH
-    else:  # unknown objects
-        base_threat = ThreatLevel.LOW
-    
-    # Calculate if object is approaching center (higher threat)
-    frame_center = [frame_shape[1] // 2, frame_shape[0] // 2]
-    vector_to_center = [frame_center[0] - position[0], frame_center[1] - position[1]]
-    
-    # Calculate angle between movement direction and center direction
-    if speed > 0:
-        movement_vector = [math.cos(math.radians(direction)), math.sin(math.radians(direction))]
-        dot_product = movement_vector[0] * vector_to_center[0] + movement_vector[1] * vector_to_center[1]
-        magnitude = math.sqrt(vector_to_center[0]*2 + vector_to_center[1]*2)
+    with session.lock:
+        session.touch()
+        return _track_detections(session, raw_detections, frame_shape)
+
+def _track_detections(session: StreamContext, raw_detections: np.ndarray,
+                      frame_shape: Tuple[int, int]) -> DetectionResponse:
+    clock = StageClock()
+    session.frame_counter += 1
+    tracks = session.tracks
+    now = time.time()
+    detections_total.inc(len(raw_detections))
+    
+    # Convert raw detections for tracking; points and scores are row views of
+    # arrays computed for all detections at once
+    detections = []
+    boxes = raw_detections.astype(np.float64)
+    centres = (boxes[:, :2] + boxes[:, 2:4]) / 2
+    
+    for index, (x1, y1, x2, y2, confidence, class_id) in enumerate(raw_detections.tolist()):
+        # Store detection data for tracking
+        detection = Detection(
+            points=centres[index:index + 1],
+            scores=boxes[index, 4:5],
+            data={"bbox": [x1, y1, x2, y2], "class_id": int(class_id)}
+        )
+        detections.append(detection)
+    
+    # Update tracker with new detections
+    tracked_objects = session.tracker.update(detections=detections)
+    clock.lap(STAGE_TRACKER)
+    
+    # Evict state of tracks the tracker has dropped or that went stale
+    tracks.prune([tracked_obj.id for tracked_obj in session.tracker.tracked_objects], now)
+    
+    # Update the Kalman filters and position histories of all tracked objects in one batched step
+    slots = [tracks.touch(tracked_obj.id, now).slot for tracked_obj in tracked_objects]
+    points = np.array([tracked_obj.estimate[0] for tracked_obj in tracked_objects]).reshape(-1, 2)
+    tracks.kalman.predict(slots)
+    tracks.kalman.update(slots, points)
+    tracks.append(slots, points, now)
+    predicted_positions = tracks.kalman.positions(slots).tolist()
+    clock.lap(STAGE_KALMAN)
+    
+    # Speed (pixels per second) and direction from each object's last two positions
+    steps, step_times = tracks.last_step(slots)
+    moving = (step_times > 0)[:, None]
+    velocities = np.divide(steps, step_times[:, None], out=np.zeros_like(steps), where=moving)
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    directions = np.where(moving[:, 0], np.degrees(np.arctan2(steps[:, 1], steps[:, 0])), 0.0)
+    # The Kalman state advances one frame per step
+    kalman_velocities = np.divide(tracks.kalman.velocities(slots), step_times[:, None],
+                                  out=np.zeros_like(steps), where=moving)
+    
+    object_types = [class_names.get(tracked_obj.last_detection.data["class_id"], ObjectType.UNKNOWN)
+                    for tracked_obj in tracked_objects]
+    confidences = np.array([tracked_obj.last_detection.scores[0] for tracked_obj in tracked_objects], dtype=np.float64)
+    
+    # Test all tracked boxes against the camera's restricted zones at once
+    zone_names = [None] * len(tracked_objects)
+    zone_priorities = np.full(len(tracked_objects), -1)
+    zone_floors = np.full(len(tracked_objects), -1)
+    dwell = np.zeros(len(tracked_objects))
+    bboxes = np.array([tracked_obj.last_detection.data["bbox"] for tracked_obj in tracked_objects]).reshape(-1, 4)
+    compiled_zones = zones.compiled(session.session_id) if zones is not None else None
+    if compiled_zones is not None:
+        primary_zones = compiled_zones.evaluate(bboxes, frame_shape).primary.tolist()
         
-        if magnitude > 0:
-            angle_to_center = math.acos(max(min(dot_product / magnitude, 1), -1))
-            approaching_center = abs(angle_to_center) < math.radians(APPROACH_ANGLE_THRESHOLD)
-        else:
-            approaching_center = False
-    else:
-        approaching_center = False
+        for index, (tracked_obj, zone_index) in enumerate(zip(tracked_objects, primary_zones)):
+            zone = compiled_zones.zones[zone_index] if zone_index >= 0 else None
+            zone_name = zone.name if zone is not None else None
+            
+            # Record zone entries as intrusion events
+            record = tracks.get(tracked_obj.id)
+            if zone_name != record.zone:
+                record.zone, record.zone_since = zone_name, now
+                if zone is not None:
+                    zones.record_intrusion(zone.name)
+                    logger.warning(f"Object {tracked_obj.id} ({object_types[index].value}) entered restricted "
+                                   f"zone '{zone.name}' in session {session.session_id}")
+            
+            if zone is not None:
+                zone_names[index] = zone_name
+                zone_priorities[index] = zone.priority
+                zone_floors[index] = THREAT_LEVELS.index(zone.threat_level)
+                dwell[index] = now - record.zone_since
+    
+    # Assess the threat level of all objects at once, then smooth it per track
+    features = ThreatFeatures(
+        type_index=np.array([OBJECT_TYPE_INDEX[object_type] for object_type in object_types], dtype=np.int64),
+        position=points,
+        velocity=velocities,
+        kalman_velocity=kalman_velocities,
+        confidence=confidences,
+        zone_priority=zone_priorities,
+        zone_floor=zone_floors,
+        dwell=dwell
+    )
+    raw_levels, rules = threat_rules.evaluate(features, frame_shape)
+    threat_levels = tracks.smooth_threat(slots, raw_levels, rules.raise_frames, rules.lower_frames).tolist()
+    clock.lap(STAGE_THREAT)
     
-    # Escalate threat level based on speed and approach angle
-    if approaching_center:
-        if speed > SPEED_THRESHOLD_CRITICAL:
-            return ThreatLevel.CRITICAL
-        elif speed > SPEED_THRESHOLD_HIGH and base_threat != ThreatLevel.CRITICAL:
-            return ThreatLevel.HIGH
+    # Process tracked objects
+    response_objects = []
     
-    return base_threat
+    for tracked_obj, object_type, confidence, predicted_position, speed, direction, threat_level, zone_name in zip(
+            tracked_objects, object_types, confidences.tolist(), predicted_positions,
+            speeds.tolist(), directions.tolist(), threat_levels, zone_names):
+        x1, y1, x2, y2 = tracked_obj.last_detection.data["bbox"]
+        
+        # Create response object
+        detected_obj = DetectedObject(
+            id=tracked_obj.id,
+            object_type=object_type,
+            confidence=confidence,
+            bbox=[int(x1), int(y1), int(x2), int(y2)],
+            predicted_position=[int(predicted_position[0]), int(predicted_position[1])],
+            speed=round(speed, 2),
+            direction=round(direction, 2),
+            threat_level=THREAT_ORDER[threat_level],
+            zone=zone_name
+        )
+        
+        response_objects.append(detected_obj)
+    
+    # Create final response
+    response = DetectionResponse(
+        frame_id=session.frame_counter,
+        timestamp=time.time(),
+        objects=response_objects,
+        session_id=session.session_id
+    )
+    # The same objects as one array for delta viewers, who encode from it
+    # instead of walking the models (see ws_delta.py)
+    response._tracks = TrackTable(np.column_stack([
+        [tracked_obj.id for tracked_obj in tracked_objects], features.type_index, confidences,
+        np.trunc(bboxes), np.trunc(np.array(predicted_positions).reshape(-1, 2)),
+        np.round(speeds, 2), np.round(directions, 2), threat_levels
+    ]).astype(np.float64), zone_names)
+    clock.lap(STAGE_RESPONSE)
+    return response
+
+def tracked_boxes(session: StreamContext) -> List[List[float]]:
+    # Last detected box of every track, re-centred on the tracker's estimate
+    boxes = []
+    for tracked_obj in session.tracker.tracked_objects:
+        x1, y1, x2, y2 = tracked_obj.last_detection.data["bbox"]
+        cx, cy = tracked_obj.estimate[0]
+        half_w, half_h = (x2 - x1) / 2, (y2 - y1) / 2
+        boxes.append([cx - half_w, cy - half_h, cx + half_w, cy + half_h])
+    return boxes
+
+def plan_detection(session: StreamContext, frame: np.ndarray) -> List[Region]:
+    """
+    Decide which parts of a frame the detector should see
+    
+    Args:
+        session: Stream session the frame belongs to
+        frame: Decoded BGR frame
+        
+    Returns:
+        Regions to detect in (the whole frame, a motion crop or tiles), empty
+        when the motion gate finds a static frame, None when the frame's
+        boxes are carried over by optical flow: frames that aren't keyframes
+        and keyframes the motion gate finds static
+    """
+    height, width = frame.shape[:2]
+    gate = session.motion_gate
+    planner = session.tile_planner
+    
+    if session.flow_tracker is not None:
+        with session.lock:
+            if not session.flow_tracker.keyframe_due():
+                return None
+    
+    if planner is None:
+        if gate is None:
+            return [(0, 0, width, height)]
+        with session.lock:
+            region = gate.plan(frame)
+        regions = [region] if region is not None else []
+    else:
+        with session.lock:
+            motion = gate.update(frame) if gate is not None else None
+            regions = planner.plan(width, height, motion, tracked_boxes(session))
+            if gate is not None and not regions:
+                gate.frames_skipped += 1
+    
+    # A skipped keyframe must not reseed the flow tracker with no boxes,
+    # which would drop every track exactly when the scene is static
+    if not regions and session.flow_tracker is not None:
+        return None
+    return regions
 
-# Predict trajectory
-def predict_trajectory(kf: KalmanFilter, steps: int = 5) -> List[List[float]]:
+async def detect_regions(frame: np.ndarray, regions: Optional[List[Region]],
+                         data: Optional[bytes] = None) -> Optional[np.ndarray]:
     """
-    Predict future positions based on Kalman filter state
+    Run the detector on regions of a frame through the shared inference queue
     
     Args:
-        kf: Kalman filter object
-        steps: Number of future steps to predict
+        frame: Decoded BGR frame
+        regions: Regions from plan_detection, empty to skip detection
+        data: Encoded bytes the frame was decoded from, the detection cache's exact key
         
     Returns:
-        List of predicted [x, y] positions
+        (N, 6) detections in full-frame coordinates, None for frames left to
+        optical flow
     """
-    predictions = []
-    current_state = kf.x.copy()
-    
-    for _ in range(steps):
-        # Apply state transition matrix to predict next state
-        next_state = np.dot(kf.F, current_state)
-        predictions.append([float(next_state[0]), float(next_state[1])])
-        current_state = next_state
+    if regions is None:
+        return None
+    if not regions:
+        return EMPTY_DETECTIONS
+    
+    lookup = None
+    if result_cache is not None:
+        started = time.perf_counter()
+        lookup = await run_cpu(result_cache.get, frame, regions, data)
+        STAGE_CACHE.record(started, time.perf_counter())
+        if lookup.detections is not None:
+            return lookup.detections
+    
+    started = time.perf_counter()
+    if regions == [(0, 0, frame.shape[1], frame.shape[0])]:
+        detections = await scheduler.submit(frame)
+    else:
+        # All crops are queued together so they share a detector batch
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        detections = merge_detections(await scheduler.submit_many(crops), regions, iou_threshold=SLICE_NMS_IOU)
+    STAGE_DETECT.record(started, time.perf_counter())
+    if lookup is not None:
+        result_cache.put(lookup, detections)
+    return detections
+
+async def analyze_image(session: StreamContext, frame: np.ndarray,
+                        data: Optional[bytes] = None) -> DetectionResponse:
+    """
+    Run a decoded frame through the shared inference queue and the session's tracker,
+    publishing the result to the session's viewers
+    
+    Args:
+        session: Stream session the frame belongs to
+        frame: Decoded BGR frame
+        data: Encoded bytes the frame was decoded from, if any (see detect_regions)
         
-    return predictions
+    Returns:
+        Detection response for the frame
+    """
+    started = time.perf_counter()
+    regions = await run_cpu(plan_detection, session, frame)
+    STAGE_PLAN.record(started, time.perf_counter())
+    raw_detections = await detect_regions(frame, regions, data)
+    result = await track_frame(session, raw_detections, frame)
+    # Viewers watching the session get the same result without another pipeline
+    pubsub.publish(session.session_id, result)
+    return result
 
 @app.post("/analyze/", response_model=DetectionResponse)
-async def analyze_frame(file: UploadFile = File(...)):
+async def analyze_frame(file: UploadFile = File(...), session_id: Optional[str] = Query(None)):
     """
     Process a single frame to detect, track, predict trajectories, and assess threats
     
     Args:
         file: Uploaded image file
+        session_id: Stream session to track the frame in (shared default session if omitted)
         
     Returns:
         JSON response with detection and tracking information
     """
-    global frame_counter
-    frame_counter += 1
+    # Read and decode the image
+    started = time.perf_counter()
+    frames_received.labels("analyze").inc()
+    trace = tracer.begin(session_id or DEFAULT_SESSION_ID, "analyze", started)
+    tracing.activate(trace)
+    contents = await file.read()
+    frame = await run_cpu(decode_image, contents)
+    STAGE_IMAGE_DECODE.record(started, time.perf_counter())
+    
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Invalid image file")
     
     try:
-        # Read and decode the image
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if frame is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-        
-        # Process frame with YOLO model
-        results = model(frame, verbose=False)
-        
-        # Extract detections
-        detections = []
-        detection_classes = []
-        detection_confidences = []
-        
-        for result in results:
-            boxes = result.boxes
-            for i, box in enumerate(boxes):
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                confidence = box.conf.item()
-                class_id = int(box.cls.item())
-                
-                # Store detection data for tracking
-                detection = Detection(
-                    points=np.array([[(x1 + x2) / 2, (y1 + y2) / 2]]),
-                    scores=np.array([confidence]),
-                    data={"bbox": [x1, y1, x2, y2], "class_id": class_id}
-                )
-                detections.append(detection)
-                detection_classes.append(class_id)
-                detection_confidences.append(confidence)
-        
-        # Update tracker with new detections
-        tracked_objects = tracker.update(detections=detections)
-        
-        # Process tracked objects
-        response_objects = []
-        frame_height, frame_width = frame.shape[:2]
-        
-        for tracked_obj in tracked_objects:
-            object_id = tracked_obj.id
-            tracked_point = tracked_obj.estimate[0]  # [x, y]
-            object_data = tracked_obj.last_detection.data
-            
-            x1, y1, x2, y2 = object_data["bbox"]
-            class_id = object_data["class_id"]
-            confidence = tracked_obj.last_detection.scores[0]
-            
-            # Get object type from class_id
-            object_type = class_names.get(class_id, ObjectType.UNKNOWN)
-            
-            # Update Kalman filter for this object
-            if object_id not in object_trajectories:
-                object_trajectories[object_id] = create_kalman_filter()
-                object_history[object_id] = []
-            
-            kf = object_trajectories[object_id]
-            
-            # Update history
-            object_history[object_id].append((tracked_point, time.time()))
-            if len(object_history[object_id]) > 30:  # Keep last 30 positions
-                object_history[object_id].pop(0)
-            
-            # Update Kalman filter with new measurement
-            kf.predict()
-            kf.update(np.array([tracked_point]))
-            
-            # Calculate speed and direction
-            if len(object_history[object_id]) >= 2:
-                prev_pos, prev_time = object_history[object_id][-2]
-                current_pos, current_time = object_history[object_id][-1]
-                
-                time_diff = current_time - prev_time
-                if time_diff > 0:
-                    # Pixels per second
-                    dx = current_pos[0] - prev_pos[0]
-                    dy = current_pos[1] - prev_pos[1]
-                    distance = math.sqrt(dx*2 + dy*2)
-                    speed = distance / time_diff  # pixels per second
-                    
-                    # Direction in degrees
-                    direction = math.degrees(math.atan2(dy, dx))
-                else:
-                    speed = 0
-                    direction = 0
-            else:
-                speed = 0
-                direction = 0
-            
-            # Predict future position (next frame)
-            predicted_position = kf.x[:2].flatten().tolist()
-            
-            # Get full trajectory prediction
-            future_trajectory = predict_trajectory(kf, steps=10)
-            
-            # Assess threat level
-            threat_level = assess_threat(
-                object_type=object_type,
-                speed=speed,
-                direction=direction,
-                position=tracked_point,
-                frame_shape=(frame_height, frame_width)
-            )
-            
-            # Create response object
-            detected_obj = DetectedObject(
-                id=object_id,
-                object_type=object_type,
-                confidence=float(confidence),
-                bbox=[int(x1), int(y1), int(x2), int(y2)],
-                predicted_position=[int(predicted_position[0]), int(predicted_position[1])],
-                speed=round(speed, 2),
-                direction=round(direction, 2),
-                threat_level=threat_level
-            )
-            
-            response_objects.append(detected_obj)
-        
-        # Create final response
-        response = DetectionResponse(
-            frame_id=frame_counter,
-            timestamp=time.time(),
-            objects=response_objects
-        )
-        
-        return response
+        session = sessions.get_or_create(session_id or DEFAULT_SESSION_ID)
+        result = await analyze_image(session, frame, contents)
+        frame_seconds.labels("analyze").observe(time.perf_counter() - started)
+        tracer.end(trace, result.frame_id)
+        return result
     
     except Exception as e:
         logger.error(f"Error processing frame: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing frame: {str(e)}")
 
+def propagate_detections(session: StreamContext, frame: np.ndarray,
+                         raw_detections: Optional[np.ndarray]) -> np.ndarray:
+    # Keyframes reseed the flow tracker; other frames get its flow-carried boxes
+    started = time.perf_counter()
+    with session.lock:
+        detections = session.flow_tracker.step(frame, raw_detections)
+    if raw_detections is None:
+        STAGE_FLOW.record(started, time.perf_counter())
+    return detections
+
+async def track_frame(session: StreamContext, raw_detections: Optional[np.ndarray],
+                      frame: np.ndarray) -> DetectionResponse:
+    if session.flow_tracker is not None:
+        raw_detections = await run_cpu(propagate_detections, session, frame, raw_detections)
+    return await run_cpu(track_detections, session, raw_detections, frame.shape)
+
 @app.post("/analyze_video/")
-async def analyze_video(file: UploadFile = File(...)):
+async def analyze_video(file: UploadFile = File(...), stream: Optional[str] = Query(None)):
     """
     Process a video file for airborne threat detection
     
     Args:
         file: Uploaded video file
+        stream: "ndjson" or "sse" to stream progress events while the video is
+            processed; omit to wait for the summary only
     
     Returns:
-        JSON response with detection and tracking summary
+        JSON response with detection and tracking summary, or a stream of
+        progress events ending with the summary
     """
-    try:
-        # Save uploaded video to a temporary file
-        temp_file = f"temp_video_{int(time.time())}.mp4"
-        with open(temp_file, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        # Process video
-        cap = cv2.VideoCapture(temp_file)
-        if not cap.isOpened():
-            raise HTTPException(status_code=400, detail="Failed to open video file")
-        
-        # Initialize variables
-        global tracker, object_trajectories, object_history, frame_counter
-        tracker = Tracker(distance_function="euclidean", distance_threshold=50)
-        object_trajectories = {}
-        object_history = {}
-        frame_counter = 0
-        
-        results = []
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Resize frame to 640x640
-            frame = cv2.resize(frame, (640, 640), interpolation=cv2.INTER_AREA)
-
-            frame_counter += 1
-            if frame_counter % 3 != 0:  # Process every 3rd frame to improve speed
-                continue
-                
-            # Convert frame to bytes for processing
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = BytesIO(buffer).getvalue()
-            
-            # Create a simulated file upload
-            file_like = BytesIO(frame_bytes)
-            file_like.name = "frame.jpg"
-            
-            # Process the frame using our existing endpoint
-            # We'll create a custom UploadFile since we can't directly use the one from FastAPI
-            class MockUploadFile:
-                def _init_(self, file_like):
-                    self.file = file_like
-                
-                async def read(self):
-                    return self.file.read()
-            
-            mock_file = MockUploadFile(file_like)
-            result = await analyze_frame(mock_file)
-            results.append(result)
-            
-        cap.release()
-        
-        # Clean up
-        import os
+    if stream not in (None, "ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+    
+    # Save uploaded video to a temporary file, one chunk at a time
+    temp_file = await save_upload(file)
+    
+    # Track the upload in its own session
+    session = sessions.get_or_create()
+    summary = VideoSummary(
+        threat_labels={
+            ThreatLevel.LOW: "low",
+            ThreatLevel.HIGH: "high",
+            ThreatLevel.CRITICAL: "critical"
+        },
+        type_labels={
+            ObjectType.AIRPLANE: "airplanes",
+            ObjectType.DRONE: "drones",
+            ObjectType.HELICOPTER: "helicopters",
+            ObjectType.UNKNOWN: "unknown",
+            ObjectType.BIRD: "birds",
+            ObjectType.MISSILE: "missiles",
+            ObjectType.TANK: "tanks"
+        }
+    )
+    pipeline = VideoPipeline(
+        temp_file, session, summary,
+        plan=plan_detection,
+        submit=detect_regions,
+        track=track_frame,
+        run_cpu=run_cpu,
+        rate_control=AdaptiveStride(
+            latency_budget_ms=None,
+            active_stride=VIDEO_ACTIVE_STRIDE,
+            # In keyframe mode every frame is tracked; the keyframe interval sets the detector cost
+            idle_stride=VIDEO_IDLE_STRIDE if KEYFRAME_MAX_INTERVAL <= 1 else 1
+        ),
+        # Slicing needs the native resolution; squashing to 640 erases small targets
+        frame_size=(VIDEO_FRAME_SIZE, VIDEO_FRAME_SIZE) if VIDEO_FRAME_SIZE > 0 and SLICE_TILE_SIZE <= 0 else None,
+        queue_size=VIDEO_QUEUE_SIZE,
+        on_stage=lambda stage, start, end: VIDEO_STAGES[stage].record(start, end),
+        tracer=tracer
+    )
+    
+    def cleanup():
+        frames_received.labels("analyze_video").inc(pipeline.frames_read)
+        frames_dropped.labels("analyze_video").inc(pipeline.rate_control.frames_skipped)
+        sessions.remove(session.session_id)
         if os.path.exists(temp_file):
             os.remove(temp_file)
-            
-        # Return a summary of results
-        total_frames = len(results)
-        unique_objects = set()
-        threat_counts = {
-            ThreatLevel.LOW: 0,
-            ThreatLevel.HIGH: 0,
-            ThreatLevel.CRITICAL: 0
-        }
-        
-        object_type_counts = {
-            ObjectType.AIRPLANE: 0,
-            ObjectType.DRONE: 0,
-            ObjectType.HELICOPTER: 0,
-            ObjectType.UNKNOWN: 0
-        }
-        
-        for frame_result in results:
-            for obj in frame_result.objects:
-                unique_objects.add(obj.id)
-                threat_counts[obj.threat_level] += 1
-                object_type_counts[obj.object_type] += 1
-                
-        # Create summary response
-        summary = {
-            "total_frames_processed": total_frames,
-            "unique_objects_detected": len(unique_objects),
-            "threat_level_summary": {
-                "low": threat_counts[ThreatLevel.LOW],
-                "high": threat_counts[ThreatLevel.HIGH],
-                "critical": threat_counts[ThreatLevel.CRITICAL]
-            },
-            "object_type_summary": {
-                "airplanes": object_type_counts[ObjectType.AIRPLANE],
-                "drones": object_type_counts[ObjectType.DRONE],
-                "helicopters": object_type_counts[ObjectType.HELICOPTER],
-                "unknown": object_type_counts[ObjectType.UNKNOWN]
-            }
-        }
-        
-        return JSONResponse(content=summary)
+    
+    if stream is None:
+        try:
+            async for event in pipeline.events():
+                pass
+            return JSONResponse(content=summary.to_dict())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error processing video: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
+        finally:
+            cleanup()
+    
+    formatter = format_ndjson if stream == "ndjson" else format_sse
+    
+    async def event_stream():
+        try:
+            async for event in pipeline.events():
+                yield formatter(event)
+        except Exception as e:
+            logger.error(f"Error processing video: {str(e)}")
+            yield formatter({"event": "error", "detail": f"Error processing video: {str(e)}"})
+        finally:
+            cleanup()
+    
+    media_type = "application/x-ndjson" if stream == "ndjson" else "text/event-stream"
+    return StreamingResponse(event_stream(), media_type=media_type)
+
+def encode_result(viewer: ViewerSettings, result: DetectionResponse,
+                  header: Optional[FrameHeader] = None) -> Optional[Tuple[str, bool, object]]:
+    """
+    Encode a frame's result the way a websocket viewer asked for it
+    
+    Args:
+        viewer: The viewer's settings
+        result: Detection response for the frame
+        header: Header of the binary frame message the result answers, if any
         
-    except Exception as e:
-        logger.error(f"Error processing video: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
+    Returns:
+        (results mode, is_binary, payload), None when a delta viewer has nothing to be sent
+    """
+    if viewer.encoder is not None:
+        message = viewer.encoder.encode(result, header.seq if header is not None else None, result._tracks)
+        if message is None:
+            ws_results_unsent.inc()
+            return None
+        binary = viewer.msgpack or (header is not None and bool(header.flags & FLAG_MSGPACK_RESPONSE))
+        return ("delta", *encode_message(message, binary))
+    if header is not None:
+        return ("full", *encode_response(result, header))
+    return ("full", *encode_message(result.dict(), viewer.msgpack))
+
+async def send_encoded(websocket: WebSocket, mode: str, is_binary: bool, payload):
+    if is_binary:
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+    ws_messages_sent.labels(mode).inc()
+    ws_bytes_sent.labels(mode).inc(len(payload))
 
 # WebSocket endpoint for real-time video processing
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, session_id: Optional[str] = Query(None),
+                             results: str = Query("full"), max_rate: float = Query(0.0, ge=0.0)):
     await websocket.accept()
     
-    # Reset tracking for new connection
-    global tracker, object_trajectories, object_history, frame_counter
-    tracker = Tracker(distance_function="euclidean", distance_threshold=50)
-    object_trajectories = {}
-    object_history = {}
-    frame_counter = 0
+    # With results=delta the viewer gets track changes and periodic keyframes
+    # instead of a snapshot per frame (see ws_delta.py); a {"subscribe": {...}}
+    # message switches mode, rate or resolution and always brings a keyframe
+    try:
+        viewer = ViewerSettings(create_delta_encoder, results, max_rate)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close()
+        return
+    
+    # Each connection tracks in its own session; passing a session_id lets a
+    # client reconnect to (or share) an existing stream's tracks
+    session = sessions.get_or_create(session_id)
+    
+    # Frames are received independently of processing: the receiver applies
+    # the adaptive stride and leaves only the newest frame in a single slot,
+    # so a slow pipeline drops stale frames instead of queueing them
+    control = create_stream_rate_control()
+    slot = LatestFrameSlot()
+    session.rate_control = control
+    session.frame_slot = slot
+    received_counter = frames_received.labels("ws")
+    dropped_counter = frames_dropped.labels("ws")
+    e2e_histogram = frame_seconds.labels("ws")
+    
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                text = message.get("text")
+                if text is not None and len(text) <= WS_CONTROL_MAX_BYTES:
+                    # Control messages are short; legacy text frames carry a whole JPEG
+                    try:
+                        options = json.loads(text).get("subscribe")
+                        if options is not None:
+                            viewer.subscribe(options)
+                            continue
+                    except (ValueError, AttributeError) as e:
+                        logger.warning(f"Ignoring invalid websocket control message: {e}")
+                        continue
+                received_counter.inc()
+                if control.admit():
+                    replaced = slot.dropped
+                    slot.put((message, time.perf_counter()))
+                    if slot.dropped != replaced:
+                        dropped_counter.inc()
+                else:
+                    dropped_counter.inc()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            slot.close()
+    
+    async def send_result(result: DetectionResponse, header: Optional[FrameHeader], clock: StageClock):
+        encoded = encode_result(viewer, result, header)
+        clock.lap(STAGE_ENCODE)
+        if encoded is not None:
+            await send_encoded(websocket, *encoded)
+            clock.lap(STAGE_SEND)
+    
+    receiver = asyncio.create_task(receive_frames())
     
     try:
-        while True:
-            # Receive frame as base64 string
-            data = await websocket.receive_text()
-            json_data = json.loads(data)
+        while (item := await slot.get()) is not None:
+            message, received_at = item
+            trace = tracer.begin(session.session_id, "ws", received_at)
+            tracing.activate(trace)
+            STAGE_STREAM_WAIT.record(received_at, time.perf_counter())
+            clock = StageClock()
+            
+            if message.get("bytes") is not None:
+                # Binary frame: fixed header followed by raw JPEG/BGR/NV12 bytes
+                out = None
+                try:
+                    try:
+                        header, payload = parse_frame_message(message["bytes"])
+                        # NV12 converts into a recycled buffer; JPEG and raw BGR produce their own
+                        out = session.buffers.acquire((header.height, header.width, 3)) \
+                            if header.encoding == ENCODING_NV12 else None
+                        frame = await run_cpu(decode_frame, header, payload, out)
+                        clock.lap(STAGE_IMAGE_DECODE)
+                    except ValueError as e:
+                        await websocket.send_json({"error": str(e)})
+                        continue
+                    
+                    if frame is None:
+                        await websocket.send_json({"error": "Invalid frame data", "seq": header.seq})
+                        continue
+                    
+                    # The header may name another session so one socket can carry several cameras
+                    frame_session = session if header.session_id is None else sessions.get_or_create(header.session_id)
+                    if trace is not None:
+                        trace.session_id = frame_session.session_id
+                    result = await analyze_image(frame_session, frame, payload)
+                    clock.reset()  # Analysis stages time themselves
+                    
+                    await send_result(result, header, clock)
+                finally:
+                    # Malformed frames and failed analyses hand the buffer back too
+                    if out is not None:
+                        session.buffers.release(out)
+                e2e_histogram.observe(time.perf_counter() - received_at)
+                tracer.end(trace, result.frame_id)
+                control.record_result(time.perf_counter() - received_at, len(result.objects))
+                continue
+            
+            # Legacy text frame: JSON with a base64 JPEG
+            json_data = json.loads(message["text"])
             
             if "frame" not in json_data:
                 await websocket.send_json({"error": "No frame data received"})
@@ -490,38 +1089,306 @@ async def websocket_endpoint(websocket: WebSocket):
                 
             # Decode base64 image
             frame_data = base64.b64decode(json_data["frame"])
-            nparr = np.frombuffer(frame_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            clock.lap(STAGE_BASE64_DECODE)
+            frame = await run_cpu(decode_image, frame_data)
+            clock.lap(STAGE_IMAGE_DECODE)
             
             if frame is None:
                 await websocket.send_json({"error": "Invalid frame data"})
                 continue
-                
-            # Process the frame using our analyze_frame logic
-            # Convert frame to file-like object
-            _, buffer = cv2.imencode('.jpg', frame)
-            file_like = BytesIO(buffer.tobytes())
-            file_like.name = "frame.jpg"
-            
-            class MockUploadFile:
-                def _init_(self, file_like):
-                    self.file = file_like
-                
-                async def read(self):
-                    self.file.seek(0)
-                    return self.file.read()
-            
-            mock_file = MockUploadFile(file_like)
             
-            # Process frame
-            result = await analyze_frame(mock_file)
+            # Process frame through the shared inference queue
+            result = await analyze_image(session, frame, frame_data)
+            clock.reset()
             
             # Send results back to client
-            await websocket.send_json(result.dict())
+            await send_result(result, None, clock)
+            e2e_histogram.observe(time.perf_counter() - received_at)
+            tracer.end(trace, result.frame_id)
+            control.record_result(time.perf_counter() - received_at, len(result.objects))
             
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         await websocket.close()
+    finally:
+        receiver.cancel()
+        # Delta state of every session this connection carried goes with it
+        viewer.close()
+        # Sessions the server named can't be resumed, so free them right away
+        if session_id is None and not sessions.remove(session.session_id):
+            pubsub.close(session.session_id)  # Already evicted; viewers may have subscribed since
+
+# Viewers of a session's results: any number of them share the one pipeline
+# that analyses the session's frames (a /ws sender or an ingest source)
+def subscribe_viewer(session_id: str, max_lag: Optional[int], policy: Optional[str]) -> Subscription:
+    # The newest result is replayed so a viewer sees the current tracks straight away
+    return pubsub.subscribe(session_id, max_lag=max_lag or VIEWER_MAX_LAG, policy=policy or VIEWER_POLICY, replay=1)
+
+@app.websocket("/sessions/{session_id}/watch")
+async def watch_session(websocket: WebSocket, session_id: str, results: str = Query("full"),
+                        max_rate: float = Query(0.0, ge=0.0), max_lag: Optional[int] = Query(None, ge=1),
+                        policy: Optional[str] = Query(None)):
+    """
+    Stream a session's results to a websocket viewer
+    
+    The session need not exist yet: results flow once its frames do. Text
+    messages are {"subscribe": {...}} control messages as on /ws.
+    """
+    await websocket.accept()
+    try:
+        viewer = ViewerSettings(create_delta_encoder, results, max_rate)
+        subscription = subscribe_viewer(session_id, max_lag, policy)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close()
+        return
+    
+    async def receive_controls():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                try:
+                    viewer.subscribe(json.loads(message.get("text") or "{}").get("subscribe"))
+                except (ValueError, AttributeError) as e:
+                    logger.warning(f"Ignoring invalid websocket control message: {e}")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            subscription.close()
+    
+    receiver = asyncio.create_task(receive_controls())
+    try:
+        while (result := await subscription.get()) is not None:
+            encoded = encode_result(viewer, result)
+            if encoded is not None:
+                await send_encoded(websocket, *encoded)
+        if subscription.close_reason != "unsubscribed":
+            # Ended by the server: the session closed or the viewer fell too far behind
+            await websocket.send_json({"error": f"Subscription ended: {subscription.close_reason}"})
+            await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"WebSocket viewer error: {str(e)}")
+    finally:
+        receiver.cancel()
+        viewer.close()
+        pubsub.unsubscribe(subscription)
+
+@app.get("/sessions/{session_id}/events")
+async def session_events(session_id: str, results: str = Query("full"), max_rate: float = Query(0.0, ge=0.0),
+                         max_lag: Optional[int] = Query(None, ge=1), policy: Optional[str] = Query(None)):
+    """
+    Stream a session's results as server-sent events
+    
+    Full results are "result" events; with results=delta the events are
+    "key" and "delta" messages (see ws_delta.py). The stream ends with an
+    "end" event when the session closes or a "close" policy viewer lags.
+    """
+    if results not in ("full", "delta"):
+        raise HTTPException(status_code=400, detail="results must be 'full' or 'delta'")
+    try:
+        subscription = subscribe_viewer(session_id, max_lag, policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    encoder = create_delta_encoder(max_rate) if results == "delta" else None
+    
+    async def event_stream():
+        try:
+            while (result := await subscription.get()) is not None:
+                if encoder is None:
+                    yield format_sse({"event": "result", **result.dict()})
+                    continue
+                message = encoder.encode(result, tracks=result._tracks)
+                if message is not None:
+                    yield format_sse({"event": message["t"], **message})
+            yield format_sse({"event": "end", "reason": subscription.close_reason})
+        finally:
+            if encoder is not None:
+                encoder.close()
+            pubsub.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+async def analyze_source_frame(source: IngestSource, frame: np.ndarray, read_at: float) -> DetectionResponse:
+    """
+    Analyse a frame pulled by an ingest source's decode thread
+    
+    Args:
+        source: Source the frame was read from
+        frame: Decoded BGR frame
+        read_at: perf_counter time the frame was decoded
+        
+    Returns:
+        Detection response for the frame
+    """
+    session = sessions.get_or_create(source.session_id)
+    session.rate_control = source.rate_control
+    session.frame_slot = source.slot
+    trace = tracer.begin(session.session_id, "ingest", read_at)
+    tracing.activate(trace)
+    STAGE_STREAM_WAIT.record(read_at, time.perf_counter())
+    
+    result = await analyze_image(session, frame)
+    latency = time.perf_counter() - read_at
+    frame_seconds.labels("ingest").observe(latency)
+    tracer.end(trace, result.frame_id)
+    source.rate_control.record_result(latency, len(result.objects))
+    return result
+
+# Server-side ingest sources
+@app.get("/sources")
+async def list_sources():
+    return {"sources": ingest.list()}
+
+@app.post("/sources", status_code=201)
+async def add_source(config: SourceConfig):
+    if config.fps is not None and config.fps <= 0:
+        raise HTTPException(status_code=400, detail="fps must be positive")
+    if not config.url:
+        raise HTTPException(status_code=400, detail="url must not be empty")
+    try:
+        source = ingest.add(config.source_id, config.url, config.session_id, config.loop, config.fps)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return source.stats()
+
+@app.get("/sources/{source_id}")
+async def get_source(source_id: str):
+    """
+    Source state and the result of its newest analysed frame
+    """
+    source = ingest.get(source_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Source not found")
+    latest = source.latest.dict() if source.latest is not None else None
+    return {**source.stats(), "latest": latest}
+
+@app.delete("/sources/{source_id}")
+async def delete_source(source_id: str):
+    source = await ingest.remove(source_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Source not found")
+    if not sessions.remove(source.session_id):
+        pubsub.close(source.session_id)  # Already evicted; viewers may have subscribed since
+    return {"deleted": source_id}
+
+# Inference queue statistics
+@app.get("/stats/inference")
+async def inference_stats():
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Inference scheduler not running")
+    stats = scheduler.stats()
+    if CASCADE_ENABLED:
+        stats["cascade"] = cascade_stats(scheduler.detector_counters)
+    if result_cache is not None:
+        stats["result_cache"] = result_cache.stats()
+    return stats
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+# Per-frame traces (enable with TRACE_SAMPLE_RATE or PUT /traces/config)
+@app.get("/traces")
+async def list_traces(session_id: Optional[str] = Query(None), min_duration_ms: float = Query(0.0),
+                      limit: Optional[int] = Query(100)):
+    traces = tracer.traces(session_id, min_duration_ms, limit)
+    return {**tracer.stats(), "traces": [trace.summary() for trace in traces]}
+
+@app.get("/traces/export")
+async def export_traces(session_id: Optional[str] = Query(None), min_duration_ms: float = Query(0.0),
+                        limit: Optional[int] = Query(None)):
+    """
+    Export buffered frame traces as Chrome trace JSON, to open in Perfetto or chrome://tracing
+    
+    Args:
+        session_id: Only frames of this session
+        min_duration_ms: Only frames at least this slow
+        limit: Only the newest frames
+    """
+    traces = tracer.traces(session_id, min_duration_ms, limit)
+    return JSONResponse(content=to_chrome_trace(traces),
+                        headers={"Content-Disposition": 'attachment; filename="frame_traces.json"'})
+
+@app.put("/traces/config")
+async def configure_tracing(sample_rate: Optional[float] = Query(None, ge=0.0, le=1.0),
+                            min_duration_ms: Optional[float] = Query(None, ge=0.0),
+                            buffer_size: Optional[int] = Query(None, ge=1)):
+    tracer.configure(sample_rate, min_duration_ms, buffer_size)
+    return tracer.stats()
+
+# Session management
+@app.get("/sessions")
+async def list_sessions():
+    return {**sessions.stats(), "sessions": sessions.list(), "viewers": pubsub.stats()}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.remove(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+# Restricted zone management, per camera (stream session id, "*" for all cameras)
+def zone_config(zone) -> ZoneConfig:
+    return ZoneConfig(
+        name=zone.name,
+        polygon=[list(point) for point in zone.polygon],
+        priority=zone.priority,
+        threat_level=ThreatLevel(zone.threat_level)
+    )
+
+def build_zone(config: ZoneConfig):
+    try:
+        return make_zone(config.name, config.polygon, config.priority, config.threat_level.value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/zones")
+async def list_zone_cameras():
+    return {
+        "cameras": {camera_id: [zone_config(zone) for zone in zones.list(camera_id)] for camera_id in zones.cameras()},
+        "intrusions": dict(zones.intrusions)
+    }
+
+@app.get("/zones/{camera_id}", response_model=List[ZoneConfig])
+async def list_zones(camera_id: str):
+    return [zone_config(zone) for zone in zones.list(camera_id)]
+
+@app.put("/zones/{camera_id}", response_model=List[ZoneConfig])
+async def replace_zones(camera_id: str, configs: List[ZoneConfig]):
+    zones.set_zones(camera_id, [build_zone(config) for config in configs])
+    return [zone_config(zone) for zone in zones.list(camera_id)]
+
+@app.post("/zones/{camera_id}", response_model=ZoneConfig)
+async def upsert_zone(camera_id: str, config: ZoneConfig):
+    zone = build_zone(config)
+    zones.upsert(camera_id, zone)
+    return zone_config(zone)
+
+@app.delete("/zones/{camera_id}/{zone_name}")
+async def delete_zone(camera_id: str, zone_name: str):
+    if not zones.remove(camera_id, zone_name):
+        raise HTTPException(status_code=404, detail="Zone not found")
+    return {"deleted": zone_name}
+
+# Threat rule management
+@app.get("/threat_rules")
+async def get_threat_rules():
+    return {"path": threat_rules.path, "version": threat_rules.version, "rules": threat_rules.rules.config}
+
+@app.post("/threat_rules/reload")
+async def reload_threat_rules():
+    try:
+        threat_rules.reload(force=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"version": threat_rules.version}
 
 # HTML page for testing the API
 @app.get("/", response_class=HTMLResponse)
@@ -554,9 +1421,18 @@ async def get_html():
                         <button id="stopButton" disabled>Stop Camera</button>
                     </div>
                     <p>Status: <span id="status">Not connected</span></p>
+                    <label>Updates:
+                        <select id="updateRate">
+                            <option value="0">Every frame</option>
+                            <option value="5">5 per second</option>
+                            <option value="2">2 per second</option>
+                            <option value="1">1 per second</option>
+                        </select>
+                    </label>
                 </div>
                 <div class="panel">
                     <h2>Detections</h2>
+                    <p id="frameId"></p>
                     <div id="detections"></div>
                 </div>
             </div>
@@ -567,6 +1443,8 @@ async def get_html():
                 let stopButton = document.getElementById('stopButton');
                 let status = document.getElementById('status');
                 let detections = document.getElementById('detections');
+                let frameId = document.getElementById('frameId');
+                let updateRate = document.getElementById('updateRate');
                 
                 let stream;
                 let websocket;
@@ -610,7 +1488,9 @@ async def get_html():
                 
                 function connectWebSocket() {
                     const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-                    websocket = new WebSocket(${wsProtocol}//${window.location.host}/ws);
+                    // Delta results: only created, changed and deleted tracks are sent
+                    websocket = new WebSocket(
+                        `${wsProtocol}//${window.location.host}/ws?results=delta&max_rate=${updateRate.value}`);
                     
                     websocket.onopen = () => {
                         status.textContent = 'Connected';
@@ -628,52 +1508,129 @@ async def get_html():
                     };
                     
                     websocket.onmessage = (event) => {
-                        const data = JSON.parse(event.data);
-                        displayDetections(data);
+                        applyResults(JSON.parse(event.data));
                     };
                 }
                 
+                // Changing the rate resubscribes, which also brings a fresh keyframe
+                updateRate.addEventListener('change', () => {
+                    if (websocket && websocket.readyState === WebSocket.OPEN) {
+                        websocket.send(JSON.stringify({subscribe: {results: 'delta', max_rate: Number(updateRate.value)}}));
+                    }
+                });
+                
+                // Binary frame header, see ws_protocol.py
+                const HEADER_SIZE = 38;
+                const ENCODING_JPEG = 0;
+                let frameSeq = 0;
+                
+                function buildFrameMessage(jpegBuffer) {
+                    const message = new Uint8Array(HEADER_SIZE + jpegBuffer.byteLength);
+                    const header = new DataView(message.buffer);
+                    message[0] = 0x41;  // 'A'
+                    message[1] = 0x46;  // 'F'
+                    header.setUint8(2, 1);  // version
+                    header.setUint8(3, ENCODING_JPEG);
+                    header.setUint8(4, 0);  // flags: JSON responses
+                    header.setUint32(6, frameSeq++, true);
+                    header.setFloat64(10, Date.now() / 1000, true);
+                    header.setUint16(18, canvasContext.canvas.width, true);
+                    header.setUint16(20, canvasContext.canvas.height, true);
+                    // Bytes 22-37 (session) stay zero: use this connection's session
+                    message.set(new Uint8Array(jpegBuffer), HEADER_SIZE);
+                    return message.buffer;
+                }
+                
                 function sendFrames() {
                     if (!websocket || websocket.readyState !== WebSocket.OPEN) return;
                     
                     // Capture frame from video
                     canvasContext.drawImage(video, 0, 0, canvasContext.canvas.width, canvasContext.canvas.height);
-                    const frame = canvasContext.canvas.toDataURL('image/jpeg', 0.8).split(',')[1];
                     
-                    // Send frame to server
-                    websocket.send(JSON.stringify({ frame }));
+                    // Send the JPEG as a binary frame message (no base64)
+                    canvasContext.canvas.toBlob(async (blob) => {
+                        if (blob && websocket.readyState === WebSocket.OPEN) {
+                            websocket.send(buildFrameMessage(await blob.arrayBuffer()));
+                        }
+                    }, 'image/jpeg', 0.8);
                     
                     // Schedule next frame
                     setTimeout(sendFrames, 100);  // 10 FPS
                 }
                 
-                function displayDetections(data) {
-                    if (!data.objects) return;
-                    
-                    let html = <p>Frame: ${data.frame_id}</p>;
-                    
-                    data.objects.forEach(obj => {
-                        let threatClass = '';
-                        if (obj.threat_level === 'Low') threatClass = 'threat-low';
-                        else if (obj.threat_level === 'High') threatClass = 'threat-high';
-                        else if (obj.threat_level === 'Critical') threatClass = 'threat-critical';
-                        
-                        html += `
-                            <div>
-                                <p>Object ID: ${obj.id} - Type: ${obj.object_type} - 
-                                   <span class="${threatClass}">${obj.threat_level}</span></p>
-                                <p>Speed: ${obj.speed} - Direction: ${obj.direction}°</p>
-                            </div>
-                            <hr>
-                        `;
-                    });
-                    
-                    detections.innerHTML = html;
+                // Track rows by id, see ws_delta.py for the message layout
+                const FIELD = {ID: 0, TYPE: 1, SPEED: 9, DIRECTION: 10, THREAT: 11, ZONE: 12};
+                const THREAT_CLASSES = {Low: 'threat-low', High: 'threat-high', Critical: 'threat-critical'};
+                let tracks = new Map();
+                let types = [];
+                let levels = [];
+                
+                function applyResults(data) {
+                    if (data.error) {
+                        console.error('Server error:', data.error);
+                        return;
+                    }
+                    if (data.t === 'key') {
+                        types = data.types;
+                        levels = data.levels;
+                        const live = new Set(data.tracks.map(row => row[FIELD.ID]));
+                        tracks.forEach((track, id) => { if (!live.has(id)) removeTrack(id); });
+                        data.tracks.forEach(setTrack);
+                    } else if (data.t === 'delta') {
+                        data.create.forEach(setTrack);
+                        data.update.forEach(change => {
+                            const track = tracks.get(change[0]);
+                            if (!track) {
+                                // Out of step: ask for a keyframe
+                                updateRate.dispatchEvent(new Event('change'));
+                                return;
+                            }
+                            for (let i = 1; i < change.length; i += 2) track.row[change[i]] = change[i + 1];
+                            renderTrack(track);
+                        });
+                        data.delete.forEach(removeTrack);
+                    } else {
+                        return;
+                    }
+                    frameId.textContent = `Frame: ${data.frame_id}`;
+                }
+                
+                function setTrack(row) {
+                    let track = tracks.get(row[FIELD.ID]);
+                    if (!track) {
+                        track = {element: document.createElement('div')};
+                        tracks.set(row[FIELD.ID], track);
+                        detections.appendChild(track.element);
+                    }
+                    track.row = row.slice();
+                    renderTrack(track);
+                }
+                
+                function removeTrack(id) {
+                    const track = tracks.get(id);
+                    if (track) {
+                        track.element.remove();
+                        tracks.delete(id);
+                    }
+                }
+                
+                // Only the changed track's element is redrawn
+                function renderTrack(track) {
+                    const row = track.row;
+                    const level = levels[row[FIELD.THREAT]];
+                    const zone = row[FIELD.ZONE];
+                    track.element.innerHTML = `
+                        <p>Object ID: ${row[FIELD.ID]} - Type: ${types[row[FIELD.TYPE]]} - 
+                           <span class="${THREAT_CLASSES[level] || ''}">${level}</span></p>
+                        <p>Speed: ${row[FIELD.SPEED]} - Direction: ${row[FIELD.DIRECTION]}°</p>
+                        ${zone ? `<p>In restricted zone: ${zone}</p>` : ''}
+                        <hr>
+                    `;
                 }
             </script>
         </body>
     </html>
     """
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
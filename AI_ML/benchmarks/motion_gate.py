@@ -0,0 +1,88 @@
+"""
+Count the detector calls the motion gate saves on a video clip
+
+Runs only the gate (no model), so it works on any machine:
+
+    python benchmarks/motion_gate.py
+    python benchmarks/motion_gate.py --method mog2 --stride 3 path/to/clip.mp4
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motion_gate import MotionGate
+
+DEFAULT_CLIP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "Missile-detection", "Videos", "M1A1 Tank firing.mp4")
+
+
+def run(path: str, method: str, stride: int, frame_size: int, threshold: int, refresh_every: int) -> dict:
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Failed to open {path}")
+
+    gate = MotionGate(method=method, threshold=threshold, refresh_every=refresh_every)
+    frames = 0
+    detector_calls = 0
+    detector_pixels = 0
+    full_pixels = 0
+    gate_seconds = 0.0
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if (frames - 1) % stride != 0:
+            continue
+        if frame_size > 0:
+            frame = cv2.resize(frame, (frame_size, frame_size), interpolation=cv2.INTER_AREA)
+
+        start = time.perf_counter()
+        region = gate.plan(frame)
+        gate_seconds += time.perf_counter() - start
+
+        full_pixels += frame.shape[0] * frame.shape[1]
+        if region is not None:
+            detector_calls += 1
+            detector_pixels += (region[2] - region[0]) * (region[3] - region[1])
+    cap.release()
+
+    checked = gate.frames_checked
+    return {
+        "clip": os.path.basename(path),
+        "method": method,
+        "frames_in_clip": frames,
+        "frames_checked": checked,
+        "detector_calls": detector_calls,
+        "detector_calls_saved": checked - detector_calls,
+        "saved_ratio": round((checked - detector_calls) / max(1, checked), 3),
+        "cropped_calls": gate.frames_cropped,
+        "pixels_sent_ratio": round(detector_pixels / max(1, full_pixels), 3),
+        "gate_ms_per_frame": round(gate_seconds * 1000 / max(1, checked), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip", nargs="?", default=DEFAULT_CLIP)
+    parser.add_argument("--method", choices=["diff", "mog2", "both"], default="both")
+    parser.add_argument("--stride", type=int, default=1, help="Check every Nth frame")
+    parser.add_argument("--frame-size", type=int, default=640, help="Square resize as in /analyze_video/, 0 to keep")
+    parser.add_argument("--threshold", type=int, default=25)
+    parser.add_argument("--refresh-every", type=int, default=10)
+    args = parser.parse_args()
+
+    methods = ["diff", "mog2"] if args.method == "both" else [args.method]
+    for method in methods:
+        result = run(args.clip, method, args.stride, args.frame_size, args.threshold, args.refresh_every)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare the allocating and the pooled preprocessing paths
+
+Runs the per-frame work in front of and behind the model (no model needed):
+resize to the video frame size, letterbox, NCHW tensor, and turning (N, 6)
+detections into tracker inputs. Reports time, transient memory and garbage
+collector activity per frame:
+
+    python benchmarks/preprocess.py
+    python benchmarks/preprocess.py --width 1920 --height 1080 --batch 8 --detections 50
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detectors import PreparedBatch
+from preprocess import BufferPool, FramePool
+
+
+def make_frames(count: int, width: int, height: int) -> list:
+    rng = np.random.default_rng(0)
+    return [cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+            for _ in range(count)]
+
+
+def make_detections(count: int) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    corners = rng.uniform(0, 600, (count, 2))
+    return np.concatenate([corners, corners + 20, rng.uniform(0.3, 1, (count, 1)),
+                           rng.integers(0, 3, (count, 1))], axis=1).astype(np.float32)
+
+
+def allocating_step(frames: list, detections: np.ndarray, frame_size: int, imgsz: int, stride: int):
+    resized = [cv2.resize(frame, (frame_size, frame_size), interpolation=cv2.INTER_AREA) for frame in frames]
+    tensor = PreparedBatch(resized).tensor(imgsz, stride=stride)
+    points = []
+    for x1, y1, x2, y2, confidence, _ in detections.tolist():
+        points.append((np.array([[(x1 + x2) / 2, (y1 + y2) / 2]]), np.array([confidence])))
+    return tensor, points
+
+
+def pooled_step(frames: list, detections: np.ndarray, frame_size: int, imgsz: int, stride: int,
+                frame_pool: FramePool, buffers: BufferPool):
+    resized = [cv2.resize(frame, (frame_size, frame_size), dst=frame_pool.acquire((frame_size, frame_size, 3)),
+                          interpolation=cv2.INTER_AREA) for frame in frames]
+    tensor = PreparedBatch(resized, buffers).tensor(imgsz, stride=stride)
+    boxes = detections.astype(np.float64)
+    centres = (boxes[:, :2] + boxes[:, 2:4]) / 2
+    points = [(centres[index:index + 1], boxes[index, 4:5]) for index in range(len(boxes))]
+    for frame in resized:
+        frame_pool.release(frame)
+    return tensor, points
+
+
+def run(name: str, step, iterations: int, batch: int) -> dict:
+    for _ in range(3):
+        step()  # Warm-up: pools fill, OpenCV initialises
+
+    pauses = []
+    started = {}
+
+    def on_gc(phase, info):
+        if phase == "start":
+            started["at"] = time.perf_counter()
+        else:
+            pauses.append(time.perf_counter() - started.pop("at", time.perf_counter()))
+
+    gc.callbacks.append(on_gc)
+    begin = time.perf_counter()
+    for _ in range(iterations):
+        step()
+    elapsed = time.perf_counter() - begin
+    gc.callbacks.remove(on_gc)
+
+    # Separate pass: tracemalloc slows everything down, so it doesn't share the timed loop
+    tracemalloc.start()
+    transient = 0
+    for _ in range(iterations):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        transient += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    frames = iterations * batch
+    return {
+        "path": name,
+        "ms_per_frame": round(elapsed * 1000 / frames, 3),
+        "transient_mb_per_frame": round(transient / frames / 1e6, 3),
+        "gc_collections_per_100_frames": round(len(pauses) * 100 / frames, 2),
+        "gc_pause_ms_per_frame": round(sum(pauses) * 1000 / frames, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--batch", type=int, default=4, help="Frames per detector batch")
+    parser.add_argument("--detections", type=int, default=20, help="Detections per batch handed to the tracker")
+    parser.add_argument("--frame-size", type=int, default=640, help="Square resize as in /analyze_video/")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--stride", type=int, default=32, help="Rectangular letterbox stride, 0 for square")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    frames = make_frames(args.batch, args.width, args.height)
+    detections = make_detections(args.detections)
+    frame_pool, buffers = FramePool(), BufferPool()
+    steps = {
+        "allocating": lambda: allocating_step(frames, detections, args.frame_size, args.imgsz, args.stride),
+        "pooled": lambda: pooled_step(frames, detections, args.frame_size, args.imgsz, args.stride,
+                                      frame_pool, buffers),
+    }
+    for name, step in steps.items():
+        result = run(name, step, args.iterations, args.batch)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""
+Replay benchmark for the detector, the tracker and the API endpoints
+
+Replays the Classification_Model validation images and the M1A1 clip and
+writes p50/p95/p99 latency, frames per second, per-stage time and peak RSS
+to a JSON results file. The service is configured from the environment
+(MODEL_PATH, DETECTOR_BACKEND, BATCH_MAX_SIZE, ...) exactly as when served.
+
+    python benchmarks/replay.py --output results.json
+    python benchmarks/replay.py --targets analyze,ws --transport loopback --concurrency 4
+    python benchmarks/replay.py --baseline benchmarks/baseline.json --tolerance 0.15
+
+Targets:
+
+    detector        decode + model call per image, no service
+    tracker         tracking + threat assessment per clip frame, on
+                    detections computed up front
+    analyze         POST /analyze/ per image
+    analyze_video   POST /analyze_video/ with the whole clip per request
+    ws              binary /ws messages, one per clip frame, each waiting
+                    for its response
+
+Each of --concurrency workers runs its own stream (session, connection or
+upload); images are shared out between them. The "inprocess" transport
+drives the app through Starlette's TestClient, "loopback" serves it with
+uvicorn on 127.0.0.1 (in this process, so client and server share the GIL).
+
+With --baseline, the run exits with status 1 when a target's p95 latency
+or peak RSS grows, or its frames per second drop, by more than the
+tolerance. A results file can be used as the next baseline.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Replayed websocket frames wait for their response, so the stream must not shed any
+os.environ["STREAM_LATENCY_BUDGET_MS"] = "0"
+os.environ["STREAM_ACTIVE_STRIDE"] = "1"
+os.environ["STREAM_IDLE_STRIDE"] = "1"
+
+import app as service  # noqa: E402
+from workers import detect_batch, load_model  # noqa: E402
+from ws_protocol import ENCODING_JPEG, HEADER, MAGIC, PROTOCOL_VERSION  # noqa: E402
+
+DEFAULT_IMAGES = os.path.join(ROOT, "Classification_Model", "valid", "images")
+DEFAULT_CLIP = os.path.join(ROOT, "Missile-detection", "Videos", "M1A1 Tank firing.mp4")
+TARGETS = ["detector", "tracker", "analyze", "analyze_video", "ws"]
+SERVICE_TARGETS = {"tracker", "analyze", "analyze_video", "ws"}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_images(directory: str, limit: int) -> List[bytes]:
+    names = sorted(name for name in os.listdir(directory)
+                   if name.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")))
+    if limit > 0:
+        names = names[:limit]
+    images = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            images.append(f.read())
+    if not images:
+        raise SystemExit(f"No images found in {directory}")
+    return images
+
+
+def load_clip(path: str, limit: int) -> List[bytes]:
+    """Read the clip once and JPEG-encode its frames, as a camera client would send them"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Failed to open {path}")
+    frames = []
+    while limit <= 0 or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.imencode(".jpg", frame)[1].tobytes())
+    cap.release()
+    return frames
+
+
+def frame_message(jpeg: bytes, seq: int) -> bytes:
+    header = HEADER.pack(MAGIC, PROTOCOL_VERSION, ENCODING_JPEG, 0, 0, seq, time.time(), 0, 0, bytes(16))
+    return header + jpeg
+
+
+class Recorder:
+    """Thread-safe collector of per-request latencies and per-stage times"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.frames = 0
+        self.errors = 0
+        self.stages: Dict[str, float] = {}
+        # Span of the recorded requests, so warmup doesn't count against throughput
+        self.first_start = float("inf")
+        self.last_end = 0.0
+
+    def record(self, seconds: float, frames: int = 1, **stages: float):
+        end = time.perf_counter()
+        with self._lock:
+            self.first_start = min(self.first_start, end - seconds)
+            self.last_end = max(self.last_end, end)
+            self.latencies.append(seconds)
+            self.frames += frames
+            for stage, stage_seconds in stages.items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + stage_seconds
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        latencies = np.array(self.latencies) * 1000
+        span = self.last_end - self.first_start
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "frames": self.frames,
+            "seconds": round(max(0.0, span), 3),
+            "fps": round(self.frames / span, 2) if span > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "mean": round(float(latencies.mean()), 2) if len(latencies) else 0.0,
+                "max": round(float(latencies.max()), 2) if len(latencies) else 0.0,
+            },
+            # Mean time per frame spent in each stage
+            "stages_ms": {stage: round(seconds * 1000 / max(1, self.frames), 3)
+                          for stage, seconds in self.stages.items()},
+        }
+
+
+class InProcessTransport:
+    """Drives the app through Starlette's TestClient, without sockets"""
+
+    name = "inprocess"
+
+    def __enter__(self):
+        from fastapi.testclient import TestClient
+        self._client = TestClient(service.app)
+        self._client.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._client.__exit__(*exc)
+
+    def post(self, path: str, **kwargs):
+        return self._client.post(path, **kwargs)
+
+    @contextlib.contextmanager
+    def websocket(self, path: str) -> Iterator[Callable[[bytes], object]]:
+        with self._client.websocket_connect(path) as ws:
+            def exchange(data: bytes):
+                ws.send_bytes(data)
+                message = ws.receive()
+                return message.get("text") or message.get("bytes")
+            yield exchange
+
+
+class LoopbackTransport:
+    """Serves the app with uvicorn on 127.0.0.1 and talks to it over real sockets"""
+
+    name = "loopback"
+
+    def __init__(self, startup_timeout: float = 300.0):
+        self.startup_timeout = startup_timeout
+        self._local = threading.local()  # One HTTP connection pool per worker thread
+
+    def __enter__(self):
+        import uvicorn
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.ws_url = f"ws://127.0.0.1:{port}"
+
+        self._server = uvicorn.Server(uvicorn.Config(service.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise SystemExit("Server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+    def post(self, path: str, **kwargs):
+        import httpx
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = httpx.Client(base_url=self.base_url, timeout=None)
+        return client.post(path, **kwargs)
+
+    @contextlib.contextmanager
+    def websocket(self, path: str) -> Iterator[Callable[[bytes], object]]:
+        try:
+            from websockets.sync.client import connect
+        except ImportError:
+            raise SystemExit("The loopback ws target needs the websockets package")
+        with connect(self.ws_url + path, max_size=None) as ws:
+            def exchange(data: bytes):
+                ws.send(data)
+                return ws.recv()
+            yield exchange
+
+
+def run_workers(concurrency: int, worker: Callable[[int], None]):
+    """Run worker(index) on concurrency threads and wait for all of them"""
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for future in [pool.submit(worker, index) for index in range(concurrency)]:
+            future.result()
+
+
+def shared_items(items: list) -> Callable[[], Optional[tuple]]:
+    """Hand out (position, item) pairs to workers until the items run out"""
+    lock = threading.Lock()
+    position = iter(range(len(items)))
+
+    def next_item():
+        with lock:
+            index = next(position, None)
+        return None if index is None else (index, items[index])
+    return next_item
+
+
+def bench_detector(model, images: List[bytes], concurrency: int, warmup: int) -> dict:
+    recorder = Recorder()
+    next_item = shared_items(images)
+
+    def worker(_):
+        while (item := next_item()) is not None:
+            index, data = item
+            start = time.perf_counter()
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            decoded = time.perf_counter()
+            detect_batch(model, [frame])
+            done = time.perf_counter()
+            if index >= warmup:
+                recorder.record(done - start, decode=decoded - start, detect=done - decoded)
+
+    run_workers(concurrency, worker)
+    return recorder.summary()
+
+
+def bench_tracker(model, clip: List[bytes], concurrency: int, warmup: int) -> dict:
+    # Detections are computed up front so only tracking is timed
+    frames = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in clip]
+    detections = [detect_batch(model, [frame])[0] for frame in frames]
+    recorder = Recorder()
+
+    def worker(index):
+        session = service.sessions.get_or_create(f"bench-tracker-{index}")
+        try:
+            for position, (frame, raw) in enumerate(zip(frames, detections)):
+                start = time.perf_counter()
+                service.track_detections(session, raw, frame.shape)
+                seconds = time.perf_counter() - start
+                if position >= warmup:
+                    recorder.record(seconds, track=seconds)
+        finally:
+            service.sessions.remove(session.session_id)
+
+    run_workers(concurrency, worker)
+    return recorder.summary()
+
+
+def bench_analyze(transport, images: List[bytes], concurrency: int, warmup: int) -> dict:
+    recorder = Recorder()
+    next_item = shared_items(images)
+
+    def worker(index):
+        while (item := next_item()) is not None:
+            position, data = item
+            start = time.perf_counter()
+            response = transport.post(f"/analyze/?session_id=bench-analyze-{index}",
+                                      files={"file": ("frame.jpg", data, "image/jpeg")})
+            seconds = time.perf_counter() - start
+            if response.status_code != 200:
+                recorder.error()
+            elif position >= warmup:
+                recorder.record(seconds)
+
+    run_workers(concurrency, worker)
+    return recorder.summary()
+
+
+def bench_analyze_video(transport, clip_path: str, concurrency: int, repeats: int) -> dict:
+    with open(clip_path, "rb") as f:
+        video = f.read()
+    recorder = Recorder()
+
+    def worker(_):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = transport.post("/analyze_video/", files={"file": ("clip.mp4", video, "video/mp4")})
+            seconds = time.perf_counter() - start
+            if response.status_code != 200:
+                recorder.error()
+            else:
+                recorder.record(seconds, frames=response.json()["total_frames_processed"])
+
+    run_workers(concurrency, worker)
+    return recorder.summary()
+
+
+def bench_ws(transport, clip: List[bytes], concurrency: int, warmup: int) -> dict:
+    recorder = Recorder()
+
+    def worker(_):
+        with transport.websocket("/ws") as exchange:
+            for seq, data in enumerate(clip):
+                start = time.perf_counter()
+                reply = exchange(frame_message(data, seq))
+                seconds = time.perf_counter() - start
+                if isinstance(reply, str) and reply.startswith('{"error"'):
+                    recorder.error()
+                elif seq >= warmup:
+                    recorder.record(seconds)
+
+    run_workers(concurrency, worker)
+    return recorder.summary()
+
+
+def scheduler_totals() -> dict:
+    stats = service.scheduler.stats()
+    return {
+        "queue_wait": (stats["queue_wait_seconds"]["sum"], stats["queue_wait_seconds"]["count"]),
+        "batch": (stats["batch_latency_seconds"]["sum"], stats["batch_latency_seconds"]["count"]),
+        "batch_size": (stats["batch_size"]["sum"], stats["batch_size"]["count"]),
+    }
+
+
+def scheduler_stages(before: dict, after: dict) -> dict:
+    """Mean queue wait per frame, model time per batch and frames per batch between two snapshots"""
+    delta = {key: (after[key][0] - before[key][0], after[key][1] - before[key][1]) for key in after}
+
+    def mean(key, scale=1.0):
+        total, count = delta[key]
+        return round(total * scale / count, 3) if count else 0.0
+    return {
+        "queue_wait": mean("queue_wait", 1000),
+        "inference_per_batch": mean("batch", 1000),
+        "frames_per_batch": mean("batch_size"),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compare a run against a baseline run
+
+    Returns:
+        One message per regression beyond the tolerance
+    """
+    regressions = []
+    for target, current in results["targets"].items():
+        base = baseline.get("targets", {}).get(target)
+        if base is None:
+            continue
+        checks = [
+            ("p95 latency", current["latency_ms"]["p95"], base["latency_ms"]["p95"], True),
+            ("peak RSS", current["peak_rss_mb"], base["peak_rss_mb"], True),
+            ("fps", current["fps"], base["fps"], False),
+        ]
+        for metric, value, reference, lower_is_better in checks:
+            if reference <= 0:
+                continue
+            change = (value - reference) / reference
+            if (change > tolerance) if lower_is_better else (change < -tolerance):
+                regressions.append(f"{target}: {metric} {value} vs baseline {reference} ({change:+.1%})")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'target':<15}{'fps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'rss MB':>10}")
+    for target, summary in results["targets"].items():
+        latency = summary["latency_ms"]
+        print(f"{target:<15}{summary['fps']:>10}{latency['p50']:>10}{latency['p95']:>10}"
+              f"{latency['p99']:>10}{summary['errors']:>8}{summary['peak_rss_mb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma-separated subset of " + ", ".join(TARGETS))
+    parser.add_argument("--transport", choices=["inprocess", "loopback"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent streams per target")
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--clip", default=DEFAULT_CLIP)
+    parser.add_argument("--limit", type=int, default=200, help="Images and clip frames replayed, 0 for all")
+    parser.add_argument("--warmup", type=int, default=5, help="Leading requests per stream left out of the stats")
+    parser.add_argument("--video-repeats", type=int, default=1, help="/analyze_video/ uploads per worker")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    images = load_images(args.images, args.limit)
+    clip = load_clip(args.clip, args.limit)
+    results = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "transport": args.transport,
+            "concurrency": args.concurrency,
+            "images": len(images),
+            "clip_frames": len(clip),
+            "warmup": args.warmup,
+            "detector": service.detector_config(),
+            "inference_backend": service.INFERENCE_BACKEND,
+            "inference_workers": service.INFERENCE_WORKERS,
+            "batch_max_size": service.BATCH_MAX_SIZE,
+            "batch_max_wait_ms": service.BATCH_MAX_WAIT_MS,
+        },
+        "targets": {},
+    }
+
+    model = load_model(service.detector_config()) if {"detector", "tracker"} & set(targets) else None
+    if "detector" in targets:
+        results["targets"]["detector"] = bench_detector(model, images, args.concurrency, args.warmup)
+        results["targets"]["detector"]["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    if SERVICE_TARGETS & set(targets):
+        transport = LoopbackTransport() if args.transport == "loopback" else InProcessTransport()
+        with transport:
+            for target in [target for target in TARGETS if target in targets and target in SERVICE_TARGETS]:
+                before = scheduler_totals()
+                if target == "tracker":
+                    summary = bench_tracker(model, clip, args.concurrency, args.warmup)
+                elif target == "analyze":
+                    summary = bench_analyze(transport, images, args.concurrency, args.warmup)
+                elif target == "analyze_video":
+                    summary = bench_analyze_video(transport, args.clip, args.concurrency, args.video_repeats)
+                else:
+                    summary = bench_ws(transport, clip, args.concurrency, args.warmup)
+                if target != "tracker":
+                    stages = scheduler_stages(before, scheduler_totals())
+                    summary["frames_per_batch"] = stages.pop("frames_per_batch")
+                    summary["stages_ms"].update(stages)
+                summary["peak_rss_mb"] = round(peak_rss_mb(), 1)
+                results["targets"][target] = summary
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_table(results)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("transport", "concurrency", "detector"):
+            if baseline.get("config", {}).get(key) != results["config"][key]:
+                print(f"Warning: baseline {key} differs ({baseline.get('config', {}).get(key)})")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
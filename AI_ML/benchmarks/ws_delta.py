@@ -0,0 +1,116 @@
+"""
+Compare full and delta-encoded websocket results
+
+Synthesises a scene of moving tracks (a few appear and disappear) and
+reports the bytes and the server CPU time per frame and viewer of each
+result encoding a /ws viewer can receive. Response models and track tables
+are built once per frame, as the tracker does, and are not timed:
+
+    full        json.dumps(result.dict()), legacy text frames
+    packed      positional rows, binary frames
+    delta       changed tracks only, results=delta
+
+    python benchmarks/ws_delta.py
+    python benchmarks/ws_delta.py --tracks 50 --moving 1 --max-rate 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import THREAT_ORDER, DetectedObject, DetectionResponse, ObjectType, create_delta_encoder  # noqa: E402
+from ws_protocol import FrameHeader, encode_message, encode_response  # noqa: E402
+
+FRAME_RATE = 10.0  # Frames per second of the synthetic stream
+
+
+def make_scene(tracks: int, frames: int, moving: float, seed: int = 0) -> list:
+    """Per frame, the field values of every live track"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(100, 1100, (tracks, 2))
+    velocities = rng.normal(0, 3, (tracks, 2)) * (rng.random((tracks, 1)) < moving)  # Pixels per frame
+    ids = np.arange(1, tracks + 1)
+    next_id = tracks + 1
+    types = list(ObjectType)
+    scene = []
+    for _ in range(frames):
+        positions += velocities + rng.normal(0, 0.3, positions.shape)
+        # About one track in a hundred is replaced each frame
+        for index in np.flatnonzero(rng.random(tracks) < 0.01):
+            ids[index], next_id = next_id, next_id + 1
+            positions[index] = rng.uniform(100, 1100, 2)
+        objects = []
+        for track_id, (x, y), (vx, vy) in zip(ids.tolist(), positions.tolist(), velocities.tolist()):
+            objects.append(dict(
+                id=track_id,
+                object_type=types[track_id % 3],
+                confidence=0.8 + 0.005 * (track_id % 7),
+                bbox=[int(x - 20), int(y - 10), int(x + 20), int(y + 10)],
+                predicted_position=[int(x + vx), int(y + vy)],
+                speed=round(float(np.hypot(vx, vy)) * FRAME_RATE, 2),
+                direction=round(float(np.degrees(np.arctan2(vy, vx))), 2),
+                threat_level=THREAT_ORDER[track_id % 2],
+                zone=None
+            ))
+        scene.append(objects)
+    return scene
+
+
+def build(scene: list) -> list:
+    """(response, track table) per frame"""
+    tables = create_delta_encoder()
+    frames = []
+    for frame_id, objects in enumerate(scene, 1):
+        response = DetectionResponse(frame_id=frame_id, timestamp=time.time(), session_id="bench",
+                                     objects=[DetectedObject(**fields) for fields in objects])
+        frames.append((response, tables.table(response.objects)))
+    return frames
+
+
+def run(name: str, frames: list, max_rate: float) -> dict:
+    header = FrameHeader(0, 0, 0, 0.0, 0, 0, None)
+    viewer = create_delta_encoder(max_rate)
+    sent_bytes = messages = 0
+    started = time.perf_counter()
+    for response, tracks in frames:
+        if name == "full":
+            encoded = json.dumps(response.dict(), separators=(",", ":"))
+        elif name == "packed":
+            _, encoded = encode_response(response, header._replace(seq=response.frame_id))
+        else:
+            message = viewer.encode(response, response.frame_id, tracks, now=response.frame_id / FRAME_RATE)
+            if message is None:
+                continue
+            _, encoded = encode_message(message)
+        sent_bytes += len(encoded)
+        messages += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "encoding": name,
+        "us_per_frame": round(elapsed * 1e6 / len(frames), 1),
+        "bytes_per_frame": round(sent_bytes / len(frames)),
+        "messages": messages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=20, help="Live tracks per frame")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--moving", type=float, default=0.5, help="Share of tracks in motion, the rest hover")
+    parser.add_argument("--max-rate", type=float, default=0.0, help="Delta viewer messages per second, 0 = every frame")
+    args = parser.parse_args()
+
+    frames = build(make_scene(args.tracks, args.frames, args.moving))
+    for name in ("full", "packed", "delta"):
+        result = run(name, frames, args.max_rate)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
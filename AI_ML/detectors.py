@@ -0,0 +1,637 @@
+import ast
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from motion_gate import Region
+from preprocess import BufferPool
+from slicing import merge_detections
+
+logger = logging.getLogger("airborne-threat-detection")
+
+# Defaults matching ultralytics' predictor so every backend returns the same boxes
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+DEFAULT_MAX_DET = 300
+LETTERBOX_COLOR = (114, 114, 114)
+# A scalar fills a uniform padding colour an order of magnitude faster than a per-pixel broadcast
+_LETTERBOX_FILL = LETTERBOX_COLOR[0] if len(set(LETTERBOX_COLOR)) == 1 else np.array(LETTERBOX_COLOR, np.uint8)
+
+
+def letterbox(frame: np.ndarray, size: int, stride: int = 0, pool: Optional[BufferPool] = None,
+              role: Hashable = "letterbox") -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resize a frame into a size x size square, keeping aspect ratio and padding the rest
+
+    Args:
+        frame: BGR frame
+        size: Output side length
+        stride: Pad each side only up to a multiple of stride instead of to
+            the full square, as ultralytics does for dynamic-shape models
+        pool: Buffers to draw the output canvas from (as role) instead of
+            allocating; the frame is resized straight into the canvas
+
+    Returns:
+        Letterboxed image, scale gain and (left, top) padding
+    """
+    height, width = frame.shape[:2]
+    gain = min(size / height, size / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+
+    out_width, out_height = size, size
+    if stride:
+        out_width, out_height = -(-new_width // stride) * stride, -(-new_height // stride) * stride
+    pad_x, pad_y = (out_width - new_width) / 2, (out_height - new_height) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+
+    if pool is None:
+        if (new_width, new_height) != (width, height):
+            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+        return image, gain, (left, top)
+
+    image = pool.get(role, (top + new_height + bottom, left + new_width + right, 3))
+    image[:top] = image[top + new_height:] = _LETTERBOX_FILL
+    image[top:top + new_height, :left] = image[top:top + new_height, left + new_width:] = _LETTERBOX_FILL
+    content = image[top:top + new_height, left:left + new_width]
+    if (new_width, new_height) != (width, height):
+        cv2.resize(frame, (new_width, new_height), dst=content, interpolation=cv2.INTER_LINEAR)
+    else:
+        np.copyto(content, frame)
+    return image, gain, (left, top)
+
+
+def to_input_tensor(images: List[np.ndarray], dtype=np.float32, out: Optional[np.ndarray] = None,
+                    planes: Optional[np.ndarray] = None) -> np.ndarray:
+    # BGR HWC uint8 -> RGB NCHW in [0, 1]
+    if out is None:
+        batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=dtype) / dtype(255)
+    # Same arithmetic into the caller's contiguous block: OpenCV deinterleaves
+    # each image into (3, H, W) uint8 scratch planes, then every plane is
+    # scaled with contiguous reads and writes
+    if planes is None:
+        planes = np.empty((3,) + images[0].shape[:2], dtype=np.uint8)
+    for index, image in enumerate(images):
+        cv2.split(image, list(planes))
+        for channel in range(3):
+            np.divide(planes[2 - channel], dtype(255), out=out[index, channel], casting="unsafe")
+    return out
+
+
+class PreparedBatch:
+    """
+    Frames of one batch with their letterboxed model inputs
+
+    Each input size is letterboxed once, and each (size, dtype) converted to
+    an NCHW tensor once, however many models take it. With a pool, the
+    canvases and tensors are its reused buffers rather than new arrays.
+    """
+
+    def __init__(self, frames: List[np.ndarray], pool: Optional[BufferPool] = None):
+        self.frames = frames
+        self.pool = pool
+        # Rectangular letterboxes need every frame of the batch to share a shape
+        self.same_shape = len({frame.shape for frame in frames}) <= 1
+        self._letterboxed: Dict[Tuple[int, int], List[Tuple[np.ndarray, float, Tuple[int, int]]]] = {}
+        self._tensors: Dict[Tuple[int, int, type], np.ndarray] = {}
+        self._lock = threading.RLock()  # Models of a MultiModelDetector prepare concurrently
+
+    def letterboxed(self, size: int, stride: int = 0) -> List[Tuple[np.ndarray, float, Tuple[int, int]]]:
+        """(image, gain, pad) per frame, as returned by letterbox()"""
+        key = (size, stride if self.same_shape else 0)
+        with self._lock:
+            if key not in self._letterboxed:
+                self._letterboxed[key] = [letterbox(frame, size, key[1], self.pool, ("letterbox", size, key[1], index))
+                                          for index, frame in enumerate(self.frames)]
+            return self._letterboxed[key]
+
+    def tensor(self, size: int, dtype=np.float32, stride: int = 0) -> np.ndarray:
+        key = (size, stride if self.same_shape else 0, dtype)
+        with self._lock:
+            if key not in self._tensors:
+                images = [image for image, _, _ in self.letterboxed(size, stride)]
+                out = planes = None
+                if self.pool is not None:
+                    height, width = images[0].shape[:2]
+                    out = self.pool.get(("tensor",) + key[:2] + (np.dtype(dtype).str,),
+                                        (len(images), 3, height, width), dtype)
+                    planes = self.pool.get("planes", (3, height, width))
+                self._tensors[key] = to_input_tensor(images, dtype, out, planes)
+            return self._tensors[key]
+
+
+def to_frame_coordinates(boxes: np.ndarray, gain: float, pad: Tuple[int, int],
+                         frame_shape: Tuple[int, ...]) -> np.ndarray:
+    # Undo the letterbox on (N, 4+) rows of [x1, y1, x2, y2, ...], in place
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+    height, width = frame_shape[:2]
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes
+
+
+def postprocess(prediction: np.ndarray, gain: float, pad: Tuple[int, int], frame_shape: Tuple[int, ...],
+                conf: float = DEFAULT_CONF, iou: float = DEFAULT_IOU,
+                max_det: int = DEFAULT_MAX_DET) -> np.ndarray:
+    """
+    Decode one image's raw YOLOv8 head output into detections
+
+    Args:
+        prediction: (4 + num_classes, anchors) array of [cx, cy, w, h, class scores...]
+        gain: Letterbox scale gain
+        pad: Letterbox (left, top) padding
+        frame_shape: Shape of the original frame
+        conf: Confidence threshold
+        iou: Class-aware NMS IoU threshold
+        max_det: Maximum detections kept
+
+    Returns:
+        (N, 6) array of [x1, y1, x2, y2, confidence, class_id] rows in frame pixels
+    """
+    prediction = prediction.T
+    scores = prediction[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    keep = confidences > conf
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    boxes, confidences, class_ids = prediction[keep, :4], confidences[keep], class_ids[keep]
+
+    # cx, cy, w, h -> x, y, w, h for OpenCV's NMS
+    rects = boxes.copy()
+    rects[:, :2] -= rects[:, 2:] / 2
+    indices = cv2.dnn.NMSBoxesBatched(rects.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou)
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    indices = indices[np.argsort(-confidences[indices])][:max_det]
+
+    rects = rects[indices]
+    detections = np.empty((len(indices), 6), dtype=np.float32)
+    detections[:, :2] = rects[:, :2]
+    detections[:, 2:4] = rects[:, :2] + rects[:, 2:]
+    detections[:, 4] = confidences[indices]
+    detections[:, 5] = class_ids[indices]
+    return to_frame_coordinates(detections, gain, pad, frame_shape)
+
+
+class Detector:
+    """
+    Detector backend interface
+
+    Every backend maps a batch of BGR frames to one (N, 6) array per frame
+    with rows [x1, y1, x2, y2, confidence, class_id] in frame pixels, so the
+    tracking code downstream doesn't care which runtime produced them.
+    """
+
+    backend = "base"
+    names: Dict[int, str] = {}
+    # perf_counter (start, end) of each stage of the last detect() call, for tracing
+    stage_times: Dict[str, Tuple[float, float]] = {}
+    # Event counts of the last detect() call, summed by the inference scheduler
+    counters: Dict[str, int] = {}
+
+    def detect(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+    def detect_prepared(self, batch: PreparedBatch) -> List[np.ndarray]:
+        """detect() reusing the batch's letterboxed inputs where the backend can"""
+        return self.detect(batch.frames)
+
+
+class UltralyticsDetector(Detector):
+    """PyTorch (or any ultralytics-loadable) weights run through ultralytics.YOLO"""
+
+    backend = "pytorch"
+
+    def __init__(self, path: str, imgsz: int = 640, conf: float = DEFAULT_CONF,
+                 iou: float = DEFAULT_IOU, half: bool = False, num_threads: Optional[int] = None):
+        from ultralytics import YOLO
+
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        self.model = YOLO(path)
+        self.names = dict(self.model.names)
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.half = half
+        self.buffers = BufferPool()
+
+    def detect(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        # Letterboxing into reused buffers here replaces ultralytics' per-call preprocessing
+        return self.detect_prepared(PreparedBatch(frames, self.buffers))
+
+    def detect_prepared(self, batch: PreparedBatch) -> List[np.ndarray]:
+        import torch
+
+        # A tensor input skips ultralytics' own letterbox; boxes come back in input coordinates
+        started = time.perf_counter()
+        stride = int(self.model.model.stride.max())
+        tensor = torch.from_numpy(batch.tensor(self.imgsz, stride=stride))
+        preprocessed = time.perf_counter()
+        options = {"half": True} if self.half else {}
+        results = self.model(tensor, imgsz=self.imgsz, conf=self.conf, iou=self.iou, verbose=False, **options)
+        inferred = time.perf_counter()
+        detections = [
+            to_frame_coordinates(result.boxes.data.cpu().numpy(), gain, pad, frame.shape)
+            for result, (_, gain, pad), frame in zip(results, batch.letterboxed(self.imgsz, stride), batch.frames)
+        ]
+        self.stage_times = {
+            "preprocess": (started, preprocessed),
+            "inference": (preprocessed, inferred),
+            "postprocess": (inferred, time.perf_counter()),
+        }
+        return detections
+
+
+class _ExportedDetector(Detector):
+    """Shared letterbox/NMS path for runtimes that execute the raw exported graph"""
+
+    def __init__(self, imgsz: int, conf: float, iou: float):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.input_dtype = np.float32
+        self.dynamic_batch = True
+        self.buffers = BufferPool()
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def detect(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        return self.detect_prepared(PreparedBatch(frames, self.buffers))
+
+    def detect_prepared(self, batch: PreparedBatch) -> List[np.ndarray]:
+        started = time.perf_counter()
+        frames = batch.frames
+        letterboxed = batch.letterboxed(self.imgsz)
+        tensor = batch.tensor(self.imgsz, self.input_dtype)
+        batches = [tensor] if self.dynamic_batch else [tensor[index:index + 1] for index in range(len(frames))]
+        preprocessed = time.perf_counter()
+
+        if len(batches) == 1:
+            predictions = self._infer(batches[0])
+        else:
+            predictions = np.concatenate([self._infer(batch) for batch in batches])
+        inferred = time.perf_counter()
+
+        detections = [
+            postprocess(prediction.astype(np.float32, copy=False), gain, pad, frame.shape, self.conf, self.iou)
+            for prediction, (_, gain, pad), frame in zip(predictions, letterboxed, frames)
+        ]
+        self.stage_times = {
+            "preprocess": (started, preprocessed),
+            "inference": (preprocessed, inferred),
+            "postprocess": (inferred, time.perf_counter()),
+        }
+        return detections
+
+
+class OnnxRuntimeDetector(_ExportedDetector):
+    """ONNX Runtime on the CPU execution provider (FP32 or statically quantized INT8 models)"""
+
+    backend = "onnxruntime"
+
+    def __init__(self, path: str, imgsz: int = 640, conf: float = DEFAULT_CONF,
+                 iou: float = DEFAULT_IOU, half: bool = False, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        super().__init__(imgsz, conf, iou)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+
+        # ultralytics stores the class names in the model metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self.names = ast.literal_eval(metadata["names"])
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINODetector(_ExportedDetector):
+    """OpenVINO on the CPU plugin (FP32, FP16-compressed or NNCF INT8 IR models)"""
+
+    backend = "openvino"
+
+    def __init__(self, path: str, imgsz: int = 640, conf: float = DEFAULT_CONF,
+                 iou: float = DEFAULT_IOU, half: bool = False, num_threads: Optional[int] = None):
+        import openvino as ov
+
+        super().__init__(imgsz, conf, iou)
+        # ultralytics exports a directory holding the .xml/.bin pair and metadata.yaml
+        xml_path = path
+        if os.path.isdir(path):
+            xml_path = sorted(glob.glob(os.path.join(path, "*.xml")))[0]
+            metadata_path = os.path.join(path, "metadata.yaml")
+            if os.path.exists(metadata_path):
+                import yaml
+                with open(metadata_path) as f:
+                    self.names = yaml.safe_load(f).get("names", {})
+
+        core = ov.Core()
+        model = core.read_model(xml_path)
+        # Allow any batch size so a whole scheduler batch is one infer call
+        model.reshape([-1, 3, self.imgsz, self.imgsz])
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if num_threads:
+            config["INFERENCE_NUM_THREADS"] = num_threads
+        if half:
+            config["INFERENCE_PRECISION_HINT"] = "f16"
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[self.output]
+
+
+class CascadeDetector(Detector):
+    """
+    Two-stage cascade: a small screener sees every frame, a large model confirms
+
+    The screener (e.g. a nano model at low resolution, with a low confidence
+    threshold) runs on the whole batch. Its detections that are uncertain
+    (below escalate_below) or of a class that always needs confirmation are
+    escalated: padded crops around them, merged where they overlap, go to the
+    confirmer in one batch, and the confirmer's detections replace the
+    escalated ones (none found means a screener false positive). Confident
+    detections of other classes are kept as the screener reported them. When
+    the crops would cover more than max_crop_ratio of a frame, the whole
+    frame is escalated instead.
+
+    A screener trained on other classes than the confirmer is only used to
+    propose regions: all of its detections are escalated.
+    """
+
+    backend = "cascade"
+
+    def __init__(self, path: str, imgsz: int = 640, conf: float = DEFAULT_CONF, iou: float = DEFAULT_IOU,
+                 half: bool = False, num_threads: Optional[int] = None, confirmer_backend: str = "pytorch",
+                 screener: Optional[dict] = None, escalate_below: float = 0.6,
+                 escalate_classes: Sequence[str] = (), crop_padding: float = 0.5, min_crop: int = 96,
+                 max_crop_ratio: float = 0.5):
+        if not screener or "path" not in screener:
+            raise ValueError("Cascade detector needs a screener model path")
+        screener = dict(screener)
+        self.confirmer = create_detector(confirmer_backend, path, imgsz=imgsz, conf=conf, iou=iou,
+                                         half=half, num_threads=num_threads)
+        self.screener = create_detector(screener.pop("backend", confirmer_backend), screener.pop("path"),
+                                        iou=iou, num_threads=num_threads, **screener)
+        self.names = self.confirmer.names
+        self.iou = iou
+        self.escalate_below = escalate_below
+        self.crop_padding = crop_padding
+        self.min_crop = min_crop
+        self.max_crop_ratio = max_crop_ratio
+
+        self.region_proposals = dict(self.screener.names) != dict(self.confirmer.names)
+        if self.region_proposals:
+            logger.warning("Cascade screener and confirmer classes differ; every screener detection is escalated")
+        wanted = {name.lower() for name in escalate_classes}
+        self.escalate_ids = np.array([class_id for class_id, name in self.screener.names.items()
+                                      if str(name).lower() in wanted], dtype=np.float32)
+
+    def _escalated(self, detections: np.ndarray) -> np.ndarray:
+        if self.region_proposals:
+            return np.ones(len(detections), dtype=bool)
+        return (detections[:, 4] < self.escalate_below) | np.isin(detections[:, 5], self.escalate_ids)
+
+    def _crop_regions(self, boxes: np.ndarray, frame_shape: Tuple[int, ...]) -> List[Region]:
+        # Padded crops around the escalated boxes, merged until none overlap
+        height, width = frame_shape[:2]
+        sizes = boxes[:, 2:4] - boxes[:, :2]
+        half = np.maximum(sizes * (0.5 + self.crop_padding), self.min_crop / 2)
+        centers = (boxes[:, :2] + boxes[:, 2:4]) / 2
+        crops = np.concatenate([centers - half, centers + half], axis=1).tolist()
+
+        merged = True
+        while merged and len(crops) > 1:
+            merged = False
+            for i in range(len(crops)):
+                for j in range(i + 1, len(crops)):
+                    a, b = crops[i], crops[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        crops[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del crops[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        regions = [(max(0, int(x1)), max(0, int(y1)), min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2))))
+                   for x1, y1, x2, y2 in crops]
+        if sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions) > self.max_crop_ratio * width * height:
+            return [(0, 0, width, height)]
+        return regions
+
+    def detect(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        started = time.perf_counter()
+        screened = self.screener.detect(frames)
+        screened_at = time.perf_counter()
+
+        kept, crops, owners = [], [], []
+        counters = {"frames": len(frames), "screened": 0, "escalated": 0, "crops": 0,
+                    "full_frames": 0, "confirmed": 0}
+        for index, (frame, detections) in enumerate(zip(frames, screened)):
+            escalated = self._escalated(detections)
+            kept.append(detections[~escalated])
+            counters["screened"] += len(detections)
+            counters["escalated"] += int(escalated.sum())
+            if escalated.any():
+                for region in self._crop_regions(detections[escalated, :4], frame.shape):
+                    x1, y1, x2, y2 = region
+                    crops.append(frame[y1:y2, x1:x2])
+                    owners.append((index, region))
+                    if region == (0, 0, frame.shape[1], frame.shape[0]):
+                        counters["full_frames"] += 1
+
+        # Every crop of the batch goes through the large model together
+        parts = [([boxes], [(0, 0, 0, 0)]) for boxes in kept]
+        if crops:
+            for (index, region), boxes in zip(owners, self.confirmer.detect(crops)):
+                parts[index][0].append(boxes)
+                parts[index][1].append(region)
+                counters["confirmed"] += len(boxes)
+        counters["crops"] = len(crops)
+
+        detections = [merge_detections(boxes, regions, iou_threshold=self.iou) for boxes, regions in parts]
+        self.stage_times = {"screen": (started, screened_at), "confirm": (screened_at, time.perf_counter())}
+        self.counters = counters
+        return detections
+
+
+class _Member(NamedTuple):
+    name: str
+    detector: Detector
+    class_map: np.ndarray  # Model class id -> taxonomy index, -1 for classes not kept
+
+
+class MultiModelDetector(Detector):
+    """
+    Several models run on the same frames, fused into one class space
+
+    A JSON file lists the models, each with the mapping from its class names
+    to the service's object types; classes left out are dropped:
+
+        {
+          "models": [
+            {"name": "aircraft", "path": "weights/aircraft.pt",
+             "classes": {"AirPlane": "Airplane", "Drone": "Drone", "Helicopter": "Helicopter"}},
+            {"name": "birds", "path": "yolov8n.pt", "imgsz": 320, "classes": {"bird": "Bird"}},
+            {"name": "ordnance", "backend": "onnxruntime", "path": "weights/ordnance.onnx",
+             "classes": {"Missile": "Missile", "Tank": "Tank", "tank": "Tank"}}
+          ],
+          "nms_iou": 0.5,
+          "parallel": true
+        }
+
+    Relative paths are resolved against the file's directory. Models left
+    without imgsz, conf or iou use the detector's settings.
+
+    Each batch is letterboxed once per input size (see PreparedBatch), the
+    models run concurrently on one thread each (one after the other when
+    "parallel" is false or there is a single core), and their detections, with
+    class ids mapped to taxonomy indices, go through a class-aware NMS
+    across models before tracking.
+    """
+
+    backend = "multi"
+
+    def __init__(self, path: str, imgsz: int = 640, conf: float = DEFAULT_CONF, iou: float = DEFAULT_IOU,
+                 half: bool = False, num_threads: Optional[int] = None, taxonomy: Sequence[str] = ()):
+        with open(path) as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        taxonomy_index = {name: index for index, name in enumerate(taxonomy)}
+        self.names = dict(enumerate(taxonomy))
+        self.nms_iou = float(config.get("nms_iou", 0.5))
+
+        self.members: List[_Member] = []
+        for model in config["models"]:
+            options = {"imgsz": imgsz, "conf": conf, "iou": iou, "half": half}
+            options.update({key: model[key] for key in options if key in model})
+            detector = create_detector(model.get("backend", "pytorch"), os.path.join(base_dir, model["path"]),
+                                       num_threads=num_threads, **options)
+
+            class_map = np.full(max(detector.names, default=-1) + 1, -1, dtype=np.int64)
+            for class_id, class_name in detector.names.items():
+                target = model["classes"].get(class_name, model["classes"].get(str(class_id)))
+                if target is None:
+                    continue
+                if target not in taxonomy_index:
+                    raise ValueError(f"Unknown object type '{target}' for model '{model['name']}'")
+                class_map[class_id] = taxonomy_index[target]
+            self.members.append(_Member(model["name"], detector, class_map))
+
+        # Every runtime releases the GIL during inference, so models overlap
+        # when there are cores for them; on one core they'd only contend
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        workers = min(len(self.members), cores) if config.get("parallel", True) else 1
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model") if workers > 1 else None
+        self.buffers = BufferPool()
+
+    def _fuse(self, member: _Member, detections: np.ndarray) -> np.ndarray:
+        class_ids = detections[:, 5].astype(np.int64)
+        known = class_ids < len(member.class_map)
+        mapped = np.where(known, member.class_map[np.where(known, class_ids, 0)], -1)
+        detections = detections[mapped >= 0].copy()
+        detections[:, 5] = mapped[mapped >= 0]
+        return detections
+
+    def detect(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        started = time.perf_counter()
+        batch = PreparedBatch(frames, self.buffers)
+        for size in {member.detector.imgsz for member in self.members if hasattr(member.detector, "imgsz")}:
+            batch.letterboxed(size)
+        prepared = time.perf_counter()
+
+        run = lambda member: member.detector.detect_prepared(batch)
+        outputs = list(self._pool.map(run, self.members)) if self._pool is not None else list(map(run, self.members))
+        inferred = time.perf_counter()
+
+        counters = {"frames": len(frames)}
+        per_frame: List[List[np.ndarray]] = [[] for _ in frames]
+        for member, detections in zip(self.members, outputs):
+            fused = [self._fuse(member, boxes) for boxes in detections]
+            counters[f"detections.{member.name}"] = sum(len(boxes) for boxes in fused)
+            for index, boxes in enumerate(fused):
+                per_frame[index].append(boxes)
+
+        # Class-aware NMS across models, so one object seen by two models is kept once
+        origin = [(0, 0, 0, 0)] * len(self.members)
+        results = [merge_detections(parts, origin, iou_threshold=self.nms_iou) for parts in per_frame]
+
+        stage_times = {"letterbox": (started, prepared)}
+        for member in self.members:
+            for stage, span in member.detector.stage_times.items():
+                stage_times[f"{member.name}.{stage}"] = span
+        stage_times["fuse"] = (inferred, time.perf_counter())
+        self.stage_times = stage_times
+        self.counters = counters
+        return results
+
+
+def cascade_stats(counters: Dict[str, int]) -> dict:
+    """Summed CascadeDetector counters plus the share of screener detections escalated"""
+    screened = counters.get("screened", 0)
+    frames = counters.get("frames", 0)
+    return {
+        **counters,
+        "escalation_rate": round(counters.get("escalated", 0) / screened, 3) if screened else 0.0,
+        "crops_per_frame": round(counters.get("crops", 0) / frames, 3) if frames else 0.0,
+    }
+
+
+DETECTOR_BACKENDS = {
+    "pytorch": UltralyticsDetector,
+    "onnxruntime": OnnxRuntimeDetector,
+    "openvino": OpenVINODetector,
+    "cascade": CascadeDetector,
+    "multi": MultiModelDetector,
+}
+
+
+def create_detector(backend: str, path: str, **options) -> Detector:
+    """
+    Create a detector for the configured backend
+
+    Args:
+        backend: "pytorch", "onnxruntime", "openvino", "cascade" or "multi"
+        path: Weights (.pt), ONNX file or OpenVINO model directory/.xml
+            (the confirming model for "cascade")
+        options: imgsz, conf, iou, half, num_threads; for "cascade" also
+            confirmer_backend, screener (backend, path and options of the
+            screening model) and the escalation settings; for "multi" the
+            path is the models file and taxonomy lists the object types
+
+    Returns:
+        Loaded detector
+    """
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {sorted(DETECTOR_BACKENDS)}")
+    detector = DETECTOR_BACKENDS[backend](path, **options)
+    logger.info(f"Loaded {backend} detector from {path}")
+    return detector
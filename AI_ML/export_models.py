@@ -0,0 +1,157 @@
+"""
+Export trained YOLOv8 weights to the CPU runtimes supported by detectors.py
+
+    python export_models.py path/to/best.pt
+    python export_models.py path/to/best.pt --formats onnx openvino --int8 --half
+
+Writes next to the weights:
+
+    best.onnx                 ONNX Runtime, FP32, dynamic batch
+    best_int8.onnx            ONNX Runtime, static INT8 (QDQ) quantized
+    best_openvino_model/      OpenVINO IR, FP32 (FP16 weights with --half)
+    best_int8_openvino_model/ OpenVINO IR, NNCF INT8
+
+Serve one of them with DETECTOR_BACKEND=onnxruntime|openvino and MODEL_PATH
+pointing at the artifact. INT8 and FP16 variants are only exported when the
+CPU has the instructions that make them faster (VNNI/AMX and AVX512-FP16/AMX),
+unless --force is given.
+"""
+import argparse
+import glob
+import logging
+import os
+import random
+import shutil
+from typing import List, Set
+
+import cv2
+
+from detectors import letterbox, to_input_tensor
+
+logger = logging.getLogger("airborne-threat-detection")
+
+DEFAULT_CALIBRATION_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        "Classification_Model", "data.yaml")
+DEFAULT_CALIBRATION_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          "Classification_Model", "valid", "images")
+INT8_CPU_FLAGS = {"avx512_vnni", "avx_vnni", "amx_int8"}
+FP16_CPU_FLAGS = {"avx512_fp16", "amx_fp16"}
+
+
+def cpu_flags() -> Set[str]:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+class CalibrationReader:
+    """Feeds letterboxed validation images to ONNX Runtime's static quantizer"""
+
+    def __init__(self, input_name: str, image_paths: List[str], imgsz: int):
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._paths = iter(image_paths)
+
+    def get_next(self):
+        for path in self._paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                image, _, _ = letterbox(frame, self.imgsz)
+                return {self.input_name: to_input_tensor([image])}
+        return None
+
+
+def export_onnx(model, imgsz: int) -> str:
+    return model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+
+def quantize_onnx(onnx_path: str, images_dir: str, imgsz: int, num_images: int) -> str:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    image_paths = sorted(glob.glob(os.path.join(images_dir, "*.jpg")) + glob.glob(os.path.join(images_dir, "*.png")))
+    if not image_paths:
+        raise SystemExit(f"No calibration images found in {images_dir}")
+    random.Random(0).shuffle(image_paths)
+
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    prepared_path = onnx_path.replace(".onnx", "_prep.onnx")
+    output_path = onnx_path.replace(".onnx", "_int8.onnx")
+    quant_pre_process(onnx_path, prepared_path, skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            prepared_path, output_path,
+            CalibrationReader(input_name, image_paths[:num_images], imgsz),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    finally:
+        os.remove(prepared_path)
+    return output_path
+
+
+def export_openvino(model, imgsz: int, half: bool, int8: bool, data: str) -> str:
+    path = model.export(format="openvino", imgsz=imgsz, half=half, int8=int8, data=data if int8 else None)
+    if int8 and "int8" not in os.path.basename(path.rstrip(os.sep)):
+        # Keep the INT8 IR next to, not over, the FP32 one
+        int8_path = path.rstrip(os.sep).replace("_openvino_model", "_int8_openvino_model")
+        shutil.rmtree(int8_path, ignore_errors=True)
+        shutil.move(path, int8_path)
+        path = int8_path
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("weights", help="Trained YOLOv8 weights (best.pt)")
+    parser.add_argument("--formats", nargs="+", choices=["onnx", "openvino"], default=["onnx", "openvino"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also export INT8 quantized variants")
+    parser.add_argument("--half", action="store_true", help="Export the OpenVINO model with FP16 weights")
+    parser.add_argument("--force", action="store_true", help="Export INT8/FP16 even if the CPU lacks support")
+    parser.add_argument("--data", default=DEFAULT_CALIBRATION_DATA, help="Dataset yaml for OpenVINO INT8 calibration")
+    parser.add_argument("--calibration-images", default=DEFAULT_CALIBRATION_IMAGES,
+                        help="Image directory for ONNX INT8 calibration")
+    parser.add_argument("--calibration-count", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from ultralytics import YOLO
+
+    flags = cpu_flags()
+    int8 = args.int8
+    half = args.half
+    if int8 and not (flags & INT8_CPU_FLAGS) and not args.force:
+        logger.warning("CPU has no VNNI/AMX INT8 instructions, skipping INT8 export (use --force to override)")
+        int8 = False
+    if half and not (flags & FP16_CPU_FLAGS) and not args.force:
+        logger.warning("CPU has no native FP16 arithmetic, skipping FP16 export (use --force to override)")
+        half = False
+
+    model = YOLO(args.weights)
+    artifacts = []
+    if "onnx" in args.formats:
+        onnx_path = export_onnx(model, args.imgsz)
+        artifacts.append(("onnxruntime", onnx_path))
+        if int8:
+            artifacts.append(("onnxruntime",
+                              quantize_onnx(onnx_path, args.calibration_images, args.imgsz, args.calibration_count)))
+    if "openvino" in args.formats:
+        artifacts.append(("openvino", export_openvino(model, args.imgsz, half, False, args.data)))
+        if int8:
+            artifacts.append(("openvino", export_openvino(model, args.imgsz, False, True, args.data)))
+
+    for backend, path in artifacts:
+        logger.info(f"DETECTOR_BACKEND={backend} MODEL_PATH={path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+EMPTY_BOXES = np.zeros((0, 6), dtype=np.float32)
+
+
+class FlowTracker:
+    """
+    Keyframe scheduler that carries boxes between detector runs with optical flow
+
+    The detector only runs on keyframes. On the frames in between, every box
+    from the previous frame is moved by the median sparse Lucas-Kanade flow of
+    corners found inside it, and the moved boxes stand in for detections.
+    Points that fail a forward-backward check are discarded; a box that keeps
+    none of its points is dropped.
+
+    The keyframe interval adapts to how well flow holds the tracks: it grows by
+    one after every keyframe span without trouble, up to max_interval, and
+    halves (with an immediate keyframe) when the share of points kept falls
+    below min_quality or a keyframe finds a different number of objects than
+    flow carried.
+    """
+
+    def __init__(self, max_interval: int = 5, min_quality: float = 0.5, max_corners: int = 12,
+                 fb_threshold: float = 1.0, win_size: int = 15, pyramid_levels: int = 3):
+        self.max_interval = max(1, max_interval)
+        self.min_quality = min_quality
+        self.max_corners = max_corners
+        self.fb_threshold = fb_threshold  # Forward-backward error in pixels
+        self._lk_params = dict(winSize=(win_size, win_size), maxLevel=pyramid_levels,
+                               criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self._search_margin = win_size * 2 ** pyramid_levels
+
+        self.interval = 1
+        self._since_keyframe = 0
+        self._force_keyframe = True  # No boxes to carry before the first detection
+        self._span_ok = True
+        self._gray: Optional[np.ndarray] = None
+        self._boxes = EMPTY_BOXES
+
+        self.keyframes = 0
+        self.frames_propagated = 0
+        self.boxes_lost = 0
+        self.quality = 1.0  # Share of points kept on the last propagated frame
+
+    def keyframe_due(self) -> bool:
+        """
+        Decide whether the next frame goes to the detector
+
+        Called once per frame, in frame order, before detection.
+
+        Returns:
+            True if the frame is a keyframe
+        """
+        self._since_keyframe += 1
+        if self._force_keyframe or self._since_keyframe >= self.interval:
+            self._force_keyframe = False
+            self._since_keyframe = 0
+            return True
+        return False
+
+    def step(self, frame: np.ndarray, detections: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Advance to a frame
+
+        Called once per frame, in frame order, after detection.
+
+        Args:
+            frame: BGR frame
+            detections: (N, 6) detections on a keyframe, None to propagate
+
+        Returns:
+            (N, 6) detections for the frame: the detector's on keyframes,
+            the previous boxes moved by optical flow otherwise
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if detections is not None or self._gray is None or self._gray.shape != gray.shape:
+            self._keyframe(detections if detections is not None else EMPTY_BOXES)
+        else:
+            self._boxes = self._propagate(self._gray, gray)
+        self._gray = gray
+        return self._boxes
+
+    def _keyframe(self, detections: np.ndarray):
+        self.keyframes += 1
+        if self.frames_propagated > 0 and len(detections) != len(self._boxes):
+            self._span_ok = False
+        if self._span_ok:
+            self.interval = min(self.max_interval, self.interval + 1)
+        else:
+            self.interval = max(1, self.interval // 2)
+        self._span_ok = True
+        self._boxes = np.asarray(detections, dtype=np.float32)
+
+    def _seed_points(self, gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Corners inside each box, or its centre when the box is too small or flat
+        height, width = gray.shape
+        points, owners = [], []
+        for index, (x1, y1, x2, y2) in enumerate(self._boxes[:, :4].tolist()):
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2)))
+            corners = None
+            if x2 - x1 >= 8 and y2 - y1 >= 8:
+                corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_corners, 0.01, 2)
+            if corners is None:
+                corners = np.array([[[(x2 - x1) / 2, (y2 - y1) / 2]]], dtype=np.float32)
+            points.append(corners.reshape(-1, 2) + (x1, y1))
+            owners.append(np.full(len(corners), index))
+        return np.concatenate(points).astype(np.float32), np.concatenate(owners)
+
+    def _propagate(self, previous: np.ndarray, gray: np.ndarray) -> np.ndarray:
+        self.frames_propagated += 1
+        if len(self._boxes) == 0:
+            return self._boxes
+
+        # All boxes' points go through one pyramidal LK call each way, on a
+        # crop around the boxes wide enough for the largest trackable motion
+        points, owners = self._seed_points(previous)
+        height, width = gray.shape
+        x1, y1 = np.maximum(points.min(axis=0) - self._search_margin, 0).astype(int)
+        x2, y2 = np.minimum(points.max(axis=0) + self._search_margin + 1, (width, height)).astype(int)
+        previous, gray = previous[y1:y2, x1:x2], gray[y1:y2, x1:x2]
+        local = (points - (x1, y1)).astype(np.float32)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, gray, local, None, **self._lk_params)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, previous, moved, None, **self._lk_params)
+        error = np.hypot(*(back - local).T)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.fb_threshold)
+
+        kept = np.bincount(owners[good], minlength=len(self._boxes))
+        seeded = np.bincount(owners, minlength=len(self._boxes))
+        self.quality = float(kept.sum() / seeded.sum())
+
+        boxes = self._boxes.copy()
+        shift = moved - local
+        for index in np.flatnonzero(kept):
+            dx, dy = np.median(shift[good & (owners == index)], axis=0)
+            boxes[index, [0, 2]] += dx
+            boxes[index, [1, 3]] += dy
+
+        lost = int((kept == 0).sum())
+        self.boxes_lost += lost
+        if lost or self.quality < self.min_quality:
+            self._span_ok = False
+            self._force_keyframe = True
+        return boxes[kept > 0]
+
+    def stats(self) -> dict:
+        frames = max(1, self.keyframes + self.frames_propagated)
+        return {
+            "interval": self.interval,
+            "max_interval": self.max_interval,
+            "keyframes": self.keyframes,
+            "frames_propagated": self.frames_propagated,
+            "keyframe_rate": round(self.keyframes / frames, 3),
+            "boxes_lost": self.boxes_lost,
+            "quality": round(self.quality, 3),
+        }
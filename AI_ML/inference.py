@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from metrics import Histogram
+import tracing
+
+logger = logging.getLogger("airborne-threat-detection")
+
+# Queued frame: (frame, result future, enqueue time, trace of the frame if sampled)
+QueueItem = Tuple[np.ndarray, asyncio.Future, float, Optional[tracing.FrameTrace]]
+
+
+class InferenceScheduler:
+    """
+    Central micro-batching queue in front of the detector
+
+    Frames submitted by any caller (/analyze/, /analyze_video/, /ws) are
+    collected into batches bounded by max_batch_size and max_wait_ms, and each
+    batch is run as a single detector call on the execution backend (see
+    workers.py), with up to backend.concurrency batches in flight. Every
+    caller gets its own detections back through an asyncio future.
+    """
+
+    def __init__(self, backend, max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0, max_queue_size: int = 256):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_depth_hist = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_hist = Histogram([0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0])
+        self.batch_latency_hist = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5])
+        self.frames_processed = 0
+        self.batches_processed = 0
+        self.detector_counters: Dict[str, int] = {}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.backend.concurrency)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f})"
+        )
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        for task in list(self._in_flight):
+            task.cancel()
+
+        # Fail anything still waiting so callers don't hang on shutdown
+        while self._queue is not None and not self._queue.empty():
+            self._fail([self._queue.get_nowait()], RuntimeError("Inference scheduler stopped"))
+
+        self.backend.shutdown()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Queue a frame for batched inference and wait for its detections
+
+        Args:
+            frame: Decoded BGR frame
+
+        Returns:
+            (N, 6) array of [x1, y1, x2, y2, confidence, class_id] rows
+        """
+        if self._queue is None:
+            raise RuntimeError("Inference scheduler is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        # Blocks when the queue is full, which pushes back on the callers
+        await self._queue.put((frame, future, time.perf_counter(), tracing.current()))
+        return await future
+
+    async def submit_many(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Queue several frames back to back so they land in the same batch
+
+        Args:
+            frames: Decoded BGR frames, e.g. the tiles of one sliced frame
+
+        Returns:
+            One (N, 6) detections array per frame
+        """
+        if self._queue is None:
+            raise RuntimeError("Inference scheduler is not running")
+
+        loop = asyncio.get_running_loop()
+        trace = tracing.current()
+        futures = []
+        for frame in frames:
+            future = loop.create_future()
+            await self._queue.put((frame, future, time.perf_counter(), trace))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect_batch(self) -> List[QueueItem]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free backend worker before forming the next batch so
+            # frames keep accumulating while all workers are busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            self.queue_depth_hist.observe(self._queue.qsize())
+
+            # Callers that gave up (e.g. a closed websocket) don't need inference
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[QueueItem]):
+        try:
+            now = time.perf_counter()
+            for _, _, enqueued_at, _ in batch:
+                self.queue_wait_hist.observe(now - enqueued_at)
+            self.batch_size_hist.observe(len(batch))
+
+            frames = [frame for frame, _, _, _ in batch]
+            try:
+                outputs, timing = await asyncio.wrap_future(self.backend.submit(frames))
+            except asyncio.CancelledError:
+                self._fail(batch, RuntimeError("Inference scheduler stopped"))
+                raise
+            except Exception as e:
+                logger.error(f"Batched inference failed: {str(e)}")
+                self._fail(batch, e)
+                return
+
+            self.batch_latency_hist.observe(time.perf_counter() - now)
+            self.frames_processed += len(batch)
+            self.batches_processed += 1
+            for name, count in timing.counters.items():
+                self.detector_counters[name] = self.detector_counters.get(name, 0) + count
+
+            for (_, future, enqueued_at, trace), detections in zip(batch, outputs):
+                if trace is not None:
+                    trace.add("queue_wait", enqueued_at, now)
+                    trace.add_batch(timing, batch_size=len(batch))
+                if not future.done():
+                    future.set_result(detections)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _fail(batch: List[QueueItem], error: Exception):
+        for _, future, _, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.backend.concurrency,
+            "batches_in_flight": len(self._in_flight),
+            "queue_depth": self.queue_depth,
+            "frames_processed": self.frames_processed,
+            "batches_processed": self.batches_processed,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_depth_at_dispatch": self.queue_depth_hist.snapshot(),
+            "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+            "batch_latency_seconds": self.batch_latency_hist.snapshot(),
+            "detector": dict(self.detector_counters),
+            **self.backend.stats(),
+        }
@@ -0,0 +1,285 @@
+"""
+Server-side ingest of camera streams and video files
+
+Each registered source is read by its own decode thread, so clients no
+longer have to push frames: the thread pulls from an RTSP/HTTP URL, a local
+capture device or a video file (optionally looped, as a stand-in for a
+camera), and hands every decoded frame to the event loop. There the stream's
+AdaptiveStride decides whether the frame is analysed, and admitted frames go
+to a LatestFrameSlot, so a source that outpaces the detector sheds stale
+frames instead of queueing them. A per-source task takes frames from the
+slot and runs them through the caller's process coroutine.
+
+Live sources that fail or drop are reopened with exponential backoff; files
+are paced at their native frame rate unless an explicit rate is given.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from rate_control import AdaptiveStride, LatestFrameSlot
+
+logger = logging.getLogger("airborne-threat-detection")
+
+RECONNECT_MIN_SECONDS = 1.0
+RECONNECT_MAX_SECONDS = 30.0
+DEFAULT_FILE_FPS = 25.0  # When a file doesn't report its frame rate
+
+
+class IngestSource:
+    """
+    One camera or file and the thread that decodes it
+
+    Args:
+        source_id: Name of the source in the API
+        url: RTSP/HTTP URL, capture device index ("0") or video file path
+        session_id: Stream session the frames are tracked in
+        loop_playback: Restart files from the beginning when they end
+        fps: Read rate cap; files default to their native rate, live sources
+            are read as fast as they deliver
+        rate_control: Stride controller deciding which frames are analysed
+    """
+
+    def __init__(self, source_id: str, url: str, session_id: Optional[str] = None, loop_playback: bool = False,
+                 fps: Optional[float] = None, rate_control: Optional[AdaptiveStride] = None):
+        self.source_id = source_id
+        self.url = url
+        self.session_id = session_id or source_id
+        self.loop_playback = loop_playback
+        self.fps = fps
+        self.rate_control = rate_control
+        self.slot = LatestFrameSlot()
+        self.latest = None  # Result of the newest analysed frame
+
+        self.state = "starting"
+        self.last_error: Optional[str] = None
+        self.started_at = time.time()
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.reconnects = 0
+        self.loops = 0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def is_file(self) -> bool:
+        return "://" not in self.url and not self.url.isdigit()
+
+    def start(self, process: Callable[["IngestSource", np.ndarray, float], Awaitable[object]]):
+        """Start the decode thread and the task that analyses its frames"""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._consume(process))
+        self._thread = threading.Thread(target=self._read, name=f"ingest-{self.source_id}", daemon=True)
+        self._thread.start()
+
+    async def stop(self, timeout_seconds: float = 5.0):
+        self._stop.set()
+        self.slot.close()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread is not None:
+            # A blocked network read only returns once the capture times out
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join, timeout_seconds)
+        if self.state not in ("finished", "failed"):
+            self.state = "stopped"
+
+    def _open(self) -> cv2.VideoCapture:
+        return cv2.VideoCapture(int(self.url) if self.url.isdigit() else self.url)
+
+    def _read(self):
+        backoff = RECONNECT_MIN_SECONDS
+        while not self._stop.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                cap.release()
+                self.last_error = "Failed to open source"
+                if self.is_file:
+                    self.state = "failed"
+                    break
+                self.state = "reconnecting"
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+                continue
+
+            native_fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FILE_FPS
+            fps = self.fps or (native_fps if self.is_file else None)
+            interval = 1.0 / fps if fps else 0.0
+            self.state = "streaming"
+            frames = 0
+            next_at = time.perf_counter()
+            try:
+                while not self._stop.is_set():
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    frames += 1
+                    self.frames_read += 1
+                    backoff = RECONNECT_MIN_SECONDS
+                    if not self._deliver(frame):
+                        return
+                    if interval:
+                        next_at += interval
+                        delay = next_at - time.perf_counter()
+                        if delay > 0:
+                            self._stop.wait(delay)
+                        else:
+                            next_at = time.perf_counter()  # Fell behind: carry on without bursting
+            finally:
+                cap.release()
+
+            if self._stop.is_set():
+                break
+            if self.is_file:
+                if not self.loop_playback or frames == 0:
+                    self.state = "finished" if frames else "failed"
+                    break
+                self.loops += 1
+                continue
+            self.last_error = "Stream ended"
+            self.reconnects += 1
+            self.state = "reconnecting"
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+        self._deliver(None)
+
+    def _deliver(self, frame: Optional[np.ndarray]) -> bool:
+        # Hand a frame (None: end of source) to the event loop
+        try:
+            self._loop.call_soon_threadsafe(self._offer, frame, time.perf_counter())
+            return True
+        except RuntimeError:  # Event loop closed
+            return False
+
+    def _offer(self, frame: Optional[np.ndarray], read_at: float):
+        if frame is None:
+            self.slot.close()
+        elif self.rate_control is None or self.rate_control.admit():
+            self.slot.put((frame, read_at))
+
+    async def _consume(self, process: Callable[["IngestSource", np.ndarray, float], Awaitable[object]]):
+        while (item := await self.slot.get()) is not None:
+            frame, read_at = item
+            try:
+                self.latest = await process(self, frame, read_at)
+                self.frames_processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error processing frame from source {self.source_id}: {e}")
+
+    @property
+    def frames_dropped(self) -> int:
+        skipped = self.rate_control.frames_skipped if self.rate_control is not None else 0
+        return skipped + self.slot.dropped
+
+    def stats(self) -> dict:
+        stats = {
+            "source_id": self.source_id,
+            "url": self.url,
+            "session_id": self.session_id,
+            "state": self.state,
+            "loop": self.loop_playback,
+            "fps": self.fps,
+            "frames_read": self.frames_read,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "loops": self.loops,
+            "last_error": self.last_error,
+            "started_at": self.started_at,
+        }
+        if self.rate_control is not None:
+            stats["stream"] = self.rate_control.stats(self.slot.dropped)
+        return stats
+
+
+class IngestManager:
+    """
+    Registry of ingest sources
+
+    Args:
+        process: Coroutine run on every admitted frame as (source, frame,
+            read_at), returning the frame's result
+        create_rate_control: Factory for each source's stride controller
+    """
+
+    def __init__(self, process: Callable[[IngestSource, np.ndarray, float], Awaitable[object]],
+                 create_rate_control: Optional[Callable[[], AdaptiveStride]] = None):
+        self.process = process
+        self.create_rate_control = create_rate_control
+        self._sources: Dict[str, IngestSource] = {}
+        # Totals of removed sources, so the counters never go backwards
+        self._retired_read = 0
+        self._retired_processed = 0
+        self._retired_dropped = 0
+
+    def add(self, source_id: str, url: str, session_id: Optional[str] = None, loop_playback: bool = False,
+            fps: Optional[float] = None) -> IngestSource:
+        """
+        Register a source and start reading it
+
+        Raises:
+            ValueError: If a source with this id already exists
+        """
+        if source_id in self._sources:
+            raise ValueError(f"Source '{source_id}' already exists")
+        rate_control = self.create_rate_control() if self.create_rate_control is not None else None
+        source = IngestSource(source_id, url, session_id, loop_playback, fps, rate_control)
+        self._sources[source_id] = source
+        source.start(self.process)
+        logger.info(f"Started ingest source {source_id} ({url})")
+        return source
+
+    async def remove(self, source_id: str) -> Optional[IngestSource]:
+        source = self._sources.pop(source_id, None)
+        if source is None:
+            return None
+        await source.stop()
+        self._retired_read += source.frames_read
+        self._retired_processed += source.frames_processed
+        self._retired_dropped += source.frames_dropped
+        logger.info(f"Stopped ingest source {source_id}")
+        return source
+
+    def load(self, path: str):
+        """Start the sources listed in a JSON file of [{"source_id", "url", ...}]"""
+        with open(path) as f:
+            for config in json.load(f):
+                self.add(config["source_id"], config["url"], config.get("session_id"),
+                         config.get("loop", False), config.get("fps"))
+
+    async def stop(self):
+        for source_id in list(self._sources):
+            await self.remove(source_id)
+
+    def get(self, source_id: str) -> Optional[IngestSource]:
+        return self._sources.get(source_id)
+
+    def list(self) -> List[dict]:
+        return [source.stats() for source in list(self._sources.values())]
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    @property
+    def frames_read(self) -> int:
+        return self._retired_read + sum(source.frames_read for source in list(self._sources.values()))
+
+    @property
+    def frames_processed(self) -> int:
+        return self._retired_processed + sum(source.frames_processed for source in list(self._sources.values()))
+
+    @property
+    def frames_dropped(self) -> int:
+        return self._retired_dropped + sum(source.frames_dropped for source in list(self._sources.values()))
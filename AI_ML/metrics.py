@@ -0,0 +1,250 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram that is cheap enough to update on the hot path
+
+    Buckets are upper bounds (inclusive); values above the last bucket are
+    counted in an implicit +Inf bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def record(self, start: float, end: float):
+        self.observe(end - start)
+
+    def snapshot(self) -> Dict:
+        """
+        Return a consistent copy of the histogram
+
+        Returns:
+            Dict with per-bucket counts (non-cumulative), sum and count
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+
+        labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, counts)),
+            "sum": total,
+            "count": count,
+            "mean": total / count if count else 0.0,
+        }
+
+
+class Counter:
+    """Monotonically increasing count, or one read from a callback at scrape time"""
+
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self._value = 0.0
+        self._function = function
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return float(self._function()) if self._function is not None else self._value
+
+
+class Gauge:
+    """Value that goes up and down, or one read from a callback at scrape time"""
+
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return float(self._function()) if self._function is not None else self._value
+
+
+class StageClock:
+    """
+    Splits the time of a sequence of stages into per-stage histograms
+
+    Each lap costs one perf_counter call and one record, so a frame can be
+    instrumented stage by stage on the hot path. A stage is anything with
+    record(start, end): a Histogram, or a tracing.Stage that also adds a
+    span to the frame's trace.
+    """
+
+    __slots__ = ("_last",)
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def reset(self):
+        """Start the next lap now, leaving out the time since the previous one"""
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or construction) into stage"""
+        now = time.perf_counter()
+        stage.record(self._last, now)
+        self._last = now
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class Family:
+    """A labelled metric: one child metric per combination of label values"""
+
+    def __init__(self, label_names: Sequence[str], factory: Callable[[], Metric]):
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Metric] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Metric:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"Expected labels {self.label_names}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Metric]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """
+    Named metrics rendered in the Prometheus text exposition format
+
+    Metrics are created through the registry (or existing ones registered
+    with it) and rendered on demand by render(), so recording stays a plain
+    method call on the metric itself.
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics: Dict[str, Tuple[str, str, Union[Metric, Family]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, help_text: str, metric: Metric) -> Metric:
+        """
+        Expose an existing metric under a name, replacing any metric registered under it
+
+        Useful for metrics owned by objects that are recreated, such as the
+        inference scheduler's histograms.
+        """
+        with self._lock:
+            self._metrics[self.prefix + name] = (_kind(metric), help_text, metric)
+        return metric
+
+    def _add(self, name: str, help_text: str, kind: str, metric):
+        with self._lock:
+            if self.prefix + name in self._metrics:
+                raise ValueError(f"Metric {self.prefix + name} is already registered")
+            self._metrics[self.prefix + name] = (kind, help_text, metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = (),
+                function: Optional[Callable[[], float]] = None) -> Union[Counter, Family]:
+        metric = Family(labels, Counter) if labels else Counter(function)
+        return self._add(name, help_text, "counter", metric)
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Union[Gauge, Family]:
+        metric = Family(labels, Gauge) if labels else Gauge(function)
+        return self._add(name, help_text, "gauge", metric)
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float],
+                  labels: Sequence[str] = ()) -> Union[Histogram, Family]:
+        metric = Family(labels, lambda: Histogram(buckets)) if labels else Histogram(buckets)
+        return self._add(name, help_text, "histogram", metric)
+
+    def render(self) -> str:
+        """
+        Render every metric
+
+        Returns:
+            Text in the Prometheus exposition format (version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.items())
+
+        lines = []
+        for name, (kind, help_text, metric) in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, Family):
+                children = metric.children()
+                label_names = metric.label_names
+            else:
+                children = [((), metric)]
+                label_names = ()
+            for values, child in children:
+                if isinstance(child, Histogram):
+                    lines.extend(_render_histogram(name, label_names, values, child))
+                else:
+                    lines.append(f"{name}{_format_labels(label_names, values)} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _kind(metric: Metric) -> str:
+    if isinstance(metric, Counter):
+        return "counter"
+    if isinstance(metric, Gauge):
+        return "gauge"
+    if isinstance(metric, Histogram):
+        return "histogram"
+    raise TypeError(f"Unsupported metric type {type(metric).__name__}")
+
+
+def _render_histogram(name: str, label_names: Sequence[str], values: Sequence[str],
+                      histogram: Histogram) -> List[str]:
+    snapshot = histogram.snapshot()
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + [float("inf")], snapshot["buckets"].values()):
+        cumulative += count
+        labels = _format_labels((*label_names, "le"), (*values, _format_value(bound)))
+        lines.append(f"{name}_bucket{labels} {cumulative}")
+    labels = _format_labels(label_names, values)
+    lines.append(f"{name}_sum{labels} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{labels} {snapshot['count']}")
+    return lines
@@ -0,0 +1,163 @@
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Region = Tuple[int, int, int, int]  # x1, y1, x2, y2 in full-frame pixels
+
+
+class MotionGate:
+    """
+    Cheap motion pre-filter in front of the detector
+
+    Each frame is downscaled to scale_width, converted to grayscale and
+    compared against the previous frame ("diff") or a MOG2 background model
+    ("mog2"). Frames without motion skip detection, so the tracker coasts on
+    empty detections. Frames whose motion is confined to a small area are
+    cropped to the padded union of the moving regions. A full-frame pass
+    is still forced every refresh_every frames so that hovering targets
+    keep being re-detected.
+    """
+
+    def __init__(self, method: str = "diff", scale_width: int = 160, threshold: int = 25,
+                 min_area: int = 4, padding: float = 0.5, refresh_every: int = 10,
+                 max_crop_ratio: float = 0.5):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion gate method '{method}', expected 'diff' or 'mog2'")
+
+        self.method = method
+        self.scale_width = scale_width
+        self.threshold = threshold
+        self.min_area = min_area  # In downscaled pixels
+        self.padding = padding  # Fraction of the union size added on each side
+        self.refresh_every = refresh_every
+        self.max_crop_ratio = max_crop_ratio
+
+        self._previous: Optional[np.ndarray] = None
+        self._subtractor = (
+            cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=16, detectShadows=False)
+            if method == "mog2" else None
+        )
+        self._kernel = np.ones((3, 3), np.uint8)
+        self._since_full = refresh_every  # Force a full pass on the first frame
+
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.frames_cropped = 0
+        self.frames_refreshed = 0
+
+    def _motion_mask(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray)
+            # The first frame only seeds the background model
+            return mask if self.frames_checked > 0 else None
+
+        previous, self._previous = self._previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return None
+        diff = cv2.absdiff(previous, gray)
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        return mask
+
+    def motion_regions(self, frame: np.ndarray) -> Optional[List[Region]]:
+        """
+        Find moving regions in a frame
+
+        Args:
+            frame: BGR frame
+
+        Returns:
+            Bounding boxes of moving regions in full-frame pixels, or None
+            when there is no reference yet
+        """
+        height, width = frame.shape[:2]
+        scale = self.scale_width / width
+        small = cv2.resize(frame, (self.scale_width, max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        mask = self._motion_mask(gray)
+        if mask is None:
+            return None
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        regions = []
+        for x, y, w, h, area in stats[1:count]:  # Label 0 is the background
+            if area >= self.min_area:
+                regions.append((
+                    int(x / scale), int(y / scale),
+                    min(width, int(np.ceil((x + w) / scale))),
+                    min(height, int(np.ceil((y + h) / scale)))
+                ))
+        return regions
+
+    def update(self, frame: np.ndarray) -> Optional[List[Region]]:
+        """
+        Feed a frame to the gate
+
+        Args:
+            frame: BGR frame
+
+        Returns:
+            Moving regions in full-frame pixels, or None when a full-frame
+            pass is due (no reference yet, or the periodic refresh)
+        """
+        regions = self.motion_regions(frame)
+        self.frames_checked += 1
+        self._since_full += 1
+
+        if regions is None or self._since_full >= self.refresh_every:
+            self._since_full = 0
+            self.frames_refreshed += 1
+            return None
+        return regions
+
+    def plan(self, frame: np.ndarray) -> Optional[Region]:
+        """
+        Decide which part of a frame, if any, the detector should see
+
+        Args:
+            frame: BGR frame
+
+        Returns:
+            Region to run detection on (the whole frame or a crop), or None to
+            skip detection for this frame
+        """
+        height, width = frame.shape[:2]
+        full_frame = (0, 0, width, height)
+        regions = self.update(frame)
+
+        if regions is None:
+            return full_frame
+
+        if not regions:
+            self.frames_skipped += 1
+            return None
+
+        x1 = min(region[0] for region in regions)
+        y1 = min(region[1] for region in regions)
+        x2 = max(region[2] for region in regions)
+        y2 = max(region[3] for region in regions)
+        pad_x = int((x2 - x1) * self.padding) + 8
+        pad_y = int((y2 - y1) * self.padding) + 8
+        crop = (max(0, x1 - pad_x), max(0, y1 - pad_y), min(width, x2 + pad_x), min(height, y2 + pad_y))
+
+        if (crop[2] - crop[0]) * (crop[3] - crop[1]) > self.max_crop_ratio * width * height:
+            self._since_full = 0
+            return full_frame
+
+        self.frames_cropped += 1
+        return crop
+
+    def stats(self) -> dict:
+        checked = max(1, self.frames_checked)
+        return {
+            "method": self.method,
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "frames_cropped": self.frames_cropped,
+            "frames_refreshed": self.frames_refreshed,
+            "skip_rate": round(self.frames_skipped / checked, 3),
+        }
@@ -0,0 +1,101 @@
+"""
+Reusable buffers for the per-frame preprocessing path
+
+A 720p frame passes through several multi-megabyte intermediates on its way
+to the model: the decoded frame, its resized copy, the letterbox canvas and
+the float input tensor. Allocating them per frame costs page faults and
+allocator churn on every frame; these pools keep them across frames.
+
+    BufferPool  scratch arrays owned by one consumer that handles a frame
+                (or batch) at a time, e.g. a detector replica's letterbox
+                canvases and input tensor
+    FramePool   frame buffers checked out per frame and returned once the
+                frame's analysis is done, for stages that hand frames on
+                (decode, resize) while earlier frames are still in flight
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Hashable, List, Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Scratch arrays reused across calls, one per role
+
+    get() returns the same array every time a role is asked for with the
+    same shape and dtype (and replaces it when they change, so memory stays
+    at one buffer per role); the owner must be done with one call's buffers
+    before the next call starts.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[Tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, role: Hashable, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        shape, dtype = tuple(shape), np.dtype(dtype)
+        with self._lock:
+            buffer = self._buffers.get(role)
+            if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+                buffer = self._buffers[role] = np.empty(shape, dtype=dtype)
+                self.allocations += 1
+            else:
+                self.reuses += 1
+            return buffer
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "buffers": len(self._buffers),
+            "bytes": sum(buffer.nbytes for buffer in list(self._buffers.values())),
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+        }
+
+
+class FramePool:
+    """
+    Frame buffers checked out for the lifetime of one frame
+
+    Released buffers are kept per shape for the next acquire, up to
+    max_free per shape; buffers that are never released are simply
+    garbage collected, so a frame dropped midway costs an allocation, not a leak.
+    """
+
+    def __init__(self, max_free: int = 16):
+        self.max_free = max_free
+        self._free: Dict[Tuple, List[np.ndarray]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer: np.ndarray):
+        # Only whole, writable buffers can be handed out again
+        if buffer is None or buffer.base is not None or not buffer.flags.writeable:
+            return
+        with self._lock:
+            free = self._free[(buffer.shape, buffer.dtype)]
+            if len(free) < self.max_free:
+                free.append(buffer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            free = sum(len(buffers) for buffers in self._free.values())
+        return {"free": free, "allocations": self.allocations, "reuses": self.reuses}
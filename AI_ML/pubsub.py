@@ -0,0 +1,220 @@
+"""
+Fan-out of analysis results from one pipeline to many viewers
+
+Every analysed frame's result is published to its stream session's topic.
+Viewers subscribe to a topic and all receive the same results, so ten
+operators watching one camera cost one pipeline, not ten: inference scales
+with the number of cameras, not the number of viewers.
+
+A topic keeps its recent results in one ring buffer shared by all of its
+subscribers; a subscription is a cursor into that buffer. Publishing never
+waits for anyone. A subscriber that reads slower than results arrive falls
+behind, and once it is more than its max_lag results behind its policy
+applies:
+
+    drop_oldest   skip ahead to the newest max_lag results, counting the
+                  skipped ones as dropped
+    close         end the subscription, for consumers that must see every
+                  result or none
+
+Topics exist while they have subscribers; results published to a session
+nobody watches are discarded at the cost of a dictionary lookup.
+"""
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+POLICIES = ("drop_oldest", "close")
+
+
+class Topic:
+    """Results of one stream session and the cursor position of the newest"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.buffer: Deque = deque(maxlen=capacity)
+        self.published = 0  # Sequence number of the next result
+        self.subscribers = 0
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def publish(self, item):
+        self.buffer.append(item)
+        self.published += 1
+        self.wake()
+
+    def close(self):
+        self.closed = True
+        self.wake()
+
+    def wake(self):
+        # Waiters hold the old event; later waiters get a fresh one
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self):
+        await self._event.wait()
+
+
+class Subscription:
+    """
+    One viewer's cursor into a topic
+
+    Args:
+        topic: Topic to read
+        max_lag: Results the viewer may fall behind before its policy applies
+        policy: "drop_oldest" or "close"
+        replay: Results already in the buffer to start with, e.g. 1 to show
+            the current state straight away
+    """
+
+    def __init__(self, topic: Topic, max_lag: int, policy: str, replay: int = 0):
+        self.topic = topic
+        self.max_lag = max(1, min(max_lag, topic.buffer.maxlen))
+        self.policy = policy
+        self.cursor = topic.published - min(max(replay, 0), len(topic.buffer))
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self.close_reason: Optional[str] = None
+
+    async def get(self):
+        """
+        Next result, waiting for one to be published
+
+        Returns:
+            The result, or None once the subscription or its topic is closed
+            (close_reason says why)
+        """
+        topic = self.topic
+        while self.cursor >= topic.published:
+            if self.closed:
+                return None
+            if topic.closed:
+                self.close("topic closed")
+                return None
+            await topic.wait()
+        if self.closed:
+            return None
+
+        lag = topic.published - self.cursor
+        if lag > self.max_lag:
+            if self.policy == "close":
+                self.close("lagging")
+                return None
+            self.dropped += lag - self.max_lag
+            lag = self.max_lag
+            self.cursor = topic.published - lag
+        self.cursor += 1
+        self.delivered += 1
+        return topic.buffer[-lag]
+
+    @property
+    def lag(self) -> int:
+        return self.topic.published - self.cursor
+
+    def close(self, reason: str = "unsubscribed"):
+        if not self.closed:
+            self.closed = True
+            self.close_reason = reason
+            self.topic.wake()  # Let a pending get() return
+
+    def stats(self) -> dict:
+        return {
+            "topic": self.topic.name,
+            "policy": self.policy,
+            "max_lag": self.max_lag,
+            "lag": self.lag,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+class PubSub:
+    """
+    Topics by stream session id
+
+    Publishing and subscribing happen on the event loop; none of it is thread-safe.
+
+    Args:
+        capacity: Results buffered per topic, the largest lag a subscriber
+            can have before it drops results
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = max(1, capacity)
+        self._topics: Dict[str, Topic] = {}
+        self._subscriptions: Dict[int, Subscription] = {}
+        self.published = 0  # Results published to watched topics
+        # Totals of ended subscriptions, so the counters never go backwards
+        self._retired_delivered = 0
+        self._retired_dropped = 0
+
+    def publish(self, topic: str, item) -> int:
+        """Publish a result, returning how many subscribers the topic has"""
+        target = self._topics.get(topic)
+        if target is None:
+            return 0
+        target.publish(item)
+        self.published += 1
+        return target.subscribers
+
+    def subscribe(self, topic: str, max_lag: int = 8, policy: str = "drop_oldest",
+                  replay: int = 0) -> Subscription:
+        """
+        Subscribe to a topic, creating it if nobody watches it yet
+
+        Raises:
+            ValueError: If the policy is unknown
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {', '.join(POLICIES)}")
+        target = self._topics.get(topic)
+        if target is None:
+            target = self._topics[topic] = Topic(topic, self.capacity)
+        target.subscribers += 1
+        subscription = Subscription(target, max_lag, policy, replay)
+        self._subscriptions[id(subscription)] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if self._subscriptions.pop(id(subscription), None) is None:
+            return
+        subscription.close()
+        self._retired_delivered += subscription.delivered
+        self._retired_dropped += subscription.dropped
+        topic = subscription.topic
+        topic.subscribers -= 1
+        if topic.subscribers == 0 and self._topics.get(topic.name) is topic:
+            del self._topics[topic.name]
+
+    def close(self, topic: str):
+        """End a topic's subscriptions once they have read what is buffered"""
+        target = self._topics.pop(topic, None)
+        if target is not None:
+            target.close()
+
+    def subscribers(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            target = self._topics.get(topic)
+            return target.subscribers if target is not None else 0
+        return len(self._subscriptions)
+
+    @property
+    def delivered(self) -> int:
+        return self._retired_delivered + sum(sub.delivered for sub in list(self._subscriptions.values()))
+
+    @property
+    def dropped(self) -> int:
+        return self._retired_dropped + sum(sub.dropped for sub in list(self._subscriptions.values()))
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._topics),
+            "subscribers": len(self._subscriptions),
+            "capacity": self.capacity,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "subscriptions": [sub.stats() for sub in list(self._subscriptions.values())],
+        }
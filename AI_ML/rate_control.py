@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+class LatestFrameSlot:
+    """
+    Single-slot mailbox between a stream's receiver and its processor
+
+    Putting a frame replaces any frame still waiting, so the processor always
+    picks up the newest one and a slow pipeline sheds stale frames instead of
+    building a backlog.
+    """
+
+    def __init__(self):
+        self._item: Any = None
+        self._has_item = False
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item: Any):
+        if self._has_item:
+            self.dropped += 1
+        self._item = item
+        self._has_item = True
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[Any]:
+        """
+        Wait for the newest frame
+
+        Returns:
+            The newest item, or None once the slot is closed and empty
+        """
+        while not self._has_item:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+        item = self._item
+        self._item = None
+        self._has_item = False
+        return item
+
+
+class AdaptiveStride:
+    """
+    Per-stream controller deciding which incoming frames get analysed
+
+    The base stride is dense (active_stride) while objects are being tracked
+    and sparse (idle_stride) when the scene is empty. When the measured
+    end-to-end latency exceeds the budget the stride is raised one step per
+    result, and relaxed again once latency falls below half the budget.
+    """
+
+    def __init__(self, latency_budget_ms: Optional[float] = 250.0, active_stride: int = 1,
+                 idle_stride: int = 3, max_stride: int = 15, smoothing: float = 0.2):
+        self.latency_budget = latency_budget_ms / 1000.0 if latency_budget_ms else None
+        self.active_stride = max(1, active_stride)
+        self.idle_stride = max(1, idle_stride)
+        self.max_stride = max(self.idle_stride, self.active_stride, max_stride)
+        self.smoothing = smoothing
+
+        self.stride = self.active_stride
+        self.latency = 0.0  # Smoothed end-to-end latency in seconds
+        self._pressure = 0
+        self._since_last = 0
+
+        self.frames_received = 0
+        self.frames_skipped = 0
+        self.frames_processed = 0
+        self._processed_at = deque(maxlen=64)
+        self._received_at = deque(maxlen=64)
+
+    def admit(self) -> bool:
+        """
+        Record an incoming frame and decide whether it should be analysed
+
+        Returns:
+            True if the frame should go to the pipeline
+        """
+        self.frames_received += 1
+        self._received_at.append(time.perf_counter())
+
+        self._since_last += 1
+        if self._since_last >= self.stride:
+            self._since_last = 0
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def record_strided(self, frames_advanced: int):
+        """
+        Account for frames a file reader stepped over itself using the current stride
+
+        Args:
+            frames_advanced: Frames consumed from the source, including the one analysed
+        """
+        self.frames_received += frames_advanced
+        self.frames_skipped += max(0, frames_advanced - 1)
+
+    def record_result(self, latency_seconds: Optional[float], active_tracks: int):
+        """
+        Feed back the outcome of an analysed frame
+
+        Args:
+            latency_seconds: Time from frame arrival to result, None if not measured
+            active_tracks: Number of objects tracked in the result
+        """
+        self.frames_processed += 1
+        self._processed_at.append(time.perf_counter())
+
+        if latency_seconds is not None:
+            if self.frames_processed == 1:
+                self.latency = latency_seconds
+            else:
+                self.latency += self.smoothing * (latency_seconds - self.latency)
+
+        if self.latency_budget is not None:
+            if self.latency > self.latency_budget:
+                self._pressure += 1
+            elif self.latency < self.latency_budget / 2 and self._pressure > 0:
+                self._pressure -= 1
+
+        base = self.active_stride if active_tracks > 0 else self.idle_stride
+        self._pressure = min(self._pressure, self.max_stride - base)
+        self.stride = base + self._pressure
+
+    @staticmethod
+    def _rate(timestamps: deque) -> float:
+        if len(timestamps) < 2:
+            return 0.0
+        elapsed = timestamps[-1] - timestamps[0]
+        return (len(timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self, dropped: int = 0) -> dict:
+        return {
+            "stride": self.stride,
+            "latency_ms": round(self.latency * 1000, 1),
+            "latency_budget_ms": self.latency_budget * 1000 if self.latency_budget else None,
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "frames_dropped": dropped,
+            "input_fps": round(self._rate(self._received_at), 2),
+            "achieved_fps": round(self._rate(self._processed_at), 2),
+        }
@@ -0,0 +1,252 @@
+"""
+Detection cache for repeated frames
+
+Static cameras, client retries and services that resubmit the same image
+send frames the detector has already seen. The cache keeps the raw detector
+output of recent frames so such a frame skips inference; its detections
+still go through the session's tracker like any other frame's.
+
+Two keys are tried in turn:
+
+    exact     BLAKE2b digest of the encoded bytes as uploaded, so a hit
+              costs one hash over the JPEG/PNG payload
+    near      difference hash (dHash) of a small grayscale thumbnail,
+              compared by Hamming distance; catches re-encoded or
+              slightly noisy copies of a frame
+
+Near-duplicate matching is off by default: a thumbnail can't see a small
+object that moved a few pixels, so it trades accuracy for throughput and
+suits mostly static scenes. Both keys also include the frame size and the
+detection regions, since cached boxes are in frame pixels.
+
+Entries are evicted least recently used first once the entry or byte cap is
+reached, and expire ttl_seconds after they were stored whether or not they
+were hit since.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+ENTRY_OVERHEAD_BYTES = 256  # Rough per-entry bookkeeping beyond the detection array
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+
+class CacheLookup(NamedTuple):
+    """Outcome of a lookup, passed back to put on a miss"""
+    key: Optional[Tuple[bytes, int]]  # Exact key, None without encoded bytes
+    tag: int  # Frame size and regions
+    phash: Optional[np.ndarray]  # Packed dHash bits, None with near matching off
+    detections: Optional[np.ndarray]  # Cached detections, None on a miss
+
+
+class _Entry(NamedTuple):
+    detections: np.ndarray
+    stored_at: float
+    nbytes: int
+    slot: int  # Row in the near-duplicate index, -1 for none
+
+
+class DetectionCache:
+    """
+    LRU/TTL cache of raw detections keyed by frame content
+
+    Args:
+        max_entries: Entries kept
+        max_bytes: Approximate memory cap over all entries
+        ttl_seconds: Age at which an entry stops being served
+        near_distance: Largest number of differing hash bits for a
+            near-duplicate hit, negative for exact hits only
+        hash_size: Side of the dHash grid, giving hash_size ** 2 bits
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl_seconds: float = 30.0,
+                 near_distance: int = -1, hash_size: int = 16):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.near_distance = near_distance
+        self.hash_size = hash_size
+
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Near-duplicate index: one packed hash per row, searched in a single
+        # vectorized pass; rows are reused through the free list
+        self._hashes = np.zeros((self.max_entries, hash_size * hash_size // 8), dtype=np.uint8)
+        self._tags = np.zeros(self.max_entries, dtype=np.int64)
+        self._used = np.zeros(self.max_entries, dtype=bool)
+        self._slot_keys: List[Optional[Tuple]] = [None] * self.max_entries
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    @property
+    def near_enabled(self) -> bool:
+        return self.near_distance >= 0
+
+    def perceptual_hash(self, frame: np.ndarray) -> np.ndarray:
+        """Packed dHash bits: whether each thumbnail pixel is brighter than its right neighbour"""
+        size = self.hash_size
+        # Subsample before the area resize so large frames cost about as much as small ones
+        step = max(1, min(frame.shape[0] // (size * 8), frame.shape[1] // (size * 8)))
+        small = cv2.resize(frame[::step, ::step], (size + 1, size), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return np.packbits(small[:, 1:] > small[:, :-1])
+
+    def get(self, frame: np.ndarray, regions: Sequence[Tuple[int, int, int, int]],
+            data: Optional[bytes] = None) -> CacheLookup:
+        """
+        Look a frame up
+
+        Args:
+            frame: Decoded BGR frame
+            regions: Regions the detector would run on
+            data: Encoded bytes the frame was decoded from, None for frames
+                without one (only near-duplicate matching applies)
+
+        Returns:
+            Lookup whose detections are set on a hit
+        """
+        tag = hash((frame.shape, tuple(map(tuple, regions))))
+        key = (hashlib.blake2b(data, digest_size=16).digest(), tag) if data is not None else None
+        phash = None
+        now = time.monotonic()
+
+        if key is not None:
+            with self._lock:
+                entry = self._live(key, now)
+                if entry is not None:
+                    self.exact_hits += 1
+                    return CacheLookup(key, tag, None, entry.detections)
+
+        if self.near_enabled:
+            phash = self.perceptual_hash(frame)
+            with self._lock:
+                entry = self._nearest(phash, tag, now)
+                if entry is not None:
+                    self.near_hits += 1
+                    return CacheLookup(key, tag, phash, entry.detections)
+
+        with self._lock:
+            self.misses += 1
+        return CacheLookup(key, tag, phash, None)
+
+    def put(self, lookup: CacheLookup, detections: np.ndarray):
+        """Store the detections of a frame that missed"""
+        if lookup.key is None and lookup.phash is None:
+            return
+        # Hits hand the same array to every caller, so it must not change under them
+        detections = np.array(detections, dtype=np.float32)
+        detections.flags.writeable = False
+        nbytes = detections.nbytes + ENTRY_OVERHEAD_BYTES
+        key = lookup.key if lookup.key is not None else (lookup.phash.tobytes(), lookup.tag)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            slot = -1
+            if lookup.phash is not None:
+                if not self._free:
+                    self._evict_oldest()
+                slot = self._free.pop()
+                self._hashes[slot] = lookup.phash
+                self._tags[slot] = lookup.tag
+                self._used[slot] = True
+                self._slot_keys[slot] = key
+            self._entries[key] = _Entry(detections, time.monotonic(), nbytes, slot)
+            self._bytes += nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._evict_oldest()
+
+    def _live(self, key: Tuple, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.stored_at > self.ttl_seconds:
+            self._remove(key)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, phash: np.ndarray, tag: int, now: float) -> Optional[_Entry]:
+        candidates = np.flatnonzero(self._used & (self._tags == tag))
+        if len(candidates) == 0:
+            return None
+        distances = _POPCOUNT[self._hashes[candidates] ^ phash].sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.near_distance:
+            return None
+        return self._live(self._slot_keys[candidates[best]], now)
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        if entry.slot >= 0:
+            self._used[entry.slot] = False
+            self._slot_keys[entry.slot] = None
+            self._free.append(entry.slot)
+
+    def _evict_oldest(self):
+        self._remove(next(iter(self._entries)))
+        self.evicted += 1
+
+    def expire(self) -> int:
+        """Drop entries older than the TTL, returning how many were dropped"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.stored_at < cutoff]
+            for key in stale:
+                self._remove(key)
+            self.expired += len(stale)
+        return len(stale)
+
+    async def run_expiry(self, interval_seconds: float = 10.0):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self.expire()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    @property
+    def hits(self) -> int:
+        return self.exact_hits + self.near_hits
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "near_distance": self.near_distance,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "inferences_saved": self.hits,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from preprocess import FramePool
+from track_store import TrackStore
+
+logger = logging.getLogger("airborne-threat-detection")
+
+
+class StreamContext:
+    """
+    Tracking state for one camera stream, websocket connection or video upload
+
+    Owns its own norfair tracker, track store (Kalman filters and position
+    history), frame buffers and (optionally) motion gate, tile planner and
+    keyframe flow tracker, so concurrent streams never see each other's
+    tracks or background.
+    """
+
+    def __init__(self, session_id: str, tracker, motion_gate=None, tile_planner=None,
+                 tracks: Optional[TrackStore] = None, flow_tracker=None):
+        self.session_id = session_id
+        self.tracker = tracker
+        self.tracks = tracks if tracks is not None else TrackStore()
+        self.motion_gate = motion_gate
+        self.tile_planner = tile_planner
+        self.flow_tracker = flow_tracker
+        # Decoded/resized frames are recycled through here once analysed
+        self.buffers = FramePool()
+        self.frame_counter = 0
+        # Set by live streams that shed load (see rate_control.py)
+        self.rate_control = None
+        self.frame_slot = None
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+        # Frames of one stream must be tracked one at a time
+        self.lock = threading.Lock()
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    def stats(self) -> dict:
+        stats = {
+            "session_id": self.session_id,
+            "frames": self.frame_counter,
+            "tracked_objects": len(self.tracks),
+            "tracks": self.tracks.stats(),
+            "created_at": self.created_at,
+            "idle_seconds": round(time.time() - self.last_seen, 2),
+        }
+        if self.rate_control is not None:
+            dropped = self.frame_slot.dropped if self.frame_slot is not None else 0
+            stats["stream"] = self.rate_control.stats(dropped)
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.stats()
+        if self.tile_planner is not None:
+            stats["slicing"] = self.tile_planner.stats()
+        if self.flow_tracker is not None:
+            stats["keyframes"] = self.flow_tracker.stats()
+        return stats
+
+
+class SessionManager:
+    """
+    Registry of live stream sessions with idle TTL eviction and a session cap
+
+    When the cap is reached the least recently used session is evicted to make
+    room, which bounds the memory held by tracking state. on_remove is called
+    with the id of every session removed or evicted, for state kept outside
+    the session (e.g. compiled zones).
+    """
+
+    def __init__(self, create_tracker: Callable[[], object], ttl_seconds: float = 300.0,
+                 max_sessions: int = 64, create_motion_gate: Optional[Callable[[], object]] = None,
+                 create_tile_planner: Optional[Callable[[], object]] = None,
+                 create_track_store: Optional[Callable[[], TrackStore]] = None,
+                 create_flow_tracker: Optional[Callable[[], object]] = None,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        self.create_tracker = create_tracker
+        self.create_motion_gate = create_motion_gate
+        self.create_tile_planner = create_tile_planner
+        self.create_track_store = create_track_store or TrackStore
+        self.create_flow_tracker = create_flow_tracker
+        self.on_remove = on_remove
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, StreamContext]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[StreamContext]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def get_or_create(self, session_id: Optional[str] = None) -> StreamContext:
+        """
+        Return the session with the given id, creating it if needed
+
+        Args:
+            session_id: Client supplied session id, None to generate a new one
+
+        Returns:
+            The (possibly new) stream context, marked as recently used
+        """
+        evicted = []
+        with self._lock:
+            if session_id is None:
+                session_id = uuid.uuid4().hex
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    evicted_id, _ = self._sessions.popitem(last=False)
+                    evicted.append(evicted_id)
+                    self.evicted += 1
+                    logger.info(f"Session cap reached, evicted least recently used session {evicted_id}")
+                motion_gate = self.create_motion_gate() if self.create_motion_gate else None
+                tile_planner = self.create_tile_planner() if self.create_tile_planner else None
+                flow_tracker = self.create_flow_tracker() if self.create_flow_tracker else None
+                session = StreamContext(session_id, self.create_tracker(), motion_gate, tile_planner,
+                                        self.create_track_store(), flow_tracker)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+
+            session.touch()
+
+        self._removed(evicted)
+        return session
+
+    def _removed(self, session_ids: List[str]):
+        if self.on_remove is not None:
+            for session_id in session_ids:
+                self.on_remove(session_id)
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            removed = self._sessions.pop(session_id, None) is not None
+        if removed:
+            self._removed([session_id])
+        return removed
+
+    def evict_idle(self) -> int:
+        """
+        Drop sessions that have been idle for longer than the TTL
+
+        Returns:
+            Number of sessions evicted
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session.last_seen < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+            self.evicted += len(expired)
+
+        self._removed(expired)
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle session(s)")
+        return len(expired)
+
+    async def run_eviction(self, interval_seconds: float = 30.0):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self.evict_idle()
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [session.stats() for session in sessions]
+
+    def live_tracks(self) -> int:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sum(len(session.tracks) for session in sessions)
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,173 @@
+"""
+Shared-memory ring of frame slots between the API process and inference workers
+
+Pickling a 1280x720 BGR frame (2.7 MB) to a worker process copies it into
+a pickle buffer, pushes it through a pipe in small chunks and copies it
+again on the other side. With the ring the API process copies each frame
+once, into a preallocated slot of a multiprocessing.shared_memory block,
+and sends the worker a FrameRef of a few dozen bytes; the worker maps the
+slot as a read-only NumPy view without copying.
+
+Index protocol, one header row per slot: [state, generation, nbytes]
+
+    FREE -> WRITING -> READY    only the owner (the creating process) writes
+    READY -> FREE               the owner, once the batch's results are back
+
+Workers never write to the header, so every field has a single writer and
+no cross-process lock or atomic is needed. The generation is bumped each
+time a slot is claimed and travels in the FrameRef, so a worker reading a
+recycled slot fails loudly instead of seeing another frame.
+"""
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+FREE, WRITING, READY = 0, 1, 2
+HEADER_FIELDS = 3  # state, generation, nbytes
+SLOT_ALIGN = 64  # Cache-line aligned slots
+
+
+class FrameRef(NamedTuple):
+    """Picklable handle to a frame in a ring slot"""
+    slot: int
+    generation: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class FrameRing:
+    """
+    Fixed number of preallocated frame slots in one shared memory block
+
+    Args:
+        slots: Number of slots
+        slot_bytes: Capacity of each slot; larger frames don't fit
+        name: Name of an existing block to attach to, None to create one
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = -(-slot_bytes // SLOT_ALIGN) * SLOT_ALIGN
+        header_bytes = -(-slots * HEADER_FIELDS * 8 // SLOT_ALIGN) * SLOT_ALIGN
+        self.owner = name is None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * self.slot_bytes)
+        else:
+            self._shm = _attach(name)
+        self.name = self._shm.name
+        self._header = np.ndarray((slots, HEADER_FIELDS), dtype=np.int64, buffer=self._shm.buf)
+        self._data = np.ndarray((slots, self.slot_bytes), dtype=np.uint8, buffer=self._shm.buf, offset=header_bytes)
+        if self.owner:
+            self._header[:] = 0
+
+        self._lock = threading.Lock()  # Between threads of the owner only
+        self._cursor = 0
+        self.in_use = 0
+        self.writes = 0
+        self.full = 0  # Writes refused because every slot was taken
+        self.oversized = 0  # Writes refused because the frame exceeds a slot
+
+    def spec(self) -> Tuple[str, int, int]:
+        """Arguments that attach another process to this ring"""
+        return self.name, self.slots, self.slot_bytes
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_bytes: int) -> "FrameRing":
+        return cls(slots, slot_bytes, name)
+
+    def write(self, frame: np.ndarray) -> Optional[FrameRef]:
+        """
+        Copy a frame into a free slot (owner only)
+
+        Returns:
+            Reference to pass to a worker, or None if the frame doesn't fit
+            or no slot is free (the caller sends the frame some other way)
+        """
+        if frame.nbytes > self.slot_bytes:
+            self.oversized += 1
+            return None
+        with self._lock:
+            slot = self._claim()
+            if slot is None:
+                self.full += 1
+                return None
+            self.in_use += 1
+            self.writes += 1
+        header = self._header[slot]
+        header[1] += 1
+        generation = int(header[1])
+        target = self._data[slot, :frame.nbytes].view(frame.dtype).reshape(frame.shape)
+        np.copyto(target, frame)  # Also packs non-contiguous crops
+        header[2] = frame.nbytes
+        header[0] = READY
+        return FrameRef(slot, generation, frame.shape, frame.dtype.str)
+
+    def _claim(self) -> Optional[int]:
+        # Next free slot at or after the cursor
+        states = self._header[:, 0]
+        for offset in range(self.slots):
+            slot = (self._cursor + offset) % self.slots
+            if states[slot] == FREE:
+                states[slot] = WRITING
+                self._cursor = (slot + 1) % self.slots
+                return slot
+        return None
+
+    def view(self, ref: FrameRef) -> np.ndarray:
+        """
+        Read-only zero-copy view of a frame written by the owner
+
+        Raises:
+            ValueError: If the slot no longer holds the referenced frame
+        """
+        state, generation, nbytes = self._header[ref.slot]
+        if state != READY or generation != ref.generation:
+            raise ValueError(f"Frame ring slot {ref.slot} was recycled before it was read")
+        frame = self._data[ref.slot, :nbytes].view(np.dtype(ref.dtype)).reshape(ref.shape)
+        frame.flags.writeable = False
+        return frame
+
+    def release(self, ref: FrameRef):
+        """Return a slot to the free list once its results are published (owner only)"""
+        header = self._header[ref.slot]
+        if header[1] == ref.generation and header[0] == READY:
+            header[0] = FREE
+            with self._lock:
+                self.in_use -= 1
+
+    def close(self):
+        # Views handed out must be gone before the mapping can close
+        self._header = self._data = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "slot_bytes": self.slot_bytes,
+            "in_use": self.in_use,
+            "writes": self.writes,
+            "full": self.full,
+            "oversized": self.oversized,
+        }
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The owner unlinks the block; attaching processes must not have the
+    # resource tracker remove it when they exit (track= exists from 3.13)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Older versions register every attach. Unregistering afterwards would
+    # also drop the owner's registration when the worker shares its tracker
+    # (spawned pool workers do), so skip registering as track=False does
+    register = resource_tracker.register
+    resource_tracker.register = lambda resource, rtype: None if rtype == "shared_memory" else register(resource, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from inference import InferenceScheduler
+from tracing import batch_timing
+
+
+class FakeBackend:
+    """Answers every frame with a detection row holding the frame's value"""
+
+    concurrency = 1
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.batches = []
+
+    def submit(self, frames):
+        self.batches.append(len(frames))
+        future = Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            outputs = [np.array([[0, 0, 1, 1, 0.9, frame.flat[0]]], dtype=np.float32) for frame in frames]
+            future.set_result((outputs, batch_timing(0.0, counters={"frames": len(frames)})))
+        return future
+
+    def stats(self):
+        return {}
+
+    def shutdown(self):
+        pass
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def run_scheduler(backend, coroutine, **kwargs):
+    async def main():
+        scheduler = InferenceScheduler(backend, **kwargs)
+        await scheduler.start()
+        try:
+            return scheduler, await coroutine(scheduler)
+        finally:
+            await scheduler.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_frames_share_a_batch_and_get_their_own_detections():
+    backend = FakeBackend()
+
+    async def submit(scheduler):
+        return await asyncio.gather(*(scheduler.submit(frame(value)) for value in range(4)))
+
+    scheduler, outputs = run_scheduler(backend, submit, max_batch_size=8, max_wait_ms=50)
+    assert backend.batches == [4]
+    assert [int(detections[0, 5]) for detections in outputs] == [0, 1, 2, 3]
+    assert scheduler.frames_processed == 4
+    assert scheduler.batches_processed == 1
+    assert scheduler.detector_counters == {"frames": 4}
+
+
+def test_batches_are_capped_at_max_batch_size():
+    backend = FakeBackend()
+
+    async def submit(scheduler):
+        return await scheduler.submit_many([frame(value) for value in range(5)])
+
+    _, outputs = run_scheduler(backend, submit, max_batch_size=2, max_wait_ms=50)
+    assert backend.batches == [2, 2, 1]
+    assert [int(detections[0, 5]) for detections in outputs] == [0, 1, 2, 3, 4]
+
+
+def test_lone_frame_is_dispatched_after_max_wait():
+    backend = FakeBackend()
+
+    async def submit(scheduler):
+        return await asyncio.wait_for(scheduler.submit(frame(7)), timeout=1.0)
+
+    _, detections = run_scheduler(backend, submit, max_batch_size=8, max_wait_ms=5)
+    assert backend.batches == [1]
+    assert int(detections[0, 5]) == 7
+
+
+def test_backend_errors_reach_every_caller_in_the_batch():
+    backend = FakeBackend(error=RuntimeError("model failed"))
+
+    async def submit(scheduler):
+        return await asyncio.gather(*(scheduler.submit(frame(value)) for value in range(3)),
+                                    return_exceptions=True)
+
+    scheduler, outputs = run_scheduler(backend, submit, max_batch_size=8, max_wait_ms=50)
+    assert all(isinstance(error, RuntimeError) for error in outputs)
+    assert scheduler.frames_processed == 0
+
+
+def test_submit_requires_a_running_scheduler():
+    scheduler = InferenceScheduler(FakeBackend())
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.submit(frame(0)))
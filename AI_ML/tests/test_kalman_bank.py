@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from kalman_bank import KalmanBank
+
+
+def reference_filter(bank: KalmanBank):
+    kalman = pytest.importorskip("filterpy.kalman")
+    kf = kalman.KalmanFilter(dim_x=4, dim_z=2)
+    kf.F, kf.H, kf.Q, kf.R = bank.F.copy(), bank.H.copy(), bank.Q.copy(), bank.R.copy()
+    kf.P *= bank.initial_covariance
+    return kf
+
+
+def test_batched_filters_match_per_object_filters():
+    bank = KalmanBank(capacity=2)
+    slots = [bank.allocate() for _ in range(3)]  # Grows past the initial capacity
+    filters = [reference_filter(bank) for _ in slots]
+    rng = np.random.default_rng(0)
+
+    for step in range(10):
+        measurements = np.array([[10.0 * step + index, 5.0 * step] for index in range(3)])
+        measurements += rng.normal(0, 1, measurements.shape)
+        bank.predict(slots)
+        bank.update(slots, measurements)
+        for kf, measurement in zip(filters, measurements):
+            kf.predict()
+            kf.update(measurement)
+
+    for slot, kf in zip(slots, filters):
+        np.testing.assert_allclose(bank.x[slot], kf.x[:, 0], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(bank.P[slot], kf.P, rtol=1e-9, atol=1e-9)
+
+
+def test_slots_are_reused_and_reset():
+    bank = KalmanBank(capacity=2)
+    first, second = bank.allocate(), bank.allocate()
+    assert (first, second) == (0, 1)
+    bank.update([first], np.array([[50.0, 60.0]]))
+
+    bank.release(first)
+    bank.release(first)  # Releasing twice must not hand the slot out twice
+    assert len(bank) == 1
+    assert bank.allocate() == first
+    assert bank.allocate() == 2
+    assert bank.capacity == 4
+    np.testing.assert_array_equal(bank.x[first], 0.0)
+    np.testing.assert_array_equal(bank.P[first], np.eye(4) * bank.initial_covariance)
+
+
+def test_rollout_follows_constant_velocity_without_changing_state():
+    bank = KalmanBank(dt=0.5)
+    slot = bank.allocate()
+    bank.x[slot] = [10.0, 20.0, 2.0, -4.0]
+
+    path = bank.rollout([slot], steps=3)
+    np.testing.assert_allclose(path[0], [[11.0, 18.0], [12.0, 16.0], [13.0, 14.0]])
+    np.testing.assert_array_equal(bank.x[slot], [10.0, 20.0, 2.0, -4.0])
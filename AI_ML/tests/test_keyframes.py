@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+
+import app
+from flow_tracker import FlowTracker
+from motion_gate import MotionGate
+from sessions import StreamContext
+
+
+def textured_frame() -> np.ndarray:
+    frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(frame, (5, 5), 0)
+
+
+def test_static_keyframes_keep_the_flow_carried_boxes():
+    session = StreamContext("static", tracker=None, motion_gate=MotionGate(refresh_every=1000),
+                            flow_tracker=FlowTracker(max_interval=2))
+    frame = textured_frame()
+    box = np.array([[100, 80, 140, 120, 0.9, 0]], dtype=np.float32)
+
+    # First frame: keyframe with a full-frame pass, the detector finds the box
+    assert app.plan_detection(session, frame) == [(0, 0, 320, 240)]
+    np.testing.assert_allclose(app.propagate_detections(session, frame, box), box)
+
+    for _ in range(4):
+        # Keyframe or not, a static frame is left to optical flow
+        assert app.plan_detection(session, frame) is None
+        carried = app.propagate_detections(session, frame, None)
+        np.testing.assert_allclose(carried[:, :4], box[:, :4], atol=0.5)
+
+    assert session.motion_gate.frames_skipped == 2
+    assert session.flow_tracker.keyframes == 1
+
+
+def test_frames_are_detected_without_a_flow_tracker():
+    session = StreamContext("gate-only", tracker=None, motion_gate=MotionGate(refresh_every=1000))
+    frame = textured_frame()
+    assert app.plan_detection(session, frame) == [(0, 0, 320, 240)]
+    assert app.plan_detection(session, frame) == []
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import app
+from pubsub import PubSub
+from sessions import SessionManager
+from zones import ZoneEngine
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_every_subscriber_gets_every_result():
+    async def main():
+        pubsub = PubSub(capacity=8)
+        first, second = pubsub.subscribe("cam"), pubsub.subscribe("cam")
+        for value in range(3):
+            assert pubsub.publish("cam", value) == 2
+        return [await first.get() for _ in range(3)], [await second.get() for _ in range(3)]
+
+    assert run(main()) == ([0, 1, 2], [0, 1, 2])
+
+
+def test_results_nobody_watches_are_discarded():
+    pubsub = PubSub()
+    assert pubsub.publish("cam", 1) == 0
+    assert pubsub.stats()["topics"] == 0
+
+
+def test_replay_starts_with_the_newest_result():
+    async def main():
+        pubsub = PubSub()
+        pubsub.subscribe("cam")
+        for value in range(3):
+            pubsub.publish("cam", value)
+        return await pubsub.subscribe("cam", replay=1).get()
+
+    assert run(main()) == 2
+
+
+def test_drop_oldest_skips_to_the_newest_results():
+    async def main():
+        pubsub = PubSub(capacity=16)
+        subscription = pubsub.subscribe("cam", max_lag=2)
+        for value in range(5):
+            pubsub.publish("cam", value)
+        return [await subscription.get() for _ in range(2)], subscription.dropped
+
+    assert run(main()) == ([3, 4], 3)
+
+
+def test_close_policy_ends_a_lagging_subscription():
+    async def main():
+        pubsub = PubSub(capacity=16)
+        subscription = pubsub.subscribe("cam", max_lag=2, policy="close")
+        for value in range(3):
+            pubsub.publish("cam", value)
+        return await subscription.get(), subscription.close_reason
+
+    assert run(main()) == (None, "lagging")
+
+
+def test_closing_a_topic_delivers_what_is_buffered_then_ends():
+    async def main():
+        pubsub = PubSub()
+        subscription = pubsub.subscribe("cam")
+        waiter = asyncio.ensure_future(subscription.get())
+        await asyncio.sleep(0)
+        pubsub.publish("cam", "last")
+        pubsub.close("cam")
+        return await waiter, await subscription.get(), subscription.close_reason
+
+    assert run(main()) == ("last", None, "topic closed")
+
+
+def test_unsubscribing_the_last_viewer_removes_the_topic_and_keeps_totals():
+    async def main():
+        pubsub = PubSub()
+        subscription = pubsub.subscribe("cam")
+        pubsub.publish("cam", 1)
+        await subscription.get()
+        pubsub.unsubscribe(subscription)
+        pubsub.unsubscribe(subscription)
+        return pubsub
+
+    pubsub = run(main())
+    assert pubsub.subscribers() == 0 and pubsub.stats()["topics"] == 0
+    assert pubsub.delivered == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        PubSub().subscribe("cam", policy="newest")
+
+
+@pytest.mark.parametrize("evict", ["ttl", "cap"])
+def test_viewers_of_an_evicted_session_see_the_stream_end(monkeypatch, evict):
+    async def main():
+        monkeypatch.setattr(app, "zones", ZoneEngine())
+        monkeypatch.setattr(app, "pubsub", PubSub())
+        sessions = SessionManager(lambda: None, ttl_seconds=60, max_sessions=1, on_remove=app.release_session)
+        sessions.get_or_create("cam")
+        subscription = app.pubsub.subscribe("cam")
+        waiter = asyncio.ensure_future(subscription.get())
+        await asyncio.sleep(0)
+
+        if evict == "ttl":
+            sessions.get("cam").last_seen -= 120
+            assert sessions.evict_idle() == 1
+        else:
+            sessions.get_or_create("other")
+        return await asyncio.wait_for(waiter, 1.0), subscription.close_reason
+
+    assert run(main()) == (None, "topic closed")
@@ -0,0 +1,78 @@
+import asyncio
+
+from rate_control import AdaptiveStride, LatestFrameSlot
+
+
+def admitted(control: AdaptiveStride, frames: int) -> int:
+    return sum(control.admit() for _ in range(frames))
+
+
+def test_stride_is_dense_with_tracks_and_sparse_without():
+    control = AdaptiveStride(latency_budget_ms=None, active_stride=1, idle_stride=3)
+    assert admitted(control, 6) == 6
+
+    control.record_result(0.01, active_tracks=0)
+    assert control.stride == 3
+    assert admitted(control, 9) == 3
+    assert control.frames_skipped == 6
+
+    control.record_result(0.01, active_tracks=2)
+    assert control.stride == 1
+
+
+def test_latency_pressure_backs_off_up_to_max_stride_then_relaxes():
+    control = AdaptiveStride(latency_budget_ms=100, active_stride=1, idle_stride=3, max_stride=4, smoothing=1.0)
+    strides = []
+    for _ in range(5):
+        control.record_result(0.2, active_tracks=1)
+        strides.append(control.stride)
+    assert strides == [2, 3, 4, 4, 4]
+
+    control.record_result(0.08, active_tracks=1)  # Under budget but above half: hold
+    assert control.stride == 4
+    strides = []
+    for _ in range(4):
+        control.record_result(0.02, active_tracks=1)
+        strides.append(control.stride)
+    assert strides == [3, 2, 1, 1]
+
+
+def test_pressure_is_capped_against_the_idle_base():
+    control = AdaptiveStride(latency_budget_ms=100, active_stride=1, idle_stride=3, max_stride=4, smoothing=1.0)
+    for _ in range(5):
+        control.record_result(0.2, active_tracks=0)
+    assert control.stride == 4
+    control.record_result(0.02, active_tracks=0)
+    assert control.stride == 3
+
+
+def test_latency_is_smoothed():
+    control = AdaptiveStride(smoothing=0.5)
+    control.record_result(0.1, active_tracks=1)
+    control.record_result(0.3, active_tracks=1)
+    assert abs(control.latency - 0.2) < 1e-9
+
+
+def test_slot_keeps_the_newest_frame_and_counts_replaced_ones():
+    async def main():
+        slot = LatestFrameSlot()
+        for frame in range(3):
+            slot.put(frame)
+        newest = await slot.get()
+        slot.put(3)
+        slot.close()
+        return newest, await slot.get(), await slot.get(), slot.dropped
+
+    assert asyncio.run(main()) == (2, 3, None, 2)
+
+
+def test_get_waits_for_a_frame():
+    async def main():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        slot.put("frame")
+        return await asyncio.wait_for(waiter, 1.0)
+
+    assert asyncio.run(main()) == "frame"
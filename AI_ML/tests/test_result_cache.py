@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import result_cache
+from result_cache import ENTRY_OVERHEAD_BYTES, DetectionCache
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+REGIONS = [(0, 0, 64, 48)]
+
+
+def detections(value: float, rows: int = 1) -> np.ndarray:
+    return np.full((rows, 6), value, dtype=np.float32)
+
+
+def store(cache: DetectionCache, data: bytes, value: float, frame: np.ndarray = FRAME, rows: int = 1):
+    lookup = cache.get(frame, REGIONS, data)
+    assert lookup.detections is None
+    cache.put(lookup, detections(value, rows))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_exact_hits_return_a_read_only_copy():
+    cache = DetectionCache()
+    source = detections(1.0)
+    lookup = cache.get(FRAME, REGIONS, b"frame")
+    cache.put(lookup, source)
+    source[:] = 9.0
+
+    hit = cache.get(FRAME, REGIONS, b"frame").detections
+    np.testing.assert_array_equal(hit, detections(1.0))
+    assert not hit.flags.writeable
+    assert (cache.exact_hits, cache.misses) == (1, 1)
+
+
+def test_frame_size_and_regions_are_part_of_the_key():
+    cache = DetectionCache()
+    store(cache, b"frame", 1.0)
+    assert cache.get(FRAME, [(0, 0, 32, 48)], b"frame").detections is None
+    assert cache.get(np.zeros((48, 32, 3), dtype=np.uint8), REGIONS, b"frame").detections is None
+
+
+def test_least_recently_used_entry_is_evicted_at_the_entry_cap():
+    cache = DetectionCache(max_entries=2)
+    store(cache, b"a", 1.0)
+    store(cache, b"b", 2.0)
+    assert cache.get(FRAME, REGIONS, b"a").detections is not None  # a is now the most recent
+    store(cache, b"c", 3.0)
+
+    assert cache.get(FRAME, REGIONS, b"b").detections is None
+    assert cache.get(FRAME, REGIONS, b"a").detections is not None
+    assert cache.get(FRAME, REGIONS, b"c").detections is not None
+    assert cache.evicted == 1
+
+
+def test_byte_cap_bounds_the_cache():
+    entry_bytes = detections(0.0, rows=100).nbytes + ENTRY_OVERHEAD_BYTES
+    cache = DetectionCache(max_bytes=2 * entry_bytes)
+    for index in range(4):
+        store(cache, bytes([index]), float(index), rows=100)
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * entry_bytes
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = DetectionCache(ttl_seconds=30)
+    store(cache, b"a", 1.0)
+    store(cache, b"b", 2.0)
+
+    clock[0] += 20
+    assert cache.get(FRAME, REGIONS, b"a").detections is not None  # Hits don't extend the TTL
+    clock[0] += 11
+    assert cache.get(FRAME, REGIONS, b"a").detections is None
+    assert cache.expire() == 1  # b, never looked up again
+    assert len(cache) == 0
+    assert cache.expired == 2
+
+
+def test_near_duplicates_hit_by_perceptual_hash():
+    rng = np.random.default_rng(0)
+    frame = np.repeat(np.repeat(rng.integers(0, 255, (12, 16, 3), dtype=np.uint8), 4, axis=0), 4, axis=1)
+    noisy = np.clip(frame.astype(np.int16) + rng.integers(-2, 3, frame.shape), 0, 255).astype(np.uint8)
+    other = 255 - frame
+
+    cache = DetectionCache(near_distance=8)
+    store(cache, b"original", 1.0, frame=frame)
+    np.testing.assert_array_equal(cache.get(noisy, REGIONS, b"re-encoded").detections, detections(1.0))
+    assert cache.get(other, REGIONS, b"other").detections is None
+    assert cache.near_hits == 1
+
+
+def test_near_index_rows_are_reused_after_eviction():
+    cache = DetectionCache(max_entries=2, near_distance=0)
+    rng = np.random.default_rng(1)
+    for index in range(5):
+        frame = rng.integers(0, 255, FRAME.shape, dtype=np.uint8)
+        store(cache, bytes([index]), float(index), frame=frame)
+    assert len(cache) == 2
+    assert cache._used.sum() == 2
+    cache.clear()
+    assert len(cache) == 0 and not cache._used.any() and cache.nbytes == 0
@@ -0,0 +1,18 @@
+from sessions import SessionManager
+
+
+def test_on_remove_sees_removed_evicted_and_expired_sessions():
+    removed = []
+    manager = SessionManager(lambda: None, ttl_seconds=60, max_sessions=2, on_remove=removed.append)
+    for session_id in ("a", "b", "c"):
+        manager.get_or_create(session_id)
+    assert removed == ["a"]  # Least recently used, evicted at the cap
+
+    assert manager.remove("b")
+    assert not manager.remove("b")
+    assert removed == ["a", "b"]
+
+    manager.get("c").last_seen -= 120
+    assert manager.evict_idle() == 1
+    assert removed == ["a", "b", "c"]
+    assert len(manager) == 0
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from shm_ring import FrameRing
+from workers import ProcessBackend
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(slots=2, slot_bytes=1024)
+    yield ring
+    ring.close()
+
+
+def frame(value: int, shape=(16, 16, 3)) -> np.ndarray:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_frames_round_trip_through_read_only_views(ring):
+    ref = ring.write(frame(7))
+    view = ring.view(ref)
+    np.testing.assert_array_equal(view, frame(7))
+    assert not view.flags.writeable
+
+    crop = np.arange(64, dtype=np.uint8).reshape(8, 8)[2:6, 1:5]  # Non-contiguous
+    np.testing.assert_array_equal(ring.view(ring.write(crop)), crop)
+
+
+def test_slots_are_held_until_released(ring):
+    first, second = ring.write(frame(1)), ring.write(frame(2))
+    assert ring.in_use == 2
+    assert ring.write(frame(3)) is None
+    assert ring.full == 1
+
+    ring.release(first)
+    ring.release(first)  # A second release of the same frame is ignored
+    assert ring.in_use == 1
+    third = ring.write(frame(3))
+    assert third.slot == first.slot
+    np.testing.assert_array_equal(ring.view(second), frame(2))
+
+
+def test_recycled_slots_are_detected(ring):
+    old = ring.write(frame(1))
+    ring.release(old)
+    new = ring.write(frame(2))
+    ring.write(frame(3))
+    assert new.slot != old.slot or new.generation != old.generation
+    with pytest.raises(ValueError):
+        ring.view(old)
+    ring.release(old)  # Stale release must not free the new frame
+    assert ring.in_use == 2
+
+
+def test_oversized_frames_are_refused(ring):
+    assert ring.write(frame(1, shape=(32, 32, 3))) is None
+    assert ring.oversized == 1 and ring.in_use == 0
+
+
+def test_attaching_does_not_register_with_the_resource_tracker(ring, monkeypatch):
+    registered = []
+    monkeypatch.setattr(resource_tracker, "register", lambda name, rtype: registered.append(rtype))
+    attached = FrameRing.attach(*ring.spec())
+    ref = ring.write(frame(5))
+    np.testing.assert_array_equal(attached.view(ref), frame(5))
+    attached.close()
+    assert registered == []
+
+
+class BrokenPool:
+    def submit(self, *args):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+
+class IdlePool:
+    def __init__(self):
+        self.future = Future()
+
+    def submit(self, *args):
+        return self.future
+
+
+def backend_with(pool, ring) -> ProcessBackend:
+    # The bookkeeping under test, without spawning worker processes
+    backend = ProcessBackend.__new__(ProcessBackend)
+    backend.ring = ring
+    backend._pools = [pool]
+    backend._in_flight = [0]
+    backend._lock = threading.Lock()
+    return backend
+
+
+def test_failed_submit_releases_slots_and_in_flight_count(ring):
+    backend = backend_with(BrokenPool(), ring)
+    with pytest.raises(RuntimeError):
+        backend.submit([frame(1), frame(2)])
+    assert ring.in_use == 0
+    assert backend._in_flight == [0]
+
+
+def test_slots_are_released_when_the_batch_completes(ring):
+    pool = IdlePool()
+    backend = backend_with(pool, ring)
+    future = backend.submit([frame(1)])
+    assert ring.in_use == 1 and backend._in_flight == [1]
+
+    future.set_result(([], None))
+    assert ring.in_use == 0 and backend._in_flight == [0]
@@ -0,0 +1,41 @@
+import numpy as np
+
+from slicing import TilePlanner, merge_detections, tile_grid
+
+
+def test_tile_grid_covers_the_frame_with_full_size_tiles():
+    tiles = tile_grid(1000, 600, tile_size=400, overlap=0.25)
+    assert tiles[0] == (0, 0, 400, 400)
+    assert tiles[-1] == (600, 200, 1000, 600)
+    assert all(x2 - x1 == 400 and y2 - y1 == 400 for x1, y1, x2, y2 in tiles)
+    assert tile_grid(300, 200, tile_size=400) == [(0, 0, 300, 200)]
+
+
+def test_full_pass_runs_every_tile_and_the_whole_frame():
+    planner = TilePlanner(tile_size=400, overlap=0.25)
+    regions = planner.plan(1000, 600, motion=None)
+    assert len(regions) == len(planner.tiles(1000, 600)) + 1
+    assert regions[-1] == (0, 0, 1000, 600)
+
+
+def test_gated_frames_run_only_tiles_with_motion_or_tracks():
+    planner = TilePlanner(tile_size=400, overlap=0.25)
+    assert planner.plan(1000, 600, motion=[]) == []
+    assert planner.plan(1000, 600, motion=[(10, 10, 20, 20)]) == [(0, 0, 400, 400)]
+    assert (600, 200, 1000, 600) in planner.plan(1000, 600, motion=[], track_boxes=[(900, 500, 950, 550)])
+
+
+def test_single_tile_frames_are_skipped_when_static():
+    planner = TilePlanner(tile_size=640)
+    assert planner.plan(320, 240, motion=None) == [(0, 0, 320, 240)]
+    assert planner.plan(320, 240, motion=[]) == []
+    assert planner.plan(320, 240, motion=[(10, 10, 20, 20)]) == [(0, 0, 320, 240)]
+    assert planner.plan(320, 240, motion=[], track_boxes=[(100, 100, 120, 120)]) == [(0, 0, 320, 240)]
+    assert planner.stats()["tiles_skipped"] == 1
+
+
+def test_merge_shifts_tiles_into_the_frame_and_suppresses_duplicates():
+    box = np.array([[10, 10, 50, 50, 0.9, 1]], dtype=np.float32)
+    overlap = np.array([[0, 10, 40, 50, 0.8, 1]], dtype=np.float32)
+    merged = merge_detections([box, overlap], [(100, 0, 500, 400), (110, 0, 510, 400)])
+    np.testing.assert_allclose(merged, [[110, 10, 150, 50, 0.9, 1]])
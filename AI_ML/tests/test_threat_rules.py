@@ -0,0 +1,138 @@
+import json
+
+import numpy as np
+import pytest
+
+from threat_rules import LEVELS, CompiledRules, ThreatFeatures, ThreatRules
+from track_store import TrackStore
+
+TYPES = ["Drone", "Bird"]
+FRAME = (100, 100)
+LOW, HIGH, CRITICAL = (LEVELS.index(level) for level in ("Low", "High", "Critical"))
+
+CONFIG = {
+    "points": {"center": [0.5, 0.5]},
+    "types": {
+        "*": {"base": "Low", "rules": [{"level": "Critical", "when": {"in_zone": True, "dwell_gt": 10}}]},
+        "Drone": {
+            "base": "High",
+            "rules": [{"level": "Critical", "when": {"heading_to": {"point": "center", "within_deg": 30},
+                                                      "speed_gt": 40}}],
+        },
+        "Bird": {"rules": [{"level": "High", "when": {"time_to_impact_lt": {"point": "center", "seconds": 2}}}]},
+    },
+}
+
+
+def features(type_index, position, velocity, zone_priority=None, zone_floor=None, dwell=None) -> ThreatFeatures:
+    count = len(type_index)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    return ThreatFeatures(
+        type_index=np.asarray(type_index),
+        position=np.asarray(position, dtype=np.float64),
+        velocity=velocity,
+        kalman_velocity=velocity,
+        confidence=np.full(count, 0.9),
+        zone_priority=np.asarray(zone_priority if zone_priority is not None else [-1] * count),
+        zone_floor=np.asarray(zone_floor if zone_floor is not None else [-1] * count),
+        dwell=np.asarray(dwell if dwell is not None else [0.0] * count, dtype=np.float64),
+    )
+
+
+def test_rules_raise_levels_when_all_conditions_hold():
+    rules = CompiledRules(CONFIG, TYPES)
+    levels = rules.evaluate(features(
+        type_index=[0, 0, 0, 1, 1, 1],
+        position=[[0, 50], [0, 50], [0, 50], [0, 50], [0, 50], [90, 90]],
+        velocity=[[60, 0], [10, 0], [0, 60], [30, 0], [5, 0], [0, 0]],
+        zone_priority=[-1, -1, -1, -1, -1, 1],
+        dwell=[0, 0, 0, 0, 0, 11],
+    ), FRAME)
+    # Fast drone heading to the centre, slow one, fast one heading elsewhere,
+    # bird reaching the centre within 2 s, slow bird, bird dwelling in a zone
+    np.testing.assert_array_equal(levels, [CRITICAL, HIGH, HIGH, HIGH, LOW, CRITICAL])
+
+
+def test_zone_floor_sets_a_minimum_level():
+    rules = CompiledRules(CONFIG, TYPES)
+    levels = rules.evaluate(features([1], [[0, 0]], [[0, 0]], zone_priority=[0], zone_floor=[HIGH]), FRAME)
+    np.testing.assert_array_equal(levels, [HIGH])
+
+
+@pytest.mark.parametrize("when", [
+    {"time_to_impact_lt": {"point": "center"}},
+    {"time_to_impact_lt": {"point": "center", "seconds": "soon"}},
+    {"time_to_impact_lt": {"point": "nowhere", "seconds": 2}},
+    {"heading_to": {"point": "center", "within": 30}},
+    {"heading_to": "center"},
+    {"speed_gt": "fast"},
+    {"speed_gt": None},
+    {"dwell_gt": True},
+    {"in_zone": "yes"},
+    {"unknown_condition": 1},
+    {},
+])
+def test_invalid_conditions_fail_to_compile(when):
+    config = {"points": {"center": [0.5, 0.5]}, "types": {"Drone": {"rules": [{"level": "High", "when": when}]}}}
+    with pytest.raises(ValueError):
+        CompiledRules(config, TYPES)
+
+
+def test_invalid_levels_types_and_points_fail_to_compile():
+    with pytest.raises(ValueError):
+        CompiledRules({"types": {"Drone": {"base": "Severe"}}}, TYPES)
+    with pytest.raises(ValueError):
+        CompiledRules({"types": {"Tank": {"base": "High"}}}, TYPES)
+    with pytest.raises(ValueError):
+        CompiledRules({"points": {"center": [0.5]}}, TYPES)
+
+
+def test_bad_reload_keeps_the_previous_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(CONFIG))
+    threat_rules = ThreatRules(str(path), TYPES)
+    good, version = threat_rules.rules, threat_rules.version
+
+    bad = json.loads(json.dumps(CONFIG))
+    bad["types"]["Bird"]["rules"][0]["when"]["time_to_impact_lt"].pop("seconds")
+    path.write_text(json.dumps(bad))
+    with pytest.raises(ValueError):
+        threat_rules.reload(force=True)
+    assert threat_rules.rules is good
+    assert threat_rules.version == version
+
+    # Frames keep being evaluated with the old rules
+    levels, rules = threat_rules.evaluate(features([0], [[0, 50]], [[60, 0]]), FRAME)
+    assert rules is good
+    np.testing.assert_array_equal(levels, [CRITICAL])
+
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        threat_rules.reload(force=True)
+    assert threat_rules.rules is good
+
+
+def test_reload_picks_up_a_valid_change(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(CONFIG))
+    threat_rules = ThreatRules(str(path), TYPES)
+    assert not threat_rules.reload()
+
+    path.write_text(json.dumps({"types": {"*": {"base": "Critical"}}}))
+    assert threat_rules.reload(force=True)
+    levels, _ = threat_rules.evaluate(features([1], [[0, 0]], [[0, 0]]), FRAME)
+    np.testing.assert_array_equal(levels, [CRITICAL])
+
+
+def test_hysteresis_delays_level_changes():
+    store = TrackStore()
+    slots = [store.touch(1, now=0.0).slot]
+
+    def step(level):
+        return int(store.smooth_threat(slots, np.array([level], dtype=np.int8), raise_frames=2, lower_frames=3)[0])
+
+    assert step(LOW) == LOW  # The first level is taken as is
+    assert step(HIGH) == LOW
+    assert step(HIGH) == HIGH  # Raised after 2 frames
+    assert [step(LOW) for _ in range(3)] == [HIGH, HIGH, LOW]  # Lowered after 3
+    assert [step(HIGH), step(LOW), step(HIGH)] == [LOW, LOW, LOW]  # Flapping never switches
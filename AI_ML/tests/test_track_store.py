@@ -0,0 +1,69 @@
+import numpy as np
+
+from track_store import TrackStore
+
+
+def test_history_ring_keeps_the_newest_positions_in_order():
+    store = TrackStore(history_length=3)
+    slot = store.touch(1, now=0.0).slot
+    for step in range(5):
+        store.append([slot], np.array([[step, 10.0 * step]]), now=float(step))
+
+    np.testing.assert_array_equal(store.history(1), [[2, 20, 2], [3, 30, 3], [4, 40, 4]])
+    delta, elapsed = store.last_step([slot])
+    np.testing.assert_array_equal(delta, [[1, 10]])
+    np.testing.assert_array_equal(elapsed, [1])
+
+
+def test_last_step_is_zero_until_two_positions():
+    store = TrackStore()
+    slot = store.touch(1, now=0.0).slot
+    store.append([slot], np.array([[5.0, 5.0]]), now=0.0)
+
+    delta, elapsed = store.last_step([slot])
+    np.testing.assert_array_equal(delta, [[0, 0]])
+    np.testing.assert_array_equal(elapsed, [0])
+
+
+def test_reused_slot_starts_with_an_empty_history():
+    store = TrackStore()
+    slot = store.touch(1, now=0.0).slot
+    store.append([slot], np.array([[1.0, 1.0]]), now=0.0)
+    store.prune([], now=1.0)
+
+    assert store.touch(2, now=1.0).slot == slot
+    assert len(store.history(2)) == 0
+
+
+def test_prune_evicts_dead_and_aged_tracks():
+    store = TrackStore(max_age_seconds=10.0)
+    store.touch(1, now=0.0)
+    store.touch(2, now=0.0)
+    store.touch(3, now=8.0)
+
+    assert store.prune([1, 3], now=12.0) == 2  # 2 is dead, 1 is too old
+    assert 3 in store and 1 not in store and 2 not in store
+    assert (store.evicted_dead, store.evicted_aged) == (1, 1)
+
+
+def test_capacity_evicts_least_recently_seen_but_never_this_frame():
+    store = TrackStore(max_tracks=2)
+    store.touch(1, now=0.0)
+    store.touch(2, now=1.0)
+    store.touch(1, now=2.0)
+    store.touch(3, now=3.0)
+    assert 2 not in store and 1 in store and 3 in store
+    assert store.evicted_capacity == 1
+
+    store.touch(4, now=3.0)
+    store.touch(5, now=3.0)  # 3 and 4 were seen this frame, so the cap is exceeded
+    assert len(store) == 3
+
+
+def test_store_grows_beyond_its_initial_capacity():
+    store = TrackStore(initial_capacity=2)
+    slots = [store.touch(track_id, now=0.0).slot for track_id in range(5)]
+    store.append(slots, np.arange(10, dtype=np.float64).reshape(5, 2), now=0.0)
+
+    assert store.stats()["capacity"] >= 5
+    np.testing.assert_array_equal(store.history(4), [[8, 9, 0]])
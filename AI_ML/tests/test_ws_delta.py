@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ws_delta import FIELDS, DeltaEncoder, TrackTable, ViewerSettings
+
+TYPES = ["Drone", "Bird"]
+LEVELS = ["Low", "High", "Critical"]
+
+
+def table(rows, zones=None) -> TrackTable:
+    values = np.array(rows, dtype=np.float64).reshape(-1, len(FIELDS) - 1)
+    return TrackTable(values, zones if zones is not None else [None] * len(values))
+
+
+def track(track_id, x, y, confidence=0.9, threat=0):
+    return [track_id, 0, confidence, x, y, x + 20, y + 20, x + 5, y + 5, 3.0, 90.0, threat]
+
+
+def response(session_id="cam", frame_id=0):
+    return SimpleNamespace(session_id=session_id, frame_id=frame_id, timestamp=float(frame_id), objects=[])
+
+
+class Viewer:
+    """Client side of the protocol, as the HTML client applies it"""
+
+    def __init__(self):
+        self.tracks = {}
+
+    def apply(self, message):
+        if message["t"] == "key":
+            self.tracks = {row[0]: list(row) for row in message["tracks"]}
+            return
+        for row in message["create"]:
+            self.tracks[row[0]] = list(row)
+        for change in message["update"]:
+            row = self.tracks[change[0]]
+            for field, value in zip(change[1::2], change[2::2]):
+                row[field] = value
+        for track_id in message["delete"]:
+            del self.tracks[track_id]
+
+
+def test_deltas_rebuild_the_quantised_tracks():
+    encoder = DeltaEncoder(TYPES, LEVELS, quantum=2, keyframe_seconds=100)
+    viewer = Viewer()
+    rng = np.random.default_rng(0)
+    rows = {track_id: track(track_id, 100.0 * track_id, 50.0) for track_id in range(1, 6)}
+
+    for frame_id in range(30):
+        for row in rows.values():
+            row[3:9] = [value + rng.normal(0, 3) for value in row[3:9]]
+        if frame_id == 10:
+            del rows[2]
+        if frame_id == 20:
+            rows[9] = track(9, 10.0, 10.0)
+        frame = table(list(rows.values()), zones=["gate" if track_id == 3 else None for track_id in rows])
+        message = encoder.encode(response(frame_id=frame_id), tracks=frame, now=float(frame_id))
+        if message is not None:
+            viewer.apply(message)
+        assert viewer.tracks == {track_id: list(row) for track_id, row in encoder.quantise(frame).items()}
+
+    assert encoder.keyframes == 1
+
+
+def test_jitter_below_the_quantum_sends_nothing():
+    encoder = DeltaEncoder(TYPES, LEVELS, quantum=4, keyframe_seconds=100)
+    assert encoder.encode(response(), tracks=table([track(1, 100.0, 100.0)]), now=0.0)["t"] == "key"
+    assert encoder.encode(response(), tracks=table([track(1, 100.4, 100.9)]), now=1.0) is None
+    message = encoder.encode(response(), tracks=table([track(1, 108.0, 100.0)]), now=2.0)
+    assert message["t"] == "delta" and message["create"] == [] and message["delete"] == []
+    assert message["update"][0][0] == 1 and FIELDS.index("x1") in message["update"][0][1::2]
+    assert encoder.unchanged == 1
+
+
+def test_rate_limit_carries_skipped_changes_in_the_next_message():
+    encoder = DeltaEncoder(TYPES, LEVELS, keyframe_seconds=100, max_rate_hz=2)
+    viewer = Viewer()
+    viewer.apply(encoder.encode(response(), tracks=table([track(1, 0.0, 0.0)]), now=0.0))
+    assert encoder.encode(response(), tracks=table([track(1, 50.0, 0.0), track(2, 0.0, 0.0)]), now=0.1) is None
+    last = table([track(2, 0.0, 0.0)])
+    viewer.apply(encoder.encode(response(), tracks=last, now=0.6))
+    assert viewer.tracks == {track_id: list(row) for track_id, row in encoder.quantise(last).items()}
+    assert encoder.rate_limited == 1
+
+
+def test_keyframes_are_periodic_and_sent_on_request():
+    encoder = DeltaEncoder(TYPES, LEVELS, keyframe_seconds=5)
+    frame = table([track(1, 0.0, 0.0)])
+    kinds = [(encoder.encode(response(), tracks=frame, now=now) or {}).get("t") for now in (0.0, 1.0, 5.0)]
+    assert kinds == ["key", None, "key"]
+    encoder.configure(quantum=8)
+    assert encoder.encode(response(), tracks=frame, now=6.0)["quantum"] == 8
+
+
+def test_sessions_are_encoded_independently_and_closed():
+    encoder = DeltaEncoder(TYPES, LEVELS, keyframe_seconds=100)
+    frame = table([track(1, 0.0, 0.0)])
+    assert encoder.encode(response("a"), tracks=frame, now=0.0)["t"] == "key"
+    assert encoder.encode(response("b"), tracks=frame, now=0.0)["t"] == "key"
+    assert encoder.stats()["sessions"] == 2
+
+    encoder.close("a")
+    assert encoder.stats()["sessions"] == 1
+    assert encoder.encode(response("a"), tracks=frame, now=1.0)["t"] == "key"  # Starts over
+    encoder.close()
+    assert encoder.stats()["sessions"] == 0
+
+
+def test_viewer_settings_keep_options_a_subscribe_leaves_out():
+    viewer = ViewerSettings(lambda rate: DeltaEncoder(TYPES, LEVELS, max_rate_hz=rate), "delta", 4.0)
+    viewer.subscribe({"format": "msgpack"})
+    viewer.subscribe({"quantum": 8})
+    assert viewer.msgpack
+    assert (viewer.encoder.quantum, viewer.encoder.max_rate_hz) == (8, 4.0)
+
+    viewer.subscribe({"results": "full"})
+    assert viewer.encoder is None and viewer.msgpack
+    viewer.subscribe({"format": "json", "results": "delta"})
+    assert viewer.encoder is not None and not viewer.msgpack
+
+
+@pytest.mark.parametrize("options", [{"format": "xml"}, {"quantum": [2]}, "delta", {"results": "deltas"}])
+def test_viewer_settings_reject_bad_options(options):
+    viewer = ViewerSettings(lambda rate: DeltaEncoder(TYPES, LEVELS, max_rate_hz=rate), "delta")
+    with pytest.raises(ValueError):
+        viewer.subscribe(options)
+
+
+def test_viewer_settings_reject_unknown_result_modes():
+    with pytest.raises(ValueError):
+        ViewerSettings(lambda rate: DeltaEncoder(TYPES, LEVELS, max_rate_hz=rate), "Delta")
+    viewer = ViewerSettings(lambda rate: DeltaEncoder(TYPES, LEVELS, max_rate_hz=rate), "full")
+    with pytest.raises(ValueError):
+        viewer.subscribe({"results": "summary"})
+    assert viewer.encoder is None
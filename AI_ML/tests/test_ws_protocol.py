@@ -0,0 +1,100 @@
+import json
+import uuid
+
+import cv2
+import numpy as np
+import pytest
+
+import ws_protocol
+from app import DetectedObject, DetectionResponse, ObjectType, ThreatLevel
+from ws_protocol import (ENCODING_BGR, ENCODING_JPEG, ENCODING_NV12, FLAG_MSGPACK_RESPONSE, HEADER, MAGIC,
+                         PROTOCOL_VERSION, decode_frame, encode_response, pack_response, parse_frame_message)
+
+WIDTH, HEIGHT = 8, 6
+
+
+def message(payload: bytes, encoding: int = ENCODING_JPEG, flags: int = 0, session: bytes = bytes(16),
+            magic: bytes = MAGIC, version: int = PROTOCOL_VERSION) -> bytes:
+    return HEADER.pack(magic, version, encoding, flags, 0, 42, 1.5, WIDTH, HEIGHT, session) + payload
+
+
+def bgr_frame() -> np.ndarray:
+    return np.arange(HEIGHT * WIDTH * 3, dtype=np.uint8).reshape(HEIGHT, WIDTH, 3)
+
+
+def test_header_fields_and_payload_are_parsed():
+    session = uuid.uuid4()
+    header, payload = parse_frame_message(message(b"payload", ENCODING_BGR, FLAG_MSGPACK_RESPONSE, session.bytes))
+    assert header == (ENCODING_BGR, FLAG_MSGPACK_RESPONSE, 42, 1.5, WIDTH, HEIGHT, session.hex)
+    assert bytes(payload) == b"payload"
+    assert parse_frame_message(message(b""))[0].session_id is None  # All zero: the connection's session
+
+
+@pytest.mark.parametrize("data", [
+    b"AF\x01",
+    message(b"", magic=b"XX"),
+    message(b"", version=PROTOCOL_VERSION + 1),
+])
+def test_malformed_headers_are_rejected(data):
+    with pytest.raises(ValueError):
+        parse_frame_message(data)
+
+
+def test_jpeg_round_trip():
+    encoded = cv2.imencode(".png", bgr_frame())[1].tobytes()  # Lossless, through the same imdecode path
+    frame = decode_frame(*parse_frame_message(message(encoded, ENCODING_JPEG)))
+    np.testing.assert_array_equal(frame, bgr_frame())
+    assert decode_frame(*parse_frame_message(message(b"not an image", ENCODING_JPEG))) is None
+
+
+def test_bgr_payload_is_a_read_only_view():
+    frame = decode_frame(*parse_frame_message(message(bgr_frame().tobytes(), ENCODING_BGR)))
+    np.testing.assert_array_equal(frame, bgr_frame())
+    assert not frame.flags.writeable
+
+
+def test_nv12_converts_into_the_given_buffer():
+    yuv = np.random.default_rng(0).integers(0, 255, (HEIGHT * 3 // 2, WIDTH), dtype=np.uint8)
+    out = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    frame = decode_frame(*parse_frame_message(message(yuv.tobytes(), ENCODING_NV12)), out=out)
+    assert frame is out
+    np.testing.assert_array_equal(frame, cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_NV12))
+
+
+@pytest.mark.parametrize("encoding, size", [
+    (ENCODING_BGR, WIDTH * HEIGHT * 3 - 1),
+    (ENCODING_NV12, WIDTH * HEIGHT * 3),
+    (7, 4),
+])
+def test_wrong_sizes_and_unknown_encodings_are_rejected(encoding, size):
+    with pytest.raises(ValueError):
+        decode_frame(*parse_frame_message(message(bytes(size), encoding)))
+
+
+def response() -> DetectionResponse:
+    obj = DetectedObject(id=3, object_type=ObjectType.DRONE, confidence=0.87654, bbox=[1, 2, 3, 4],
+                         predicted_position=[5, 6], speed=7.5, direction=90.0,
+                         threat_level=ThreatLevel.HIGH, zone="gate")
+    return DetectionResponse(frame_id=9, timestamp=2.5, objects=[obj], session_id="cam")
+
+
+def test_packed_objects_keep_the_field_order_clients_index():
+    packed = pack_response(response(), seq=42)
+    assert packed == {
+        "seq": 42, "frame_id": 9, "timestamp": 2.5, "session_id": "cam",
+        "objects": [[3, "Drone", 0.877, 1, 2, 3, 4, 5, 6, 7.5, 90.0, "High", "gate"]],
+    }
+
+
+def test_responses_are_json_unless_msgpack_is_asked_for():
+    header, _ = parse_frame_message(message(b""))
+    binary, text = encode_response(response(), header)
+    assert not binary and json.loads(text)["seq"] == 42
+
+    header, _ = parse_frame_message(message(b"", flags=FLAG_MSGPACK_RESPONSE))
+    binary, data = encode_response(response(), header)
+    if ws_protocol.msgpack is None:
+        assert not binary
+    else:
+        assert binary and ws_protocol.msgpack.unpackb(data)["objects"][0][1] == "Drone"
@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+import pytest
+
+from zones import ALL_CAMERAS, CompiledZones, ZoneEngine, make_zone
+
+FRAME = (100, 200)  # height, width
+
+LEFT = make_zone("left", [(0, 0), (0.5, 0), (0.5, 1), (0, 1)], priority=1)
+TOP_RIGHT = make_zone("top_right", [(0.5, 0), (1, 0), (1, 0.5), (0.5, 0.5)], priority=2)
+EVERYWHERE = make_zone("everywhere", [(0, 0), (1, 0), (1, 1), (0, 1)], priority=0)
+
+
+def test_boxes_hit_the_zones_they_overlap():
+    compiled = CompiledZones([LEFT, TOP_RIGHT], grid_size=64)
+    boxes = np.array([
+        [10, 10, 30, 30],  # left only
+        [150, 10, 180, 30],  # top right only
+        [150, 70, 190, 90],  # neither
+        [90, 10, 110, 30],  # straddles both
+    ])
+
+    hits = compiled.evaluate(boxes, FRAME)
+    names = [zone.name for zone in compiled.zones]
+    assert names == ["top_right", "left"]  # Highest priority first
+    np.testing.assert_array_equal(hits.inside, [[False, True], [True, False], [False, False], [True, True]])
+    np.testing.assert_array_equal(hits.primary, [1, 0, -1, 0])
+
+
+def test_no_boxes_and_no_zones():
+    assert CompiledZones([LEFT]).evaluate(np.zeros((0, 4)), FRAME).inside.shape == (0, 1)
+    hits = CompiledZones([]).evaluate(np.array([[0, 0, 10, 10]]), FRAME)
+    np.testing.assert_array_equal(hits.primary, [-1])
+
+
+@pytest.mark.parametrize("grid_size", [255, 256, 512])
+def test_full_frame_zone_counts_do_not_overflow_on_large_grids(grid_size):
+    compiled = CompiledZones([EVERYWHERE], grid_size=grid_size)
+    hits = compiled.evaluate(np.array([[0, 0, FRAME[1], FRAME[0]], [50, 50, 60, 60]]), FRAME)
+    assert hits.inside.all()
+
+
+def test_make_zone_rejects_bad_polygons():
+    with pytest.raises(ValueError):
+        make_zone("line", [(0, 0), (1, 1)])
+    with pytest.raises(ValueError):
+        make_zone("outside", [(0, 0), (2, 0), (0, 1)])
+
+
+def test_camera_zones_combine_with_shared_zones():
+    engine = ZoneEngine(grid_size=32)
+    engine.set_zones(ALL_CAMERAS, [LEFT])
+    engine.upsert("cam", TOP_RIGHT)
+
+    assert [zone.name for zone in engine.compiled("cam").zones] == ["top_right", "left"]
+    assert [zone.name for zone in engine.compiled("other").zones] == ["left"]
+    assert engine.remove("cam", "top_right")
+    assert not engine.remove("cam", "top_right")
+    assert [zone.name for zone in engine.compiled("cam").zones] == ["left"]
+
+    engine.set_zones(ALL_CAMERAS, [])
+    assert engine.compiled("cam") is None
+
+
+def test_cameras_without_their_own_zones_share_one_snapshot():
+    engine = ZoneEngine(grid_size=32)
+    engine.set_zones(ALL_CAMERAS, [LEFT])
+    engine.set_zones("cam", [TOP_RIGHT])
+
+    shared = engine.compiled("stream-1")
+    assert engine.compiled("stream-2") is shared
+    assert engine.compiled(ALL_CAMERAS) is shared
+    assert engine.compiled("cam") is not shared
+    assert set(engine._compiled) == {ALL_CAMERAS, "cam"}
+
+
+def test_release_drops_a_camera_snapshot_but_keeps_its_zones():
+    engine = ZoneEngine(grid_size=32)
+    engine.set_zones(ALL_CAMERAS, [LEFT])
+    engine.set_zones("cam", [TOP_RIGHT])
+    engine.compiled("cam")
+    engine.compiled("stream")
+
+    engine.release("cam")
+    engine.release(ALL_CAMERAS)  # The shared snapshot outlives any one session
+    assert set(engine._compiled) == {ALL_CAMERAS}
+    assert [zone.name for zone in engine.compiled("cam").zones] == ["top_right", "left"]
+
+
+def test_make_zone_rejects_unknown_threat_levels():
+    with pytest.raises(ValueError):
+        make_zone("gate", [(0, 0), (1, 0), (0, 1)], threat_level="high")
+    assert make_zone("gate", [(0, 0), (1, 0), (0, 1)], threat_level="Critical").threat_level == "Critical"
+
+
+def test_zone_files_with_unknown_threat_levels_fail_to_load(tmp_path):
+    path = tmp_path / "zones.json"
+    path.write_text(json.dumps({"*": [{"name": "gate", "polygon": [[0, 0], [1, 0], [0, 1]], "threat_level": "Hihg"}]}))
+    engine = ZoneEngine()
+    with pytest.raises(ValueError):
+        engine.load(str(path))
+    assert engine.compiled("cam") is None
@@ -0,0 +1,299 @@
+"""
+Declarative, vectorized threat assessment
+
+A rule file (JSON) sets a base level per object type and a list of rules
+that raise it when all of their conditions hold:
+
+    {
+      "points": {"center": [0.5, 0.5]},
+      "hysteresis": {"raise_frames": 1, "lower_frames": 5},
+      "types": {
+        "Drone": {
+          "base": "High",
+          "rules": [
+            {"level": "Critical", "when": {"heading_to": {"point": "center", "within_deg": 30},
+                                           "speed_gt": 80}},
+            {"level": "Critical", "when": {"time_to_impact_lt": {"point": "center", "seconds": 3,
+                                                                  "radius": 0.05}}}
+          ]
+        },
+        "*": {"rules": [{"level": "Critical", "when": {"in_zone": true, "dwell_gt": 10}}]}
+      }
+    }
+
+Points and radii are normalized to the frame. Rules under "*" apply to
+every type. Conditions:
+
+    speed_gt, speed_lt      speed in pixels per second
+    heading_to              moving within within_deg of a protected point
+    time_to_impact_lt       Kalman velocity reaches radius of a point within seconds
+    in_zone                 inside (true) or outside (false) any restricted zone
+    zone_priority_gte       inside a zone of at least this priority
+    dwell_gt                seconds spent in the current zone
+    confidence_gt           detector confidence
+
+Each rule compiles to NumPy operations over all tracks of a frame, so the
+cost per frame is one pass per rule rather than one per object.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("airborne-threat-detection")
+
+LEVELS = ["Low", "High", "Critical"]
+
+
+class ThreatFeatures(NamedTuple):
+    """Per-track inputs to threat evaluation, one row per track"""
+    type_index: np.ndarray  # (n,) index into the engine's type names
+    position: np.ndarray  # (n, 2) pixels
+    velocity: np.ndarray  # (n, 2) pixels per second, from the last two positions
+    kalman_velocity: np.ndarray  # (n, 2) pixels per second, from the Kalman state
+    confidence: np.ndarray  # (n,)
+    zone_priority: np.ndarray  # (n,) priority of the zone the track is in, -1 for none
+    zone_floor: np.ndarray  # (n,) minimum level required by that zone, -1 for none
+    dwell: np.ndarray  # (n,) seconds in the current zone, 0 outside zones
+
+
+class _Context:
+    """Features of one frame plus lazily computed, shared derived arrays"""
+
+    def __init__(self, features: ThreatFeatures, frame_shape: Tuple[int, ...],
+                 points: Dict[str, Tuple[float, float]]):
+        self.features = features
+        height, width = frame_shape[:2]
+        self.frame_size = np.array([width, height], dtype=np.float64)
+        self.scale = float(min(width, height))
+        self.points = points
+        self.speed = np.hypot(features.velocity[:, 0], features.velocity[:, 1])
+        self._cache = {}
+
+    def point(self, name: str) -> np.ndarray:
+        return np.asarray(self.points[name], dtype=np.float64) * self.frame_size
+
+    def heading_cosine(self, name: str) -> np.ndarray:
+        # Cosine of the angle between the movement and the direction to the point
+        key = ("heading", name)
+        if key not in self._cache:
+            to_point = self.point(name) - self.features.position
+            distance = np.hypot(to_point[:, 0], to_point[:, 1])
+            norm = self.speed * distance
+            dot = (self.features.velocity * to_point).sum(axis=1)
+            self._cache[key] = np.divide(dot, norm, out=np.full(len(norm), -1.0), where=norm > 0)
+        return self._cache[key]
+
+    def time_to_impact(self, name: str, radius: float) -> np.ndarray:
+        # Smallest t >= 0 with |position + velocity * t - point| <= radius, inf if never
+        key = ("tti", name, radius)
+        if key not in self._cache:
+            offset = self.features.position - self.point(name)
+            velocity = self.features.kalman_velocity
+            radius_px = radius * self.scale
+            a = (velocity * velocity).sum(axis=1)
+            b = 2 * (offset * velocity).sum(axis=1)
+            c = (offset * offset).sum(axis=1) - radius_px ** 2
+            discriminant = b * b - 4 * a * c
+            reachable = (a > 0) & (discriminant >= 0)
+            root = np.sqrt(np.where(reachable, discriminant, 0.0))
+            t = np.divide(-b - root, 2 * a, out=np.full(len(a), np.inf), where=reachable)
+            t = np.where(t >= 0, t, np.inf)
+            self._cache[key] = np.where(c <= 0, 0.0, t)
+        return self._cache[key]
+
+
+Condition = Callable[[_Context], np.ndarray]
+
+
+def _number(name: str, value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{name}' must be a number, got {value!r}")
+    return float(value)
+
+
+def _options(key: str, value, required: Sequence[str], optional: Sequence[str] = ()) -> dict:
+    if not isinstance(value, dict):
+        raise ValueError(f"Condition '{key}' must be an object with {', '.join(required)}")
+    missing = [name for name in required if name not in value]
+    if missing:
+        raise ValueError(f"Condition '{key}' is missing {', '.join(missing)}")
+    unknown = [name for name in value if name not in required and name not in optional]
+    if unknown:
+        raise ValueError(f"Condition '{key}' has unknown option(s) {', '.join(unknown)}")
+    return value
+
+
+def _level(name) -> int:
+    if name not in LEVELS:
+        raise ValueError(f"Unknown threat level {name!r}, expected one of {', '.join(LEVELS)}")
+    return LEVELS.index(name)
+
+
+def _compile_condition(key: str, value, points: Dict[str, Tuple[float, float]]) -> Condition:
+    """
+    Check a condition's options and turn it into a vectorized test
+
+    Everything is validated here, so a bad rule file fails to load instead
+    of failing on every frame.
+
+    Raises:
+        ValueError: If the condition is unknown or its options are invalid
+    """
+    def check_point(name) -> str:
+        if not isinstance(name, str) or name not in points:
+            raise ValueError(f"Unknown protected point {name!r}")
+        return name
+
+    if key in ("speed_gt", "speed_lt", "zone_priority_gte", "dwell_gt", "confidence_gt"):
+        threshold = _number(key, value)
+        if key == "speed_gt":
+            return lambda ctx: ctx.speed > threshold
+        if key == "speed_lt":
+            return lambda ctx: ctx.speed < threshold
+        if key == "zone_priority_gte":
+            return lambda ctx: ctx.features.zone_priority >= threshold
+        if key == "dwell_gt":
+            return lambda ctx: ctx.features.dwell > threshold
+        return lambda ctx: ctx.features.confidence > threshold
+    if key == "heading_to":
+        options = _options(key, value, ("point",), ("within_deg",))
+        point = check_point(options["point"])
+        cosine = float(np.cos(np.radians(_number(f"{key}.within_deg", options.get("within_deg", 30)))))
+        return lambda ctx: ctx.heading_cosine(point) > cosine
+    if key == "time_to_impact_lt":
+        options = _options(key, value, ("point", "seconds"), ("radius",))
+        point = check_point(options["point"])
+        seconds = _number(f"{key}.seconds", options["seconds"])
+        radius = _number(f"{key}.radius", options.get("radius", 0.05))
+        return lambda ctx: ctx.time_to_impact(point, radius) < seconds
+    if key == "in_zone":
+        if not isinstance(value, bool):
+            raise ValueError(f"'in_zone' must be true or false, got {value!r}")
+        return lambda ctx: (ctx.features.zone_priority >= 0) == value
+    raise ValueError(f"Unknown threat rule condition '{key}'")
+
+
+class _CompiledRule(NamedTuple):
+    types: Optional[np.ndarray]  # Type indices the rule applies to, None for all
+    level: int
+    conditions: List[Condition]
+
+
+class CompiledRules:
+    """Immutable rule set compiled from a config dict"""
+
+    def __init__(self, config: dict, type_names: Sequence[str]):
+        self.config = config
+        self.points = {}
+        for name, point in config.get("points", {}).items():
+            if not isinstance(point, (list, tuple)) or len(point) != 2:
+                raise ValueError(f"Protected point '{name}' must be [x, y]")
+            self.points[name] = (_number(f"points.{name}", point[0]), _number(f"points.{name}", point[1]))
+        hysteresis = config.get("hysteresis", {})
+        self.raise_frames = int(_number("raise_frames", hysteresis.get("raise_frames", 1)))
+        self.lower_frames = int(_number("lower_frames", hysteresis.get("lower_frames", 1)))
+
+        type_index = {name: index for index, name in enumerate(type_names)}
+        self.base_levels = np.zeros(len(type_names), dtype=np.int8)
+        self.rules: List[_CompiledRule] = []
+        # "*" first, so its base is a default that per-type bases override
+        for type_name, type_config in sorted(config.get("types", {}).items(), key=lambda item: item[0] != "*"):
+            if type_name != "*" and type_name not in type_index:
+                raise ValueError(f"Unknown object type '{type_name}'")
+            if not isinstance(type_config, dict):
+                raise ValueError(f"Rules of type '{type_name}' must be an object")
+            types = None if type_name == "*" else np.array([type_index[type_name]])
+            if "base" in type_config:
+                if types is None:
+                    self.base_levels[:] = _level(type_config["base"])
+                else:
+                    self.base_levels[types] = _level(type_config["base"])
+            for rule in type_config.get("rules", []):
+                if not isinstance(rule, dict) or not isinstance(rule.get("when"), dict) or not rule["when"]:
+                    raise ValueError(f"Rules of type '{type_name}' need a level and a non-empty 'when' object")
+                conditions = [_compile_condition(key, value, self.points) for key, value in rule["when"].items()]
+                self.rules.append(_CompiledRule(types, _level(rule.get("level")), conditions))
+
+    def evaluate(self, features: ThreatFeatures, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Threat levels of all tracks before hysteresis
+
+        Returns:
+            (n,) array of indices into LEVELS
+        """
+        levels = self.base_levels[features.type_index]
+        if len(levels) == 0:
+            return levels
+        context = _Context(features, frame_shape, self.points)
+        for rule in self.rules:
+            mask = np.ones(len(levels), dtype=bool) if rule.types is None \
+                else np.isin(features.type_index, rule.types)
+            for condition in rule.conditions:
+                if not mask.any():
+                    break
+                mask &= condition(context)
+            levels = np.where(mask & (levels < rule.level), rule.level, levels).astype(np.int8)
+        return np.maximum(levels, features.zone_floor).astype(np.int8)
+
+
+class ThreatRules:
+    """
+    Hot-reloadable threat rule set
+
+    The file is re-read when its modification time changes; a file that
+    fails to parse or compile is logged and the previous rules stay active.
+    """
+
+    def __init__(self, path: str, type_names: Sequence[str]):
+        self.path = path
+        self.type_names = list(type_names)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.version = 0
+        self.rules = self._load()
+
+    def _load(self) -> CompiledRules:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            rules = CompiledRules(json.load(f), self.type_names)
+        with self._lock:
+            self._mtime = mtime
+            self.version += 1
+        logger.info(f"Loaded threat rules v{self.version} from {self.path} ({len(rules.rules)} rules)")
+        return rules
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Re-read the rule file if it changed
+
+        Returns:
+            True if new rules were loaded
+
+        Raises:
+            ValueError: If the file is invalid (the old rules stay active)
+        """
+        try:
+            if not force and os.path.getmtime(self.path) == self._mtime:
+                return False
+            self.rules = self._load()
+            return True
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid threat rules in {self.path}: {e}") from e
+
+    async def watch(self, interval_seconds: float = 2.0):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                self.reload()
+            except ValueError as e:
+                logger.error(str(e))
+
+    def evaluate(self, features: ThreatFeatures, frame_shape: Tuple[int, ...]) -> Tuple[np.ndarray, CompiledRules]:
+        # Grab the current rule set once so a reload mid-frame can't mix two versions
+        rules = self.rules
+        return rules.evaluate(features, frame_shape), rules
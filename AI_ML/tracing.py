@@ -0,0 +1,256 @@
+"""
+Opt-in per-frame tracing with Chrome trace / Perfetto export
+
+A sampled frame gets a FrameTrace that collects timed spans from every
+stage it passes through, whether the stage runs on the event loop, the CPU
+pool or an inference worker thread or process. Finished traces go to a
+bounded ring buffer and are exported on demand in the Chrome trace event
+format, which Perfetto (ui.perfetto.dev) and chrome://tracing open directly.
+
+Spans are timed with time.perf_counter, a system-wide monotonic clock, so
+spans recorded in worker processes line up with the parent's.
+"""
+import contextlib
+import contextvars
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Span(NamedTuple):
+    name: str
+    start: float  # perf_counter seconds
+    end: float
+    pid: int
+    tid: int
+    args: Optional[dict] = None
+
+
+class BatchTiming(NamedTuple):
+    """Where and when an inference batch ran, as reported by the worker that ran it"""
+    pid: int
+    tid: int
+    thread: str
+    start: float
+    end: float
+    stages: Dict[str, Tuple[float, float]]  # Detector stages, e.g. preprocess/inference/postprocess
+    counters: Dict[str, int] = {}  # Detector event counts, e.g. cascade escalations
+
+
+def batch_timing(start: float, stages: Optional[Dict[str, Tuple[float, float]]] = None,
+                 counters: Optional[Dict[str, int]] = None) -> BatchTiming:
+    """Describe a batch that started at start and ends now on the calling thread"""
+    thread = threading.current_thread()
+    return BatchTiming(os.getpid(), thread.ident, thread.name, start, time.perf_counter(),
+                       dict(stages or {}), dict(counters or {}))
+
+
+class FrameTrace:
+    """Span timeline of one frame"""
+
+    __slots__ = ("trace_id", "session_id", "endpoint", "frame_id", "start", "end", "pid", "tid", "spans", "threads")
+
+    def __init__(self, trace_id: int, session_id: Optional[str], endpoint: str, start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.session_id = session_id
+        self.endpoint = endpoint
+        self.frame_id: Optional[int] = None
+        self.start = start if start is not None else time.perf_counter()
+        self.end: Optional[float] = None
+        # The thread that began the trace (the event loop); its spans cross
+        # awaits, so they are drawn on the frame's own track
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.spans: List[Span] = []
+        self.threads: Dict[Tuple[int, int], str] = {(self.pid, self.tid): threading.current_thread().name}
+
+    def add(self, name: str, start: float, end: float, **args):
+        thread = threading.current_thread()
+        self.threads[(self.pid, thread.ident)] = thread.name
+        self.spans.append(Span(name, start, end, self.pid, thread.ident, args or None))
+
+    def add_batch(self, timing: BatchTiming, **args):
+        self.threads[(timing.pid, timing.tid)] = timing.thread
+        self.spans.append(Span("inference_batch", timing.start, timing.end, timing.pid, timing.tid, args or None))
+        for name, (start, end) in timing.stages.items():
+            self.spans.append(Span(name, start, end, timing.pid, timing.tid))
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def summary(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "endpoint": self.endpoint,
+            "frame_id": self.frame_id,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": len(self.spans),
+        }
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("frame_trace", default=None)
+
+
+def current() -> Optional[FrameTrace]:
+    return _current.get()
+
+
+def activate(trace: Optional[FrameTrace]):
+    """Make trace the current frame's trace for the rest of this task (None clears it)"""
+    _current.set(trace)
+
+
+@contextlib.contextmanager
+def active(trace: Optional[FrameTrace]) -> Iterator[Optional[FrameTrace]]:
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+class Stage:
+    """A named pipeline stage that feeds its histogram and, on traced frames, a span"""
+
+    __slots__ = ("name", "histogram")
+
+    def __init__(self, name: str, histogram):
+        self.name = name
+        self.histogram = histogram
+
+    def record(self, start: float, end: float):
+        self.histogram.observe(end - start)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(self.name, start, end)
+
+
+class Tracer:
+    """
+    Samples frames for tracing and keeps the most recent finished traces
+
+    sample_rate is the fraction of frames traced (0 disables tracing at the
+    cost of one comparison per frame). Traced frames faster than
+    min_duration_ms are discarded, so a rate of 1 with a threshold keeps
+    only the slow outliers.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 1000, min_duration_ms: float = 0.0):
+        self.sample_rate = sample_rate
+        self.min_duration = min_duration_ms / 1000.0
+        self._traces: "deque[FrameTrace]" = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.frames_traced = 0
+        self.traces_kept = 0
+
+    def configure(self, sample_rate: Optional[float] = None, min_duration_ms: Optional[float] = None,
+                  capacity: Optional[int] = None):
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if min_duration_ms is not None:
+            self.min_duration = min_duration_ms / 1000.0
+        if capacity is not None and capacity != self._traces.maxlen:
+            with self._lock:
+                self._traces = deque(self._traces, maxlen=capacity)
+
+    def begin(self, session_id: Optional[str], endpoint: str, start: Optional[float] = None) -> Optional[FrameTrace]:
+        """
+        Decide whether to trace a frame
+
+        Args:
+            session_id: Stream session of the frame
+            endpoint: Entry point, used as the trace category
+            start: perf_counter time the frame arrived, now if omitted
+
+        Returns:
+            A new trace (not yet current, see activate), or None if the frame isn't sampled
+        """
+        rate = self.sample_rate
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return None
+        self.frames_traced += 1
+        return FrameTrace(next(self._ids), session_id, endpoint, start)
+
+    def end(self, trace: Optional[FrameTrace], frame_id: Optional[int] = None):
+        if trace is None:
+            return
+        trace.end = time.perf_counter()
+        trace.frame_id = frame_id
+        if trace.duration >= self.min_duration:
+            with self._lock:
+                self._traces.append(trace)
+                self.traces_kept += 1
+
+    def traces(self, session_id: Optional[str] = None, min_duration_ms: float = 0.0,
+               limit: Optional[int] = None) -> List[FrameTrace]:
+        """
+        Finished traces, oldest first
+
+        Args:
+            session_id: Only traces of this session
+            min_duration_ms: Only frames at least this slow
+            limit: Only the newest limit traces
+        """
+        with self._lock:
+            traces = list(self._traces)
+        traces = [trace for trace in traces
+                  if (session_id is None or trace.session_id == session_id)
+                  and trace.duration * 1000 >= min_duration_ms]
+        return traces[-limit:] if limit else traces
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "min_duration_ms": self.min_duration * 1000,
+            "capacity": self._traces.maxlen,
+            "buffered": len(self._traces),
+            "frames_traced": self.frames_traced,
+            "traces_kept": self.traces_kept,
+        }
+
+
+def to_chrome_trace(traces: List[FrameTrace]) -> dict:
+    """
+    Convert traces to the Chrome trace event format
+
+    Each frame gets its own async track holding the spans timed on the event
+    loop; spans from the CPU pool and the inference workers are drawn on
+    their thread's track. Every event carries the frame's trace, session and
+    frame ids.
+    """
+    events = []
+    threads: Dict[Tuple[int, int], str] = {}
+    main_pids = set()
+
+    def us(seconds: float) -> float:
+        return round(seconds * 1e6, 3)
+
+    for trace in traces:
+        ids = {"trace_id": trace.trace_id, "session_id": trace.session_id, "frame_id": trace.frame_id}
+        threads.update(trace.threads)
+        main_pids.add(trace.pid)
+        track = {"cat": trace.endpoint, "id": trace.trace_id, "pid": trace.pid, "tid": trace.tid}
+        events.append({**track, "name": f"frame {trace.frame_id}", "ph": "b", "ts": us(trace.start), "args": ids})
+        for span in sorted(trace.spans, key=lambda span: span.start):
+            args = {**ids, **(span.args or {})}
+            if span.pid == trace.pid and span.tid == trace.tid:
+                events.append({**track, "name": span.name, "ph": "b", "ts": us(span.start), "args": args})
+                events.append({**track, "name": span.name, "ph": "e", "ts": us(span.end)})
+            else:
+                events.append({"name": span.name, "cat": trace.endpoint, "ph": "X", "ts": us(span.start),
+                               "dur": us(span.end - span.start), "pid": span.pid, "tid": span.tid, "args": args})
+        events.append({**track, "name": f"frame {trace.frame_id}", "ph": "e", "ts": us(trace.end)})
+
+    for pid in {pid for pid, _ in threads}:
+        name = "api" if pid in main_pids else f"inference worker {pid}"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": name}})
+    for (pid, tid), name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
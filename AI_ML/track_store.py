@@ -0,0 +1,251 @@
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from kalman_bank import KalmanBank
+
+
+class TrackRecord:
+    """Bookkeeping for one live track; its numeric state lives in the store's arrays"""
+
+    __slots__ = ("track_id", "slot", "first_seen", "last_seen", "hits", "zone", "zone_since")
+
+    def __init__(self, track_id: int, slot: int, now: float):
+        self.track_id = track_id
+        self.slot = slot
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 0
+        self.zone: Optional[str] = None  # Highest-priority restricted zone the track is in
+        self.zone_since = 0.0
+
+
+class TrackStore:
+    """
+    Bounded per-session store of track state
+
+    Each track gets one slot, shared by its Kalman filter (see
+    kalman_bank.py) and a fixed-length ring buffer of timestamped
+    positions, so a track costs the same memory however long it lives.
+
+    Tracks are evicted when the tracker drops them, when they haven't been
+    seen for max_age_seconds, and least recently seen first once
+    max_tracks is reached, so a long-running stream holds steady memory.
+    """
+
+    def __init__(self, history_length: int = 30, max_tracks: int = 1024,
+                 max_age_seconds: float = 60.0, initial_capacity: int = 64):
+        self.history_length = history_length
+        self.max_tracks = max_tracks
+        self.max_age_seconds = max_age_seconds
+
+        self.kalman = KalmanBank(capacity=initial_capacity)
+        self._records: "OrderedDict[int, TrackRecord]" = OrderedDict()  # Least recently seen first
+        self._positions = np.zeros((0, history_length, 2))
+        self._times = np.zeros((0, history_length))
+        self._head = np.zeros(0, dtype=np.int64)  # Next write index per slot
+        self._count = np.zeros(0, dtype=np.int64)
+        # Threat level hysteresis: current level and a pending change with its streak
+        self._threat = np.zeros(0, dtype=np.int8)
+        self._pending = np.zeros(0, dtype=np.int8)
+        self._pending_count = np.zeros(0, dtype=np.int32)
+        self._grow(self.kalman.capacity)
+
+        self.created = 0
+        self.evicted_dead = 0
+        self.evicted_aged = 0
+        self.evicted_capacity = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self._records
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self._head)
+        self._positions = np.concatenate([self._positions, np.zeros((extra, self.history_length, 2))])
+        self._times = np.concatenate([self._times, np.zeros((extra, self.history_length))])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype=np.int64)])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        self._threat = np.concatenate([self._threat, np.zeros(extra, dtype=np.int8)])
+        self._pending = np.concatenate([self._pending, np.zeros(extra, dtype=np.int8)])
+        self._pending_count = np.concatenate([self._pending_count, np.zeros(extra, dtype=np.int32)])
+
+    def get(self, track_id: int) -> Optional[TrackRecord]:
+        return self._records.get(track_id)
+
+    def touch(self, track_id: int, now: float) -> TrackRecord:
+        """
+        Return the record for a track seen this frame, creating it if needed
+
+        Args:
+            track_id: Tracker id
+            now: Frame timestamp
+
+        Returns:
+            The track's record, marked as most recently seen
+        """
+        record = self._records.get(track_id)
+        if record is None:
+            while len(self._records) >= self.max_tracks:
+                oldest_id, oldest = next(iter(self._records.items()))
+                if oldest.last_seen >= now:
+                    break  # Never evict a track seen this frame; the cap is exceeded instead
+                self._evict(oldest_id)
+                self.evicted_capacity += 1
+
+            slot = self.kalman.allocate()
+            if slot >= len(self._head):
+                self._grow(self.kalman.capacity)
+            self._head[slot] = 0
+            self._count[slot] = 0
+            self._threat[slot] = -1  # No level yet, the first one is taken as is
+            self._pending_count[slot] = 0
+
+            record = TrackRecord(track_id, slot, now)
+            self._records[track_id] = record
+            self.created += 1
+        else:
+            self._records.move_to_end(track_id)
+
+        record.last_seen = now
+        record.hits += 1
+        return record
+
+    def _evict(self, track_id: int):
+        record = self._records.pop(track_id)
+        self.kalman.release(record.slot)
+
+    def prune(self, live_ids: Iterable[int], now: float) -> int:
+        """
+        Evict tracks the tracker no longer holds and tracks past max age
+
+        Args:
+            live_ids: Ids of every track the tracker still holds
+            now: Current timestamp
+
+        Returns:
+            Number of tracks evicted
+        """
+        live_ids = set(live_ids)
+        cutoff = now - self.max_age_seconds
+        dead = [track_id for track_id in self._records if track_id not in live_ids]
+        for track_id in dead:
+            self._evict(track_id)
+
+        # Records are ordered by last_seen, so aged tracks are at the front
+        aged = 0
+        while self._records:
+            track_id, record = next(iter(self._records.items()))
+            if record.last_seen >= cutoff:
+                break
+            self._evict(track_id)
+            aged += 1
+
+        self.evicted_dead += len(dead)
+        self.evicted_aged += aged
+        return len(dead) + aged
+
+    def append(self, slots: Sequence[int], positions: np.ndarray, now: float):
+        """
+        Record this frame's positions of several tracks at once
+
+        Args:
+            slots: Track slots
+            positions: (len(slots), 2) array of [x, y] positions
+            now: Frame timestamp
+        """
+        if len(slots) == 0:
+            return
+        slots = np.asarray(slots, dtype=np.int64)
+        heads = self._head[slots]
+        self._positions[slots, heads] = positions
+        self._times[slots, heads] = now
+        self._head[slots] = (heads + 1) % self.history_length
+        self._count[slots] = np.minimum(self._count[slots] + 1, self.history_length)
+
+    def last_step(self, slots: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Displacement and elapsed time between each track's last two positions
+
+        Args:
+            slots: Track slots
+
+        Returns:
+            (n, 2) displacements and (n,) elapsed seconds; both zero for
+            tracks with fewer than two positions
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        last = (self._head[slots] - 1) % self.history_length
+        previous = (self._head[slots] - 2) % self.history_length
+        has_step = self._count[slots] >= 2
+
+        delta = self._positions[slots, last] - self._positions[slots, previous]
+        elapsed = self._times[slots, last] - self._times[slots, previous]
+        delta[~has_step] = 0.0
+        elapsed[~has_step] = 0.0
+        return delta, elapsed
+
+    def smooth_threat(self, slots: Sequence[int], levels: np.ndarray,
+                      raise_frames: int = 1, lower_frames: int = 1) -> np.ndarray:
+        """
+        Apply hysteresis to this frame's threat levels
+
+        A track's level only changes once the new level has been assessed
+        for raise_frames (going up) or lower_frames (going down) consecutive
+        frames, so borderline tracks don't flap between levels.
+
+        Args:
+            slots: Track slots
+            levels: (len(slots),) raw levels from the rule engine
+            raise_frames: Frames needed to raise the level
+            lower_frames: Frames needed to lower the level
+
+        Returns:
+            (len(slots),) levels to report
+        """
+        if len(slots) == 0:
+            return levels
+        slots = np.asarray(slots, dtype=np.int64)
+        current = self._threat[slots]
+        differs = levels != current
+        streak = np.where(differs & (self._pending[slots] == levels), self._pending_count[slots] + 1, 1)
+        needed = np.where(levels > current, raise_frames, lower_frames)
+        switch = (current < 0) | (differs & (streak >= needed))
+
+        current = np.where(switch, levels, current).astype(np.int8)
+        self._threat[slots] = current
+        self._pending[slots] = levels
+        self._pending_count[slots] = np.where(differs & ~switch, streak, 0)
+        return current
+
+    def history(self, track_id: int) -> np.ndarray:
+        """
+        Position history of a track, oldest first
+
+        Returns:
+            (n, 3) array of [x, y, timestamp] rows
+        """
+        slot = self._records[track_id].slot
+        count = int(self._count[slot])
+        order = (self._head[slot] - count + np.arange(count)) % self.history_length
+        return np.column_stack([self._positions[slot, order], self._times[slot, order]])
+
+    def nbytes(self) -> int:
+        return (self._positions.nbytes + self._times.nbytes + self._head.nbytes + self._count.nbytes
+                + self._threat.nbytes + self._pending.nbytes + self._pending_count.nbytes
+                + self.kalman.nbytes())
+
+    def stats(self) -> dict:
+        return {
+            "live_tracks": len(self._records),
+            "capacity": len(self._head),
+            "max_tracks": self.max_tracks,
+            "bytes": self.nbytes(),
+            "created": self.created,
+            "evicted_dead": self.evicted_dead,
+            "evicted_aged": self.evicted_aged,
+            "evicted_capacity": self.evicted_capacity,
+        }
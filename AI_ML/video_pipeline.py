@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import tracing
+from rate_control import AdaptiveStride
+
+logger = logging.getLogger("airborne-threat-detection")
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+_END = object()
+
+
+async def save_upload(upload, suffix: str = ".mp4") -> str:
+    """
+    Copy an upload to a temporary file in fixed-size chunks
+
+    Args:
+        upload: FastAPI UploadFile
+        suffix: File suffix for the temporary file
+
+    Returns:
+        Path of the temporary file (the caller removes it)
+    """
+    fd, path = tempfile.mkstemp(prefix="temp_video_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                buffer.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _read_strided(cap: cv2.VideoCapture, skip: int,
+                  out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray]]:
+    # grab() demuxes without converting, so skipped frames cost almost nothing
+    advanced = 0
+    for _ in range(skip):
+        if not cap.grab():
+            return advanced, None
+        advanced += 1
+    ret, frame = cap.read(out) if out is not None else cap.read()
+    return advanced + (1 if ret else 0), frame if ret else None
+
+
+class VideoSummary:
+    """
+    Incrementally updated per-video counters
+
+    Only the unique object ids are kept, so memory doesn't grow with the
+    length of the clip.
+    """
+
+    def __init__(self, threat_labels: Dict, type_labels: Dict):
+        self.threat_labels = threat_labels
+        self.type_labels = type_labels
+        self.frames_processed = 0
+        self.unique_objects = set()
+        self.threat_counts = {label: 0 for label in threat_labels.values()}
+        self.type_counts = {label: 0 for label in type_labels.values()}
+
+    def update(self, response):
+        self.frames_processed += 1
+        for obj in response.objects:
+            self.unique_objects.add(obj.id)
+            self.threat_counts[self.threat_labels[obj.threat_level]] += 1
+            self.type_counts[self.type_labels[obj.object_type]] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "total_frames_processed": self.frames_processed,
+            "unique_objects_detected": len(self.unique_objects),
+            "threat_level_summary": dict(self.threat_counts),
+            "object_type_summary": dict(self.type_counts),
+        }
+
+
+class VideoPipeline:
+    """
+    Streaming video analysis pipeline with bounded queues between stages
+
+    decode/stride -> resize/plan -> inference (shared scheduler) -> tracking
+
+    The stride adapts to scene activity: dense while objects are tracked,
+    sparse while the frame is empty (see rate_control.AdaptiveStride).
+
+    Each stage holds at most queue_size frames, so memory stays flat however
+    long the clip is. Frames are decoded and resized into buffers from the
+    session's FramePool and handed back once tracked, so a steady clip
+    allocates no new frames. Tracking consumes inference results in frame
+    order and updates the summary incrementally; progress events are yielded
+    as they happen.
+    """
+
+    def __init__(self, path: str, session, summary: VideoSummary,
+                 plan: Callable[..., object],
+                 submit: Callable[..., Awaitable[np.ndarray]],
+                 track: Callable[..., Awaitable[object]],
+                 run_cpu: Callable[..., Awaitable[object]],
+                 rate_control: Optional[AdaptiveStride] = None,
+                 frame_size: Optional[Tuple[int, int]] = (640, 640),
+                 queue_size: int = 8, progress_every: int = 25,
+                 on_stage: Optional[Callable[[str, float, float], None]] = None,
+                 tracer: Optional[tracing.Tracer] = None):
+        self.path = path
+        self.session = session
+        self.summary = summary
+        self.plan = plan
+        self.submit = submit
+        self.track = track
+        self.run_cpu = run_cpu
+        # Offline clips have no latency budget, so only scene activity sets the stride
+        self.rate_control = rate_control or AdaptiveStride(latency_budget_ms=None)
+        self.frame_size = frame_size
+        self.queue_size = queue_size
+        self.progress_every = progress_every
+        # Called with (stage, start, end) for the decode and prepare stages of every frame
+        self.on_stage = on_stage
+        # Sampled frames carry their trace from stage to stage
+        self.tracer = tracer
+
+        self.buffers = session.buffers
+        self.frames_read = 0
+        self.total_frames = 0
+        self.decoded_shape: Optional[Tuple[int, int, int]] = None
+
+    def _prepare(self, frame: np.ndarray):
+        if self.frame_size is not None:
+            width, height = self.frame_size
+            resized = cv2.resize(frame, self.frame_size, dst=self.buffers.acquire((height, width, 3)),
+                                 interpolation=cv2.INTER_AREA)
+            self.buffers.release(frame)
+            frame = resized
+        # Planning runs here, in frame order, because the motion gate is stateful
+        return frame, self.plan(self.session, frame)
+
+    async def _decode_stage(self, cap: cv2.VideoCapture, out: asyncio.Queue):
+        while True:
+            skip = self.rate_control.stride - 1
+            trace = self.tracer.begin(self.session.session_id, "analyze_video") if self.tracer else None
+            tracing.activate(trace)
+            started = time.perf_counter()
+            buffer = self.buffers.acquire(self.decoded_shape) if self.decoded_shape else None
+            advanced, frame = await self.run_cpu(_read_strided, cap, skip, buffer)
+            if self.on_stage is not None:
+                self.on_stage("video_decode", started, time.perf_counter())
+            self.frames_read += advanced
+            self.rate_control.record_strided(advanced)
+            if frame is None:
+                break
+            await out.put((self.frames_read, frame, trace))
+        await out.put(_END)
+
+    async def _resize_stage(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while (item := await inp.get()) is not _END:
+            index, frame, trace = item
+            tracing.activate(trace)
+            started = time.perf_counter()
+            frame, regions = await self.run_cpu(self._prepare, frame)
+            if self.on_stage is not None:
+                self.on_stage("prepare", started, time.perf_counter())
+            await out.put((index, frame, regions, trace))
+        await out.put(_END)
+
+    async def _inference_stage(self, inp: asyncio.Queue, out: asyncio.Queue):
+        # Frames are submitted without waiting for their results so several
+        # can share an inference batch; the bounded output queue caps how
+        # many are in flight
+        while (item := await inp.get()) is not _END:
+            index, frame, regions, trace = item
+            tracing.activate(trace)  # Copied into the submit task
+            await out.put((index, frame, asyncio.ensure_future(self.submit(frame, regions)), trace))
+        await out.put(_END)
+
+    async def _tracking_stage(self, inp: asyncio.Queue, events: asyncio.Queue):
+        while (item := await inp.get()) is not _END:
+            index, frame, future, trace = item
+            tracing.activate(trace)
+            response = await self.track(self.session, await future, frame)
+            self.buffers.release(frame)
+            if self.tracer is not None:
+                self.tracer.end(trace, response.frame_id)
+            self.rate_control.record_result(None, len(response.objects))
+            self.summary.update(response)
+            if self.summary.frames_processed % self.progress_every == 0:
+                await events.put(self.progress())
+        await events.put(_END)
+
+    async def _guard(self, stage: Awaitable, events: asyncio.Queue):
+        try:
+            await stage
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await events.put(e)
+
+    def progress(self) -> dict:
+        return {
+            "event": "progress",
+            "frames_read": self.frames_read,
+            "frames_processed": self.summary.frames_processed,
+            "total_frames": self.total_frames,
+            "stride": self.rate_control.stride,
+            "unique_objects_detected": len(self.summary.unique_objects),
+        }
+
+    async def events(self) -> AsyncIterator[dict]:
+        """
+        Run the pipeline, yielding progress events and finally the summary
+
+        Raises:
+            ValueError: If the video can't be opened
+        """
+        cap = await self.run_cpu(cv2.VideoCapture, self.path)
+        if not cap.isOpened():
+            raise ValueError("Failed to open video file")
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width > 0 and height > 0:
+            self.decoded_shape = (height, width, 3)
+
+        decoded = asyncio.Queue(maxsize=self.queue_size)
+        resized = asyncio.Queue(maxsize=self.queue_size)
+        in_flight = asyncio.Queue(maxsize=self.queue_size)
+        events = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [
+            asyncio.create_task(self._guard(self._decode_stage(cap, decoded), events)),
+            asyncio.create_task(self._guard(self._resize_stage(decoded, resized), events)),
+            asyncio.create_task(self._guard(self._inference_stage(resized, in_flight), events)),
+            asyncio.create_task(self._guard(self._tracking_stage(in_flight, events), events)),
+        ]
+
+        try:
+            while (event := await events.get()) is not _END:
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+            yield {"event": "summary", **self.summary.to_dict(),
+                   "frames_read": self.frames_read,
+                   "frames_skipped": self.rate_control.frames_skipped}
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Drop results of frames that were still in flight
+            while not in_flight.empty():
+                item = in_flight.get_nowait()
+                if item is not _END:
+                    item[2].cancel()
+            await self.run_cpu(cap.release)
+
+
+def format_ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,220 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from detectors import Detector, create_detector
+from shm_ring import FrameRef, FrameRing
+from tracing import BatchTiming, batch_timing
+
+logger = logging.getLogger("airborne-threat-detection")
+
+# Model replica and frame ring attachment owned by a worker process
+_worker_model = None
+_worker_ring: Optional[FrameRing] = None
+
+
+def partition_cores(num_workers: int, cores_per_worker: int = 0) -> List[List[int]]:
+    """
+    Split the cores this process may run on into one set per worker
+
+    Args:
+        num_workers: Number of inference workers
+        cores_per_worker: Cores per worker, 0 to split all available cores evenly
+
+    Returns:
+        List of core id lists, one per worker
+    """
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+
+    if cores_per_worker <= 0:
+        cores_per_worker = max(1, len(available) // num_workers)
+
+    core_sets = []
+    for index in range(num_workers):
+        start = (index * cores_per_worker) % len(available)
+        core_sets.append([available[(start + i) % len(available)] for i in range(cores_per_worker)])
+    return core_sets
+
+
+def load_model(detector: dict, num_threads: Optional[int] = None) -> Detector:
+    # Runtimes are imported by the detector, so the parent process doesn't need
+    # torch for the process backend or any non-PyTorch detector
+    return create_detector(num_threads=num_threads, **detector)
+
+
+def detect_batch(model: Detector, frames: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Run one forward pass over a batch of frames
+
+    Args:
+        model: Loaded detector
+        frames: List of decoded BGR frames
+
+    Returns:
+        One (N, 6) array per frame with rows [x1, y1, x2, y2, confidence, class_id]
+    """
+    return model.detect(frames)
+
+
+def _timed_detect(model: Detector, frames: List[np.ndarray]) -> Tuple[List[np.ndarray], BatchTiming]:
+    # Every batch reports where and when it ran, so traced frames can show it
+    start = time.perf_counter()
+    detections = detect_batch(model, frames)
+    return detections, batch_timing(start, model.stage_times, model.counters)
+
+
+def _pin_worker(cores: List[int]):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+def _process_worker_init(detector: dict, cores: List[int], ring: Optional[Tuple[str, int, int]] = None):
+    global _worker_model, _worker_ring
+    _pin_worker(cores)
+    _worker_model = load_model(detector, num_threads=len(cores))
+    if ring is not None:
+        _worker_ring = FrameRing.attach(*ring)
+    logger.info(f"Inference worker {os.getpid()} loaded model on cores {cores}")
+
+
+def _process_worker_run(frames: List[Union[np.ndarray, FrameRef]]) -> Tuple[List[np.ndarray], BatchTiming]:
+    # Frames in the shared ring arrive as references and are read in place
+    frames = [_worker_ring.view(frame) if isinstance(frame, FrameRef) else frame for frame in frames]
+    return _timed_detect(_worker_model, frames)
+
+
+class ThreadBackend:
+    """
+    Runs batches on a thread pool, one pre-loaded detector replica per thread
+
+    Every runtime releases the GIL during the forward pass, so replicas run
+    in parallel; each batch borrows an idle replica for its duration.
+    """
+
+    def __init__(self, detector: dict, num_workers: int = 1):
+        self.concurrency = num_workers
+        self._replicas: "queue.Queue" = queue.Queue()
+        for _ in range(num_workers):
+            self._replicas.put(load_model(detector))
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="inference")
+        logger.info(f"Thread inference backend started with {num_workers} replica(s)")
+
+    def _run(self, frames: List[np.ndarray]) -> Tuple[List[np.ndarray], BatchTiming]:
+        model = self._replicas.get()
+        try:
+            return _timed_detect(model, frames)
+        finally:
+            self._replicas.put(model)
+
+    def submit(self, frames: List[np.ndarray]) -> Future:
+        return self._executor.submit(self._run, frames)
+
+    def stats(self) -> dict:
+        return {}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ProcessBackend:
+    """
+    Runs batches on worker processes, each with its own detector replica pinned to a core set
+
+    Each worker is a single-process pool so its core set is fixed at startup;
+    batches go to the worker with the fewest batches in flight.
+    
+    With ring_slots > 0, frames travel through a shared-memory FrameRing
+    (see shm_ring.py) instead of being pickled; a frame that is larger than
+    a slot, or finds the ring full, is pickled as before. Slots are freed
+    when their batch's results come back.
+    """
+
+    def __init__(self, detector: dict, num_workers: int = 1, cores_per_worker: int = 0,
+                 ring_slots: int = 0, ring_slot_bytes: int = 0):
+        self.concurrency = num_workers
+        self.core_sets = partition_cores(num_workers, cores_per_worker)
+        self.ring = FrameRing(ring_slots, ring_slot_bytes) if ring_slots > 0 and ring_slot_bytes > 0 else None
+        ring_spec = self.ring.spec() if self.ring is not None else None
+        # Spawn rather than fork so workers don't inherit the parent's torch threads
+        context = multiprocessing.get_context("spawn")
+        self._pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                initializer=_process_worker_init, initargs=(detector, cores, ring_spec))
+            for cores in self.core_sets
+        ]
+        self._in_flight = [0] * num_workers
+        self._lock = threading.Lock()
+
+        # Load the replicas now rather than on the first frame
+        for pool in self._pools:
+            pool.submit(os.getpid).result()
+        logger.info(f"Process inference backend started with core sets {self.core_sets}")
+
+    def submit(self, frames: List[np.ndarray]) -> Future:
+        with self._lock:
+            index = min(range(len(self._pools)), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+        refs: List[Optional[FrameRef]] = []
+        try:
+            if self.ring is not None:
+                for frame in frames:
+                    refs.append(self.ring.write(frame))
+            payload = [ref if ref is not None else frame for ref, frame in zip(refs, frames)] if refs else frames
+            future = self._pools[index].submit(_process_worker_run, payload)
+        except BaseException:
+            # A broken or shut down pool never runs the batch, so no callback would free its slots
+            self._release(index, refs)
+            raise
+        future.add_done_callback(lambda _: self._release(index, refs))
+        return future
+
+    def _release(self, index: int, refs: List[Optional[FrameRef]]):
+        with self._lock:
+            self._in_flight[index] -= 1
+        for ref in refs:
+            if ref is not None:
+                self.ring.release(ref)
+
+    def stats(self) -> dict:
+        return {"frame_ring": self.ring.stats()} if self.ring is not None else {}
+
+    def shutdown(self):
+        for pool in self._pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.ring is not None:
+            self.ring.close()
+
+
+def create_backend(kind: str, detector: dict, num_workers: int = 1, cores_per_worker: int = 0,
+                   ring_slots: int = 0, ring_slot_bytes: int = 0) -> "ThreadBackend | ProcessBackend":
+    """
+    Create the inference execution backend selected by configuration
+
+    Args:
+        kind: "thread" or "process"
+        detector: create_detector() arguments each replica is loaded with
+            (backend, path and options), kept picklable for process workers
+        num_workers: Number of model replicas
+        cores_per_worker: Cores pinned per process worker, 0 to split evenly
+        ring_slots: Shared-memory frame slots for process workers, 0 to pickle frames
+        ring_slot_bytes: Capacity of each frame slot
+
+    Returns:
+        Backend exposing shutdown(), stats() and submit(frames) -> Future of
+        (detections per frame, BatchTiming)
+    """
+    if kind == "thread":
+        return ThreadBackend(detector, num_workers)
+    if kind == "process":
+        return ProcessBackend(detector, num_workers, cores_per_worker, ring_slots, ring_slot_bytes)
+    raise ValueError(f"Unknown inference backend '{kind}', expected 'thread' or 'process'")
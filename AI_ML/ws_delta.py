@@ -0,0 +1,301 @@
+"""
+Delta-encoded track updates for websocket viewers
+
+By default a websocket viewer gets every frame's full object list. A viewer
+that subscribes to deltas gets two kinds of messages instead:
+
+    key     snapshot of every track: sent first, every keyframe_seconds and
+            whenever the viewer (re)subscribes
+    delta   tracks created, changed and deleted since the last message sent
+            to the viewer; nothing at all is sent when no track changed
+
+Rows are quantised before they are compared: positions to quantum pixels,
+confidence to whole percent, speed and direction to whole units, so jitter
+below that resolution doesn't count as a change. With max_rate_hz set,
+frames arriving sooner than 1 / max_rate_hz after the last message are not
+sent; the next message carries every change since the last one that was,
+so the viewer's state never diverges.
+
+Messages, as JSON or msgpack:
+
+    {"t": "key", "session_id", "seq", "frame_id", "timestamp", "quantum",
+     "fields": [...], "types": [...], "levels": [...], "tracks": [row, ...]}
+    {"t": "delta", "session_id", "seq", "frame_id", "timestamp",
+     "create": [row, ...], "update": [[id, field, value, field, value, ...], ...],
+     "delete": [id, ...]}
+
+where row is [id, type, confidence, x1, y1, x2, y2, predicted_x, predicted_y,
+speed, direction, threat, zone] (see FIELDS), type and threat index "types"
+and "levels", confidence is in whole percent, and coordinates are counts of
+quanta: multiply them by the keyframe's "quantum" to get pixels. An update
+lists only the fields that changed, by their index in the row.
+"""
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+RESULTS = ("full", "delta")  # Result modes a viewer can ask for
+
+FIELDS = ("id", "type", "confidence", "x1", "y1", "x2", "y2", "predicted_x", "predicted_y",
+          "speed", "direction", "threat", "zone")
+
+
+class TrackTable(NamedTuple):
+    """
+    A frame's objects as numbers, built once per frame and shared by its viewers
+
+    values holds one row per object with the FIELDS columns up to threat, in
+    full precision; zones holds each object's zone name.
+    """
+    values: np.ndarray
+    zones: List[Optional[str]]
+
+
+class _SessionState:
+    """What one session's viewer was last sent"""
+
+    def __init__(self):
+        self.rows: Dict[int, tuple] = {}
+        self.sent_at = float("-inf")
+        self.keyframe_at = float("-inf")
+        self.keyframe_due = True
+
+
+class DeltaEncoder:
+    """
+    Per-viewer delta state, one per websocket connection
+
+    A connection can carry frames of several sessions, so the last sent rows
+    are kept per session.
+
+    Args:
+        types: Object type names, indexed by row type
+        levels: Threat level names, indexed by row threat
+        quantum: Position resolution in pixels
+        keyframe_seconds: Interval between full snapshots
+        max_rate_hz: Messages per second per session, 0 for one per frame
+    """
+
+    def __init__(self, types: Sequence[str], levels: Sequence[str], quantum: int = 2,
+                 keyframe_seconds: float = 5.0, max_rate_hz: float = 0.0):
+        self.types = list(types)
+        self.levels = list(levels)
+        self._type_index = {name: index for index, name in enumerate(self.types)}
+        self._level_index = {name: index for index, name in enumerate(self.levels)}
+        self.quantum = max(1, int(quantum))
+        self.keyframe_seconds = keyframe_seconds
+        self.max_rate_hz = max_rate_hz
+        self._scale = self._column_scale()
+        self._sessions: Dict[Optional[str], _SessionState] = {}
+
+        self.messages = 0
+        self.keyframes = 0
+        self.rate_limited = 0  # Frames not sent because of max_rate_hz
+        self.unchanged = 0  # Frames not sent because no track changed
+        self.rows_sent = 0
+        self.rows_suppressed = 0  # Unchanged tracks left out of deltas
+
+    def configure(self, quantum: Optional[int] = None, keyframe_seconds: Optional[float] = None,
+                  max_rate_hz: Optional[float] = None):
+        """Change the viewer's settings; every session gets a fresh keyframe"""
+        if quantum is not None:
+            self.quantum = max(1, int(quantum))
+            self._scale = self._column_scale()
+        if keyframe_seconds is not None:
+            self.keyframe_seconds = keyframe_seconds
+        if max_rate_hz is not None:
+            self.max_rate_hz = max_rate_hz
+        self.request_keyframe()
+
+    def _column_scale(self) -> np.ndarray:
+        # Confidence to percent, positions to quanta, everything else as is
+        scale = np.ones(len(FIELDS) - 1)
+        scale[FIELDS.index("confidence")] = 100
+        scale[FIELDS.index("x1"):FIELDS.index("predicted_y") + 1] = 1 / self.quantum
+        return scale
+
+    def request_keyframe(self):
+        for state in self._sessions.values():
+            state.keyframe_due = True
+
+    def close(self, session_id: Optional[str] = None):
+        """Forget what was sent for a session, or for every session when None"""
+        if session_id is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(session_id, None)
+
+    def table(self, objects: Sequence) -> TrackTable:
+        """TrackTable of DetectedObjects, for responses that come without one"""
+        values = np.array([
+            [obj.id, self._type_index.get(obj.object_type.value, -1), obj.confidence, *obj.bbox,
+             *obj.predicted_position, obj.speed, obj.direction, self._level_index.get(obj.threat_level.value, -1)]
+            for obj in objects
+        ], dtype=np.float64).reshape(-1, len(FIELDS) - 1)
+        return TrackTable(values, [obj.zone for obj in objects])
+
+    def quantise(self, table: TrackTable) -> Dict[int, tuple]:
+        """Rows by track id at the viewer's resolution"""
+        scaled = table.values * self._scale
+        np.rint(scaled, out=scaled)
+        return {row[0]: (*row, zone) for row, zone in zip(scaled.astype(np.int64).tolist(), table.zones)}
+
+    def encode(self, response, seq: Optional[int] = None, tracks: Optional[TrackTable] = None,
+               now: Optional[float] = None) -> Optional[dict]:
+        """
+        Message for a frame's DetectionResponse
+
+        Args:
+            response: The frame's DetectionResponse
+            seq: Client sequence number to echo
+            tracks: The response's objects as a TrackTable, built from
+                response.objects when not given
+            now: Monotonic time, for tests and replays
+
+        Returns:
+            Key or delta message, None when nothing needs sending
+        """
+        now = time.monotonic() if now is None else now
+        state = self._sessions.get(response.session_id)
+        if state is None:
+            state = self._sessions[response.session_id] = _SessionState()
+
+        keyframe = state.keyframe_due or now - state.keyframe_at >= self.keyframe_seconds
+        if not state.keyframe_due and self.max_rate_hz > 0 and now - state.sent_at < 1.0 / self.max_rate_hz:
+            self.rate_limited += 1
+            return None
+
+        rows = self.quantise(tracks if tracks is not None else self.table(response.objects))
+        message = {
+            "t": "key" if keyframe else "delta",
+            "session_id": response.session_id,
+            "seq": seq,
+            "frame_id": response.frame_id,
+            "timestamp": response.timestamp,
+        }
+        if keyframe:
+            message.update(quantum=self.quantum, fields=FIELDS, types=self.types, levels=self.levels,
+                           tracks=list(rows.values()))
+            state.keyframe_at = now
+            state.keyframe_due = False
+            self.keyframes += 1
+            self.rows_sent += len(rows)
+        else:
+            create, update, delete = self._diff(state.rows, rows)
+            state.rows = rows
+            if not (create or update or delete):
+                self.unchanged += 1
+                return None
+            message.update(create=create, update=update, delete=delete)
+            self.rows_sent += len(create) + len(update)
+            self.rows_suppressed += len(rows) - len(create) - len(update)
+
+        state.rows = rows
+        state.sent_at = now
+        self.messages += 1
+        return message
+
+    @staticmethod
+    def _diff(previous: Dict[int, tuple], rows: Dict[int, tuple]) -> Tuple[List[tuple], List[list], List[int]]:
+        create, update = [], []
+        for track_id, row in rows.items():
+            old = previous.get(track_id)
+            if old is None:
+                create.append(row)
+            elif old != row:
+                change = [track_id]
+                for field, (before, after) in enumerate(zip(old, row)):
+                    if before != after:
+                        change += (field, after)
+                update.append(change)
+        # Every previous track still present was either updated or left alone
+        still_present = len(rows) - len(create)
+        delete = [track_id for track_id in previous if track_id not in rows] if len(previous) > still_present else []
+        return create, update, delete
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "quantum": self.quantum,
+            "keyframe_seconds": self.keyframe_seconds,
+            "max_rate_hz": self.max_rate_hz,
+            "messages": self.messages,
+            "keyframes": self.keyframes,
+            "rate_limited": self.rate_limited,
+            "unchanged": self.unchanged,
+            "rows_sent": self.rows_sent,
+            "rows_suppressed": self.rows_suppressed,
+        }
+
+
+def check_results(results) -> str:
+    """
+    Validate a results mode
+
+    Raises:
+        ValueError: If results is neither "full" nor "delta"
+    """
+    if results not in RESULTS:
+        raise ValueError(f"results must be 'full' or 'delta', got {results!r}")
+    return results
+
+
+class ViewerSettings:
+    """
+    How a viewer wants its results, changed by {"subscribe": {...}} control messages
+
+    Control message options: results ("full" or "delta"), max_rate,
+    quantum, keyframe_seconds and format ("json" or "msgpack"). Every
+    subscribe message brings delta viewers a fresh keyframe.
+
+    Args:
+        create_encoder: Factory for the viewer's DeltaEncoder, given max_rate_hz
+        results: "full" or "delta"
+        max_rate_hz: Delta messages per second, 0 for one per frame
+
+    Raises:
+        ValueError: If results is neither "full" nor "delta"
+    """
+
+    def __init__(self, create_encoder: Callable[[float], DeltaEncoder], results: str = "full",
+                 max_rate_hz: float = 0.0):
+        check_results(results)
+        self.create_encoder = create_encoder
+        self.encoder: Optional[DeltaEncoder] = create_encoder(max_rate_hz) if results == "delta" else None
+        self.msgpack = False
+
+    def subscribe(self, options: dict):
+        """
+        Apply a control message's options
+
+        Raises:
+            ValueError: If an option has the wrong type
+        """
+        if not isinstance(options, dict):
+            raise ValueError("subscribe expects an object of options")
+        try:
+            if check_results(options.get("results", "full" if self.encoder is None else "delta")) == "full":
+                self.encoder = None
+            else:
+                quantum, keyframe_seconds, max_rate_hz = (options.get(name) for name in
+                                                          ("quantum", "keyframe_seconds", "max_rate"))
+                if self.encoder is None:
+                    self.encoder = self.create_encoder(0.0)
+                self.encoder.configure(
+                    quantum=int(quantum) if quantum is not None else None,
+                    keyframe_seconds=float(keyframe_seconds) if keyframe_seconds is not None else None,
+                    max_rate_hz=max(0.0, float(max_rate_hz)) if max_rate_hz is not None else None
+                )
+        except TypeError as e:
+            raise ValueError(str(e))
+        # Settings left out of the message stay as they were
+        if "format" in options:
+            if options["format"] not in ("json", "msgpack"):
+                raise ValueError(f"Unknown format {options['format']!r}, expected 'json' or 'msgpack'")
+            self.msgpack = options["format"] == "msgpack"
+
+    def close(self, session_id: Optional[str] = None):
+        """Drop the delta state of a session, or of every session when None"""
+        if self.encoder is not None:
+            self.encoder.close(session_id)
@@ -0,0 +1,167 @@
+import json
+import struct
+import uuid
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Optional: responses fall back to compact JSON
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # Optional: JSON falls back to the standard library encoder
+    orjson = None
+
+# Binary frame message layout (little-endian), followed by the payload:
+#   magic     2s  b"AF"
+#   version   B   PROTOCOL_VERSION
+#   encoding  B   ENCODING_JPEG / ENCODING_BGR / ENCODING_NV12
+#   flags     B   FLAG_* bits
+#   reserved  B
+#   seq       I   client frame sequence number, echoed in the response
+#   timestamp d   client capture time in seconds
+#   width     H   frame width (raw encodings only)
+#   height    H   frame height (raw encodings only)
+#   session   16s session id as raw UUID bytes, all zero for the connection's session
+HEADER = struct.Struct("<2sBBBBIdHH16s")
+MAGIC = b"AF"
+PROTOCOL_VERSION = 1
+
+ENCODING_JPEG = 0
+ENCODING_BGR = 1
+ENCODING_NV12 = 2
+
+FLAG_MSGPACK_RESPONSE = 0x01
+
+_NO_SESSION = bytes(16)
+
+
+class FrameHeader(NamedTuple):
+    encoding: int
+    flags: int
+    seq: int
+    timestamp: float
+    width: int
+    height: int
+    session_id: Optional[str]
+
+
+def parse_frame_message(data: bytes) -> Tuple[FrameHeader, memoryview]:
+    """
+    Split a binary frame message into its header and payload
+
+    Args:
+        data: Raw websocket message
+
+    Returns:
+        Parsed header and a zero-copy view of the payload
+
+    Raises:
+        ValueError: If the header is malformed
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Frame message shorter than header")
+
+    magic, version, encoding, flags, _, seq, timestamp, width, height, session = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Bad frame message magic")
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}")
+
+    session_id = None if session == _NO_SESSION else uuid.UUID(bytes=session).hex
+    header = FrameHeader(encoding, flags, seq, timestamp, width, height, session_id)
+    return header, memoryview(data)[HEADER.size:]
+
+
+def decode_frame(header: FrameHeader, payload: memoryview, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    Decode a frame payload into a BGR image without intermediate copies
+
+    Raw BGR payloads are returned as a read-only view over the message buffer.
+
+    Args:
+        header: Parsed message header
+        payload: Payload view from parse_frame_message
+        out: (height, width, 3) buffer to convert NV12 payloads into
+
+    Returns:
+        BGR frame, or None if a JPEG payload fails to decode
+
+    Raises:
+        ValueError: If the encoding is unknown or the payload size is wrong
+    """
+    buffer = np.frombuffer(payload, np.uint8)
+
+    if header.encoding == ENCODING_JPEG:
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    width, height = header.width, header.height
+    if header.encoding == ENCODING_BGR:
+        if buffer.size != width * height * 3:
+            raise ValueError("BGR payload size doesn't match frame dimensions")
+        return buffer.reshape(height, width, 3)
+
+    if header.encoding == ENCODING_NV12:
+        if buffer.size != width * height * 3 // 2:
+            raise ValueError("NV12 payload size doesn't match frame dimensions")
+        return cv2.cvtColor(buffer.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_NV12, dst=out)
+
+    raise ValueError(f"Unknown frame encoding {header.encoding}")
+
+
+def pack_response(response, seq: int) -> dict:
+    """
+    Flatten a DetectionResponse into a compact positional form
+
+    Each object becomes [id, object_type, confidence, x1, y1, x2, y2,
+    predicted_x, predicted_y, speed, direction, threat_level, zone].
+    """
+    return {
+        "seq": seq,
+        "frame_id": response.frame_id,
+        "timestamp": response.timestamp,
+        "session_id": response.session_id,
+        "objects": [
+            [
+                obj.id, obj.object_type.value, round(obj.confidence, 3),
+                *obj.bbox, *obj.predicted_position,
+                obj.speed, obj.direction, obj.threat_level.value, obj.zone,
+            ]
+            for obj in response.objects
+        ],
+    }
+
+
+def encode_response(response, header: FrameHeader) -> Tuple[bool, object]:
+    """
+    Encode a response for a binary frame message
+
+    Returns:
+        (is_binary, payload): msgpack bytes when the client asked for them and
+        msgpack is installed, otherwise compact JSON text
+    """
+    return encode_message(pack_response(response, header.seq), bool(header.flags & FLAG_MSGPACK_RESPONSE))
+
+
+def dumps(message) -> str:
+    """Compact JSON text, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"))
+
+
+def encode_message(message: dict, binary: bool = False) -> Tuple[bool, object]:
+    """
+    Encode a websocket message
+
+    Returns:
+        (is_binary, payload): msgpack bytes when binary is asked for and
+        msgpack is installed, otherwise compact JSON text
+    """
+    if binary and msgpack is not None:
+        return True, msgpack.packb(message)
+    return False, dumps(message)
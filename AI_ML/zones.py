@@ -0,0 +1,186 @@
+import json
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from threat_rules import LEVELS
+
+ALL_CAMERAS = "*"  # Zones registered under this id apply to every camera
+
+
+class Zone(NamedTuple):
+    name: str
+    polygon: Tuple[Tuple[float, float], ...]  # Normalized [0, 1] frame coordinates
+    priority: int = 0  # Higher wins when a box is in several zones
+    threat_level: str = "High"  # Minimum threat level of an object inside the zone
+
+
+def make_zone(name: str, polygon: Sequence[Sequence[float]], priority: int = 0,
+              threat_level: str = "High") -> Zone:
+    """
+    Validate and build a zone
+
+    Raises:
+        ValueError: If the polygon has fewer than 3 points or leaves the frame,
+            or the threat level is unknown
+    """
+    if threat_level not in LEVELS:
+        raise ValueError(f"Zone '{name}' has unknown threat level {threat_level!r}, "
+                         f"expected one of {', '.join(LEVELS)}")
+    points = tuple((float(x), float(y)) for x, y in polygon)
+    if len(points) < 3:
+        raise ValueError(f"Zone '{name}' needs at least 3 points")
+    if any(not (0.0 <= v <= 1.0) for point in points for v in point):
+        raise ValueError(f"Zone '{name}' points must be normalized to [0, 1]")
+    return Zone(name, points, int(priority), threat_level)
+
+
+class ZoneHits(NamedTuple):
+    inside: np.ndarray  # (n, zones) bool, box overlaps zone
+    primary: np.ndarray  # (n,) index of the highest-priority zone hit, -1 for none
+
+
+class CompiledZones:
+    """
+    Rasterized, immutable snapshot of one camera's zones
+
+    Every zone is filled into a grid_size x grid_size mask over the
+    normalized frame and turned into a summed-area table, so testing a box
+    against a zone is four lookups whatever the box or polygon size. All
+    boxes are tested against all zones with one gather.
+    """
+
+    def __init__(self, zones: Sequence[Zone], grid_size: int = 128):
+        self.zones = sorted(zones, key=lambda zone: -zone.priority)  # Highest priority first
+        self.grid_size = grid_size
+
+        masks = np.zeros((len(self.zones), grid_size, grid_size), dtype=np.uint8)
+        for mask, zone in zip(masks, self.zones):
+            points = np.round(np.asarray(zone.polygon) * grid_size).astype(np.int32)
+            cv2.fillPoly(mask, [points], 1)
+
+        # int32 holds any count up to 46340 x 46340 cells; uint16 overflowed above 255 x 255
+        integral = np.zeros((len(self.zones), grid_size + 1, grid_size + 1), dtype=np.int32)
+        integral[:, 1:, 1:] = masks.cumsum(axis=1, dtype=np.int32).cumsum(axis=2, dtype=np.int32)
+        self._integral = integral
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def evaluate(self, boxes: np.ndarray, frame_shape: Tuple[int, ...]) -> ZoneHits:
+        """
+        Test boxes against every zone
+
+        Args:
+            boxes: (n, 4) array of [x1, y1, x2, y2] boxes in frame pixels
+            frame_shape: Frame dimensions [height, width]
+
+        Returns:
+            Zone membership of every box
+        """
+        count = len(boxes)
+        if count == 0 or not self.zones:
+            return ZoneHits(np.zeros((count, len(self.zones)), dtype=bool), np.full(count, -1))
+
+        height, width = frame_shape[:2]
+        size = self.grid_size
+        boxes = np.asarray(boxes, dtype=np.float64)
+        # Round outwards to whole cells, at least one cell per box
+        x1 = np.clip(np.floor(boxes[:, 0] / width * size), 0, size - 1).astype(np.int64)
+        y1 = np.clip(np.floor(boxes[:, 1] / height * size), 0, size - 1).astype(np.int64)
+        x2 = np.clip(np.ceil(boxes[:, 2] / width * size), x1 + 1, size).astype(np.int64)
+        y2 = np.clip(np.ceil(boxes[:, 3] / height * size), y1 + 1, size).astype(np.int64)
+
+        table = self._integral
+        covered = (table[:, y2, x2] - table[:, y1, x2]
+                   - table[:, y2, x1] + table[:, y1, x1])  # (zones, n)
+        inside = (covered > 0).T
+        primary = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+        return ZoneHits(inside, primary)
+
+
+class ZoneEngine:
+    """
+    Named restricted zones per camera, with compiled snapshots cached per camera
+
+    Cameras are identified by their stream session id. Changes invalidate the
+    cached snapshot; tracking picks up the new one on its next frame. Cameras
+    without zones of their own share the "*" snapshot, so only cameras with
+    their own zones hold a snapshot each.
+    """
+
+    def __init__(self, grid_size: int = 128):
+        self.grid_size = grid_size
+        self._zones: Dict[str, Dict[str, Zone]] = {}
+        self._compiled: Dict[str, CompiledZones] = {}
+        self._lock = threading.Lock()
+        self.intrusions: Dict[str, int] = {}
+
+    def _invalidate(self, camera_id: str):
+        if camera_id == ALL_CAMERAS:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(camera_id, None)
+
+    def set_zones(self, camera_id: str, zones: Sequence[Zone]):
+        with self._lock:
+            self._zones[camera_id] = {zone.name: zone for zone in zones}
+            self._invalidate(camera_id)
+
+    def upsert(self, camera_id: str, zone: Zone):
+        with self._lock:
+            self._zones.setdefault(camera_id, {})[zone.name] = zone
+            self._invalidate(camera_id)
+
+    def remove(self, camera_id: str, name: str) -> bool:
+        with self._lock:
+            removed = self._zones.get(camera_id, {}).pop(name, None) is not None
+            if removed:
+                self._invalidate(camera_id)
+            return removed
+
+    def list(self, camera_id: str) -> List[Zone]:
+        with self._lock:
+            return list(self._zones.get(camera_id, {}).values())
+
+    def cameras(self) -> List[str]:
+        with self._lock:
+            return [camera_id for camera_id, zones in self._zones.items() if zones]
+
+    def compiled(self, camera_id: str) -> Optional[CompiledZones]:
+        """
+        Compiled zones for a camera, including the zones shared by all cameras
+
+        Returns:
+            Snapshot to evaluate boxes against, or None when no zone applies
+        """
+        with self._lock:
+            key = camera_id if self._zones.get(camera_id) else ALL_CAMERAS
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                zones = dict(self._zones.get(ALL_CAMERAS, {}))
+                zones.update(self._zones.get(key, {}))
+                compiled = CompiledZones(list(zones.values()), self.grid_size)
+                self._compiled[key] = compiled
+        return compiled if len(compiled) else None
+
+    def release(self, camera_id: str):
+        """Drop a camera's compiled snapshot, e.g. when its stream session ends"""
+        if camera_id != ALL_CAMERAS:
+            with self._lock:
+                self._compiled.pop(camera_id, None)
+
+    def record_intrusion(self, zone_name: str):
+        with self._lock:
+            self.intrusions[zone_name] = self.intrusions.get(zone_name, 0) + 1
+
+    def load(self, path: str):
+        """
+        Load zones from a JSON file of {camera_id: [{name, polygon, priority, threat_level}]}
+        """
+        with open(path) as f:
+            config = json.load(f)
+        for camera_id, zones in config.items():
+            self.set_zones(camera_id, [make_zone(**zone) for zone in zones])